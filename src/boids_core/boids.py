@@ -12,13 +12,17 @@ sys.path.insert(0, os.path.abspath('..'))
 import timeit
 import time
 import numpy as np
-from math import atan2, sqrt
+from math import atan2, sqrt, cos
 
 # Repo module imports
 import boids_core.generate_values as generate_values
+import boids_core.rules as rules
+import boids_core.neighbours as neighbours
+import boids_core.kernels as kernels
 
 # Code from delauney triangulation module
-from delauney_triangulation.triangulation_core.triangulation import triangulate
+from delauney_triangulation.triangulation_core.triangulation import (triangulate,
+                                                                     triangulate_indexed)
 from delauney_triangulation.triangulation_core.linear_algebra import (vector_add, 
                                                                       vector_sub, 
                                                                       list_divide, 
@@ -49,7 +53,10 @@ class Obstacle(Object):
 
 class Boid(Object):
     """
-    Class to represent a single Boid.
+    Class to represent a single Boid. The neighbours of the boid are a
+    sequence of indices into the positions and velocities of all the boids, 
+    normally a view into the Boids.neighbour_list (see 
+    Boids.set_member_neighbours).
     """
     def __init__(self, idx, position, velocity, options):
         super().__init__(idx, position)
@@ -57,6 +64,7 @@ class Boid(Object):
         self.neighbours = []
         self.max_speed = options['max_speed']
         self.field_of_view = options['field_of_view']
+        self.cos_half_fov = cos(self.field_of_view/2)
         self.vision_distance = options['vision_distance']
         self.safety_zone = options['safety_zone']
         self.alignment_perception = options['alignment_perception']
@@ -100,33 +108,55 @@ class Boid(Object):
         
         return (np.asarray([p1, p2, p3]).astype(int))
     
-    def restrict_fov(self, positions):
+    def displacement(self, n_pos, world=None):
+        """
+        Find the displacement from the boid to the point 'n_pos'. If a world 
+        is given, the world is treated as periodic (see wrap_world) and the 
+        shortest displacement allowing for the wrap around is returned. This 
+        is known as the minimum image convention.
+
+        Returns
+        -------
+        list
+            The x and y components of the displacement
+        """
+        diff_x = n_pos[0] - self.pos[0]
+        diff_y = n_pos[1] - self.pos[1]
+        if world is not None:
+            diff_x -= world.x_max * round(diff_x / world.x_max)
+            diff_y -= world.y_max * round(diff_y / world.y_max)
+        return [diff_x, diff_y]
+    
+    def restrict_fov(self, positions, world=None):
         """
         Function to limit the field of view of the boid. Neighbours beyond the
         self.field_of_view/2 angle are removed from the set of neighbours. 
+        
+        The angle is tested with the dot product of the boid velocity and the 
+        displacement to the neighbour, v.d > cos(field_of_view/2)|v||d|, 
+        which avoids the angles wrapping around at +-pi.
 
         Parameters
         ----------
         positions : list
             List of all coordinates of the boids.
+        world : World, optional
+            If given, use minimum image displacements in the periodic world.
         """
         new_neighbours = []
-        boid_dir = atan2(self.vel[0], self.vel[1])
+        speed = self.magnitude()
         for neighbour in self.neighbours:
-            n_pos = positions[neighbour[1]]
-            # Find the angle between boid direction and neighbour
-            angle = atan2(n_pos[0]-self.pos[0], n_pos[1]-self.pos[1])
-            # print(f"{boid_dir},{boid_dir - self.field_of_view/2},{angle},{boid_dir + self.field_of_view/2}")
-            if ((boid_dir - self.field_of_view/2) < angle and
-                 angle < (boid_dir + self.field_of_view/2)):
-                diff_x = n_pos[0] - self.pos[0]
-                diff_y = n_pos[1] - self.pos[1]
-                distance = sqrt(diff_x**2 + diff_y**2)
-                if distance < self.vision_distance:   
-                    new_neighbours.append(neighbour) 
+            n_pos = positions[neighbour]
+            diff_x, diff_y = self.displacement(n_pos, world)
+            distance = sqrt(diff_x**2 + diff_y**2)
+            if not 0 < distance < self.vision_distance:
+                continue
+            dot = self.vel[0]*diff_x + self.vel[1]*diff_y
+            if speed == 0 or dot > self.cos_half_fov * speed * distance:
+                new_neighbours.append(neighbour) 
         self.neighbours = new_neighbours
         
-    def separation(self, positions):
+    def separation(self, positions, world=None):
         """
         Function to implemen the boids seperation rule.
         """
@@ -134,9 +164,8 @@ class Boid(Object):
         resultant_y = 0
         counter = 0
         for neighbour in self.neighbours:
-            n_pos = positions[neighbour[1]]
-            diff_x = n_pos[0] - self.pos[0]
-            diff_y = n_pos[1] - self.pos[1]
+            n_pos = positions[neighbour]
+            diff_x, diff_y = self.displacement(n_pos, world)
             distance = sqrt(diff_x**2 + diff_y**2)
             if distance < self.safety_zone:
                 counter += 1
@@ -152,24 +181,27 @@ class Boid(Object):
         # print(f"separation,{vs_x:0.4f},{vs_y:0.4f}")
         return [vs_x, vs_y]
         
-    def cohesion(self, positions):
+    def cohesion(self, positions, world=None):
         """
-        Function to implemen the boids cohesion rule.
+        Function to implemen the boids cohesion rule. The displacements to 
+        the neighbours are averaged, giving the displacement to the centre of
+        the neighbours.
         """
         num_neighbours = len(self.neighbours)
         resultant_x = 0
         resultant_y = 0
         
         for neighbour in self.neighbours:
-            n_pos = positions[neighbour[1]]
-            resultant_x += n_pos[0]   
-            resultant_y += n_pos[1]
+            n_pos = positions[neighbour]
+            diff_x, diff_y = self.displacement(n_pos, world)
+            resultant_x += diff_x   
+            resultant_y += diff_y
             
         resultant_x /= num_neighbours
         resultant_y /= num_neighbours
 
-        vc_x = self.cohesion_perception * (resultant_x - self.pos[0])
-        vc_y = self.cohesion_perception * (resultant_y - self.pos[1])
+        vc_x = self.cohesion_perception * resultant_x
+        vc_y = self.cohesion_perception * resultant_y
         # print(f"cohesion,{vc_x:0.4f},{vc_y:0.4f}")
         return [vc_x, vc_y]
 
@@ -182,7 +214,7 @@ class Boid(Object):
         resultant_vy = 0
 
         for neighbour in self.neighbours:
-            n_velo = velocities[neighbour[1]]
+            n_velo = velocities[neighbour]
             resultant_vx += n_velo[0]   
             resultant_vy += n_velo[1]
 
@@ -213,13 +245,13 @@ class Boid(Object):
         Function to apply all the boid rules to update the position and 
         velocity of a boid for a single time-step.
         """
-        self.restrict_fov(positions)
+        self.restrict_fov(positions, world)
         # print(f"current pos:  {self.pos[0]:0.4f}, {self.pos[1]:0.4f}")
         # print(f"current vel:  {self.vel[0]:0.4f}, {self.vel[1]:0.4f}")
         if len(self.neighbours) >= 1:
             ali = self.alignment(velocities)
-            coh = self.cohesion(positions)
-            sep = self.separation(positions)
+            coh = self.cohesion(positions, world)
+            sep = self.separation(positions, world)
             
             self.vel[0] += (coh[0] + ali[0] + sep[0]) 
             self.vel[1] += (coh[1] + ali[1] + sep[1])
@@ -237,6 +269,166 @@ class Boid(Object):
         # print(f"new vel:      {self.vel[0]:0.4f}, {self.vel[1]:0.4f}")
         # print("-"*32)
 
+class IncrementalTriangulation():
+    """
+    Class to keep the Delaunay triangulation of the boids from one frame to 
+    the next. The previous triangulation is repaired (see 
+    TriangulationEdges.repair) instead of being rebuilt from scratch every 
+    frame, and it is only rebuilt if the repair fails.
+    
+    The points are the same as those triangulated by 
+    Boids.setup_triangulate_boids, the boids plus their ghosts within 
+    'band' of the edges of the world (see neighbours.add_ghosts), so the 
+    neighbours found are the same as for a full triangulation. 
+    
+    Each point of the triangulation is kept in a slot, which follows the 
+    same copy of a boid from frame to frame. A copy is identified by the 
+    boid's index and its image, the number of world sizes it is shifted by 
+    from the boid's unwrapped position. When a boid wraps around the edge 
+    of the world, its point and the ghost on the other side swap roles and
+    keep their slots. Ghosts which leave the band are removed from the 
+    triangulation and new ghosts are inserted, and the slots of removed 
+    points are reused.
+
+    Parameters
+    ----------
+    positions : numpy.ndarray
+        Array of shape (N, 2) of boid positions
+    ids : list
+        The index of each boid, Boid.index, which must be less than N
+    world : World
+        The world the boids live in
+    band : float
+        Width of the band of ghosts around the world
+    """
+    def __init__(self, positions, ids, world, band):
+        self.world = world
+        self.band = band
+        self.size = np.array([world.x_max, world.y_max], dtype=float)
+        self.num_repairs = 0
+        self.num_rebuilds = 0
+        # The image of the unwrapped position of each boid, by boid index
+        self.image = np.zeros((len(positions), 2), dtype=np.int64)
+        self.previous = np.zeros((len(positions), 2))
+        self.previous[ids] = positions
+        self.rebuild(*self.copies(positions, ids))
+        
+    def copies(self, positions, ids):
+        """
+        Find the boids and ghosts to triangulate, and the key identifying 
+        each copy of a boid.
+
+        Returns
+        -------
+        points : numpy.ndarray
+            Array of shape (N+G, 2) of point positions, see add_ghosts
+        owner : numpy.ndarray
+            Index in 'positions' of the boid each point is a copy of
+        keys : list
+            Tuple of the boid index and the image of each point
+        """
+        ids = np.asarray(ids)
+        
+        # Count the times each boid has crossed the edges of the world
+        moved = positions - self.previous[ids]
+        self.image[ids] -= np.rint(moved / self.size).astype(np.int64)
+        self.previous[ids] = positions
+        
+        points, owner = neighbours.add_ghosts(positions, self.world, self.band)
+        shift = np.rint((points - positions[owner]) / self.size)
+        image = shift.astype(np.int64) - self.image[ids[owner]]
+        keys = list(zip(ids[owner].tolist(), image[:, 0].tolist(), 
+                        image[:, 1].tolist()))
+        return points, owner, keys
+    
+    def rebuild(self, points, owner, keys):
+        """
+        Triangulate the boids plus ghosts from scratch.
+        """
+        self.slot = {key: i for i, key in enumerate(keys)}
+        self.slot_key = list(keys)
+        self.free_slots = []
+        self.owner = owner.tolist()
+        self.is_ghost = [i >= len(self.previous) for i in range(len(keys))]
+        self.triangulation = triangulate_indexed(points.tolist())
+        self.num_rebuilds += 1
+        
+    def update(self, positions, ids):
+        """
+        Update the triangulation for the new boid positions.
+
+        Parameters
+        ----------
+        positions : numpy.ndarray
+            Array of shape (N, 2) of boid positions
+        ids : list
+            The index of each boid
+            
+        Returns
+        -------
+        triangulation : TriangulationEdges
+            Delaunay triangulation of the boids and their ghosts
+        """
+        points, owner, keys = self.copies(positions, ids)
+        if self.repair(points, owner, keys):
+            self.num_repairs += 1
+        else:
+            self.rebuild(points, owner, keys)
+        return self.triangulation
+    
+    def repair(self, points, owner, keys):
+        """
+        Move the points of the triangulation to their new positions, remove 
+        the copies of the boids which are no longer needed and insert the 
+        new ones.
+
+        Returns
+        -------
+        out : bool
+            False if the triangulation could not be repaired
+        """
+        triangulation = self.triangulation
+        slot = self.slot
+        
+        # Remove the points which have gone, before any of the points move
+        new_keys = set(keys)
+        for i, key in enumerate(self.slot_key):
+            if key is not None and key not in new_keys:
+                if triangulation.remove_point(i) is None:
+                    return False
+                del slot[key]
+                self.slot_key[i] = None
+                self.owner[i] = -1
+                self.is_ghost[i] = True
+                self.free_slots.append(i)
+        
+        new_points = list(triangulation.points)
+        added = []
+        for i, (key, point) in enumerate(zip(keys, points.tolist())):
+            j = slot.get(key)
+            if j is None:
+                if self.free_slots:
+                    j = self.free_slots.pop()
+                else:
+                    j = len(new_points)
+                    new_points.append(point)
+                    self.slot_key.append(None)
+                    self.owner.append(-1)
+                    self.is_ghost.append(True)
+                slot[key] = j
+                self.slot_key[j] = key
+                added.append(j)
+            new_points[j] = point
+            self.owner[j] = int(owner[i])
+            self.is_ghost[j] = i >= len(self.previous)
+        
+        if not triangulation.repair(new_points):
+            return False
+        for j in added:
+            if not triangulation.insert_point(j):
+                return False
+        return True
+
 class Boids():
     """
     A Class to store the full set of Boid Class objects, along with associated
@@ -249,8 +441,31 @@ class Boids():
         self.positions = []
         self.velocities = []
         self.triangulation = None
+        self.triangulation_points = []
+        self.triangulation_owner = []
+        self.triangulation_is_ghost = []
+        self.incremental_triangulation = None
+        # Random number generator used to set up the boids, and the number of
+        # time-steps simulated so far. Both are saved in checkpoints.
+        self.rng = np.random.default_rng()
+        self.step_count = 0
         self.max_speed = options['max_speed']
-        
+        self.field_of_view = options['field_of_view']
+        self.cos_half_fov = cos(self.field_of_view/2)
+        self.vision_distance = options['vision_distance']
+        self.safety_zone = options['safety_zone']
+        self.alignment_perception = options['alignment_perception']
+        self.cohesion_perception = options['cohesion_perception']
+        self.separation_perception = options['seperation_perception']
+
+        # Array storage used by the vectorised update, see setup_arrays()
+        self.pos_array = None
+        self.vel_array = None
+        self.pos_next = None
+        self.vel_next = None
+        self.neighbour_list = neighbours.NeighbourList(number)
+        self.verlet_list = None
+
     def add_boid(self, new_boid):
         self.members.append(new_boid)
         
@@ -268,13 +483,17 @@ class Boids():
             alternative options.
         """
         if distribution == 'random':
-            positions = generate_values.random(self.num, self.world)
+            positions = generate_values.random(self.num, self.world, 
+                                               rng=self.rng)
         if distribution == 'lattice':
-            positions = generate_values.lattice(self.num, self.world)
+            positions = generate_values.lattice(self.num, self.world, 
+                                                rng=self.rng)
         if distribution == 'lattice_with_noise':
-            positions = generate_values.noisy_lattice(self.num, self.world)      
+            positions = generate_values.noisy_lattice(self.num, self.world, 
+                                                      rng=self.rng)
 
-        velocities = generate_values.random_velocities(self.num, self.max_speed)
+        velocities = generate_values.random_velocities(self.num, self.max_speed,
+                                                       rng=self.rng)
 
         for i in range(self.num):
             new_boid = Boid(i, positions[i], velocities[i], options)
@@ -297,13 +516,39 @@ class Boids():
         sorted_b = sorted(self.members, key=lambda b: [b.pos[0], b.pos[1]])
         self.members = sorted_b
         
-    def triangulate_boids(self):
+    def triangulate_boids(self, incremental=False):
         """
         Use the delauney_triangulation module to triangulate the set of boids.
+        
+        Parameters
+        ----------
+        incremental : bool, optional
+            If True, repair the triangulation from the previous frame with 
+            edge flips instead of triangulating from scratch, see the 
+            IncrementalTriangulation class. The points triangulated are the
+            same in both modes. The default is False.
         """
+        if not incremental:
+            self.incremental_triangulation = None
+            self.setup_triangulate_boids()
+            self.triangulation = triangulate(self.triangulation_points)
+            return
+        
         self.sort_boids()
         self.get_pos_vel()
-        self.triangulation = triangulate(self.positions)
+        positions = np.asarray(self.positions)
+        ids = [boid.index for boid in self.members]
+        incremental = self.incremental_triangulation
+        if incremental is None:
+            incremental = IncrementalTriangulation(positions, ids, self.world,
+                                                   self.vision_distance)
+            self.incremental_triangulation = incremental
+        else:
+            incremental.update(positions, ids)
+        self.triangulation = incremental.triangulation
+        self.triangulation_points = self.triangulation.points
+        self.triangulation_owner = incremental.owner
+        self.triangulation_is_ghost = incremental.is_ghost
         
     def setup_triangulate_boids(self):
         """
@@ -311,30 +556,314 @@ class Boids():
         triangulation algorithm. This is used for the MPI implementation 
         (in 'run_boids_mpi_cli.py) where there is a custom MPI triangulate 
          function.
+        
+        The points to triangulate, self.triangulation_points, are the boid
+        positions plus ghost copies of the boids within vision_distance of 
+        the edges of the world (see neighbours.add_ghosts), sorted 
+        lexicographically. This lets boids find neighbours across the edges 
+        of the periodic world. self.triangulation_owner gives the index in 
+        self.positions of the boid each point belongs to.
         """
         self.sort_boids()
         self.get_pos_vel()
+        points, owner = neighbours.add_ghosts(np.asarray(self.positions), 
+                                              self.world, 
+                                              self.vision_distance)
+        order = np.lexsort((points[:, 1], points[:, 0]))
+        self.triangulation_points = points[order].tolist()
+        self.triangulation_owner = owner[order].tolist()
+        self.triangulation_is_ghost = (order >= self.num).tolist()
         
     def make_neighbourhoods(self):
         """
-        Make neighbourhoods using the Delanunay triangulation module.
+        Make neighbourhoods using the Delanunay triangulation module. Edges 
+        to ghost points are mapped back to the boids they are copies of, and
+        edges to points which are not boids (an owner of -1) are ignored.
+        
+        Every edge of the triangulation is stored in both directions, so the
+        neighbours of a boid are the destinations of the edges leaving it.
         """
-        points_seen = []
-        for edge in self.triangulation.edges:
-            if edge.org not in points_seen and not edge.deactivate:
-                connections = edge.find_connections(self.triangulation.edges)
-                self.members[edge.org].neighbours = connections
+        edges = [edge for edge in self.triangulation.edges 
+                 if not edge.deactivate]
+        org = np.fromiter((edge.org for edge in edges), dtype=np.intp, 
+                          count=len(edges))
+        dest = np.fromiter((edge.dest for edge in edges), dtype=np.intp, 
+                           count=len(edges))
+        owner = np.asarray(self.triangulation_owner, dtype=np.intp)
+        is_ghost = np.asarray(self.triangulation_is_ghost, dtype=bool)
+        
+        boid = owner[org]
+        neighbour = owner[dest]
+        keep = ~is_ghost[org] & (neighbour >= 0) & (neighbour != boid)
+        # Sort by boid and remove repeats, e.g. a boid and its ghost
+        pair_ids = np.unique(boid[keep] * self.num + neighbour[keep])
+        self.neighbour_list.set_pairs(pair_ids // self.num, 
+                                      pair_ids % self.num, self.num)
+        self.set_member_neighbours()
                 
     def make_neighbourhoods_basic(self, max_dist=5):
         """
-        Make neighbourhoods using the linear seach algorithm.
+        Make neighbourhoods using the linear seach algorithm. Ghost copies of
+        the boids near the edges of the world are included in the search, so
+        neighbours are also found across the edges of the periodic world.
         """
-        for member in self.members:
-            member.neighbours = []
-            for i, pos in enumerate(self.positions):
+        points, owner = neighbours.add_ghosts(np.asarray(self.positions), 
+                                              self.world, max_dist)
+        points = points.tolist()
+        owner = owner.tolist()
+        # A boid and its ghost can only both be in range for large max_dist
+        check_repeats = 2*max_dist > min(self.world.x_max, self.world.y_max)
+        idx = []
+        nbr = []
+        for k, member in enumerate(self.members):
+            found = []
+            for i, pos in zip(owner, points):
                 diff_x = pos[0] - member.pos[0]
                 diff_y = pos[1] - member.pos[1]
                 distance = sqrt(diff_x**2 + diff_y**2)
                 if 0<distance<max_dist:
-                    # print(i, member.pos, pos)
-                    member.neighbours.append([member.index, i])
+                    if not check_repeats or i not in found:
+                        found.append(i)
+            idx += [k]*len(found)
+            nbr += found
+        self.neighbour_list.set_pairs(np.array(idx, dtype=np.intp), nbr, 
+                                      self.num)
+        self.set_member_neighbours()
+        
+    def set_member_neighbours(self):
+        """
+        Point the neighbours of each Boid class object at its row of 
+        self.neighbour_list. Row k belongs to self.members[k], and the 
+        neighbour indices refer to self.positions and self.velocities.
+        """
+        for k, member in enumerate(self.members):
+            member.neighbours = self.neighbour_list.neighbours_of(k)
+
+    # ------------------------- Vectorised (array) update ---------------------
+
+    def setup_arrays(self):
+        """
+        Copy the positions and velocities of all the boids into contiguous 
+        numpy arrays of shape (N, 2). Row i of each array belongs to the boid 
+        with index i. These arrays are used by the vectorised update, which 
+        applies the boid rules to every boid at once instead of looping over 
+        the Boid class objects.
+        
+        The arrays are double-buffered. Each time-step reads from the current 
+        frame (self.pos_array, self.vel_array) and writes the next frame into 
+        (self.pos_next, self.vel_next). The buffers are then swapped with 
+        swap_buffers(), so no arrays are allocated from frame to frame.
+        """
+        self.pos_array = np.empty((self.num, 2))
+        self.vel_array = np.empty((self.num, 2))
+        self.pos_next = np.empty((self.num, 2))
+        self.vel_next = np.empty((self.num, 2))
+        for boid in self.members:
+            self.pos_array[boid.index] = boid.pos
+            self.vel_array[boid.index] = boid.vel
+            
+    def swap_buffers(self):
+        """
+        Make the next frame written by update_boids_arrays() the current frame.
+        """
+        self.pos_array, self.pos_next = self.pos_next, self.pos_array
+        self.vel_array, self.vel_next = self.vel_next, self.vel_array
+            
+    def update_members(self):
+        """
+        Copy the array positions and velocities back into the Boid class 
+        objects, e.g. so that the boids can be plotted.
+        """
+        for boid in self.members:
+            boid.pos = self.pos_array[boid.index].tolist()
+            boid.vel = self.vel_array[boid.index].tolist()
+        self.get_pos_vel()
+        
+    def find_neighbours_arrays(self, method, max_dist, num_queries=None):
+        """
+        Find all pairs of boids closer than 'max_dist' using the 'method' 
+        neighbour search algorithm.
+
+        Parameters
+        ----------
+        method : str
+            'linear' tests every pair of boids, 'cell_list' only tests boids
+            in neighbouring cells of a uniform grid and 'kd_tree' queries a
+            periodic KD-tree.
+        max_dist : float
+            Maximum distance between two boids for them to be neighbours
+        num_queries : int, optional
+            Only find the neighbours of the first num_queries boids, e.g. 
+            the boids owned by an MPI rank (see domain.Domain). 
+            The default is all of the boids.
+
+        Returns
+        -------
+        idx : numpy.ndarray
+            Boid index of each neighbour pair, sorted
+        nbr : numpy.ndarray
+            Neighbour index of each neighbour pair
+        """
+        if method == 'linear':
+            return neighbours.periodic_search(neighbours.linear_search,
+                                              self.pos_array, max_dist, 
+                                              self.world, num_queries)
+        elif method == 'cell_list':
+            return neighbours.periodic_search(neighbours.cell_list_search,
+                                              self.pos_array, max_dist, 
+                                              self.world, num_queries)
+        elif method == 'kd_tree':
+            return neighbours.kd_tree_search(self.pos_array, max_dist, 
+                                             self.world, num_queries)
+        else:
+            raise ValueError(f"Invalid neighbour search method '{method}'")
+        
+    def make_neighbourhoods_arrays(self, method='linear', skin=0):
+        """
+        Make neighbourhoods for the vectorised update. The neighbour pairs are
+        written into self.neighbour_list.
+
+        Parameters
+        ----------
+        method : str, optional
+            The neighbour search algorithm to use, see find_neighbours_arrays.
+            The default is 'linear'.
+        skin : float, optional
+            If greater than 0, use a Verlet list (see neighbours.VerletList) 
+            with this skin distance. The neighbour search is then only 
+            repeated once a boid has moved more than skin/2. 
+            The default is 0, which searches every time.
+        """
+        if skin <= 0:
+            found = self.find_neighbours_arrays(method, self.vision_distance)
+            self.neighbour_list.set_pairs(*found, self.num)
+            return
+        
+        if self.verlet_list is None or self.verlet_list.skin != skin:
+            self.verlet_list = neighbours.VerletList(skin)
+        verlet = self.verlet_list
+        verlet.num_steps += 1
+        if verlet.needs_rebuild(self.pos_array, self.world):
+            found = self.find_neighbours_arrays(method, 
+                                                self.vision_distance + skin)
+            self.neighbour_list.set_pairs(*found, self.num)
+            verlet.rebuild(self.pos_array)
+        
+    def update_boids_arrays(self, start=0, stop=None):
+        """
+        Vectorised equivalent of calling Boid.update_boid on every boid. All
+        of the boid rules, the speed limit and the periodic boundary 
+        conditions are applied to the whole position and velocity arrays. 
+        
+        The current frame is only read from and the results are written into
+        the next frame buffers. Every boid therefore sees the positions and 
+        velocities of its neighbours from the start of the time-step, and the
+        result does not depend on the order the boids are updated in. This
+        means the boids can be split into slices and updated independently.
+        
+        Displacements between boids use the minimum image convention, so 
+        neighbours found across the edges of the (periodic) world are handled
+        correctly.
+
+        Parameters
+        ----------
+        start : int, optional
+            Index of the first boid to update. The default is 0.
+        stop : int, optional
+            Update boids up to, but not including, this index. 
+            The default is to update up to the last boid.
+        """
+        if stop is None:
+            stop = self.num
+        pos = self.pos_array
+        vel = self.vel_array
+        own_pos = pos[start:stop]
+        own_vel = vel[start:stop]
+        
+        # Select the neighbour pairs of the boids in this slice
+        idx, nbr = self.neighbour_list.pairs(start, stop)
+        
+        diff = rules.displacements(own_pos, pos, idx, nbr, self.world)
+        keep = rules.restrict_fov(own_vel, diff, idx, 
+                                  self.cos_half_fov, self.vision_distance)
+        idx, nbr, diff = idx[keep], nbr[keep], diff[keep]
+        counts = np.bincount(idx, minlength=stop-start)
+        
+        steer = rules.alignment(vel, idx, nbr, counts, 
+                                self.alignment_perception)
+        steer += rules.cohesion(diff, idx, counts, self.cohesion_perception)
+        steer += rules.separation(diff, idx, stop-start, self.safety_zone, 
+                                  self.separation_perception)
+        
+        # Boids without any neighbours keep their current velocity, and like
+        # Boid.update_boid only the steered velocities are speed limited
+        new_vel = self.vel_next[start:stop]
+        new_pos = self.pos_next[start:stop]
+        has_neighbours = counts > 0
+        new_vel[:] = own_vel
+        steered = own_vel[has_neighbours] + steer[has_neighbours]
+        rules.limit_speed(steered, self.max_speed)
+        new_vel[has_neighbours] = steered
+        
+        np.add(own_pos, new_vel, out=new_pos)
+        rules.wrap_world(new_pos, self.world)
+        
+    def update_boids_kernel(self, start=0, stop=None):
+        """
+        Equivalent of update_boids_arrays using the numba compiled kernel 
+        kernels.update_boids, which applies all of the boid rules to each 
+        boid in a single loop over its neighbours.
+        
+        If numba is not installed, this falls back to the reference Boid 
+        class methods (Boid.update_boid), applied to each boid in turn with 
+        the neighbours from self.neighbour_list.
+
+        Parameters
+        ----------
+        start : int, optional
+            Index of the first boid to update. The default is 0.
+        stop : int, optional
+            Update boids up to, but not including, this index. 
+            The default is to update up to the last boid.
+        """
+        if stop is None:
+            stop = self.num
+        if kernels.update_boids is not None:
+            kernels.update_boids(self.pos_array, self.vel_array, 
+                                 self.pos_next, self.vel_next,
+                                 self.neighbour_list.offsets, 
+                                 self.neighbour_list.buffer, start, stop,
+                                 self.world.x_max, self.world.y_max, 
+                                 self.cos_half_fov, self.vision_distance, 
+                                 self.safety_zone, self.alignment_perception, 
+                                 self.cohesion_perception, 
+                                 self.separation_perception, self.max_speed)
+            return
+        
+        positions = self.pos_array.tolist()
+        velocities = self.vel_array.tolist()
+        members = {boid.index: boid for boid in self.members}
+        for i in range(start, stop):
+            boid = members[i]
+            boid.pos = positions[i][:]
+            boid.vel = velocities[i][:]
+            boid.neighbours = self.neighbour_list.neighbours_of(i)
+            boid.update_boid(positions, velocities, self.world)
+            self.pos_next[i] = boid.pos
+            self.vel_next[i] = boid.vel
+        
+    def step_arrays(self, method='linear', skin=0, compiled=False):
+        """
+        Perform a single synchronous time-step of the vectorised boids 
+        simulation, using the 'method' neighbour search algorithm. See
+        make_neighbourhoods_arrays for the 'skin' option. If 'compiled' is 
+        True, the boids are updated with update_boids_kernel instead of 
+        update_boids_arrays.
+        """
+        self.make_neighbourhoods_arrays(method, skin)
+        if compiled:
+            self.update_boids_kernel()
+        else:
+            self.update_boids_arrays()
+        self.swap_buffers()
+        self.step_count += 1
@@ -0,0 +1,150 @@
+"""
+This script contains functions to save the full state of a boids simulation
+to a binary .npz file, and to restore a simulation from that file, so that
+long runs can be restarted after an interruption instead of starting again
+from generate_boids.
+
+The checkpoint stores the positions and velocities of the boids (row i is
+the boid with index i), the rule parameters of the Boids class and of every
+Boid, the size of the world, the step counter and the state of the random
+number generator Boids.rng.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Allow imports from parent folder
+import sys, os
+sys.path.insert(0, os.path.abspath('..'))
+
+# Standard library imports
+import json
+from math import cos
+import numpy as np
+
+# Repo module imports
+from boids_core.boids import World, Boid, Boids
+
+# -----------------------------------------------------------------------------
+
+# Pairs of (options key, attribute name) for the boid rule parameters
+PARAMETERS = [('max_speed', 'max_speed'),
+              ('field_of_view', 'field_of_view'),
+              ('vision_distance', 'vision_distance'),
+              ('safety_zone', 'safety_zone'),
+              ('alignment_perception', 'alignment_perception'),
+              ('cohesion_perception', 'cohesion_perception'),
+              ('seperation_perception', 'separation_perception')]
+
+def set_parameters(obj, values):
+    """
+    Set the rule parameters of a Boid or Boids object from a sequence of
+    values in the order of PARAMETERS.
+    """
+    for (key, attribute), value in zip(PARAMETERS, values):
+        setattr(obj, attribute, float(value))
+    obj.cos_half_fov = cos(obj.field_of_view/2)
+
+def to_list(value):
+    """
+    Convert the numpy arrays and integers in the state of a bit generator,
+    e.g. Philox or MT19937, to lists and ints for json.
+    """
+    return value.tolist()
+
+# ------------------------------ Save and restore -----------------------------
+
+def save_checkpoint(boids, filename):
+    """
+    Save the state of the simulation to 'filename'. The file is written to a
+    temporary file first and then moved into place, so an interruption while
+    saving does not destroy the previous checkpoint.
+
+    Parameters
+    ----------
+    boids : Boids
+        The boids simulation to save
+    filename : str
+        Name of the checkpoint file. '.npz' is added if it is missing.
+    """
+    if not filename.endswith('.npz'):
+        filename += '.npz'
+
+    members = sorted(boids.members, key=lambda boid: boid.index)
+    if boids.pos_array is not None:
+        positions = boids.pos_array
+        velocities = boids.vel_array
+    else:
+        positions = np.array([boid.pos for boid in members], dtype=float)
+        velocities = np.array([boid.vel for boid in members], dtype=float)
+    world = boids.world
+
+    temp_filename = filename + '.tmp'
+    with open(temp_filename, 'wb') as file:
+        np.savez(file,
+                 positions=positions,
+                 velocities=velocities,
+                 param_names=np.array([key for key, attribute in PARAMETERS]),
+                 params=np.array([getattr(boids, attribute)
+                                  for key, attribute in PARAMETERS],
+                                 dtype=float),
+                 boid_params=np.array([[getattr(boid, attribute)
+                                        for key, attribute in PARAMETERS]
+                                       for boid in members], dtype=float),
+                 world=np.array([world.x_min, world.x_max,
+                                 world.y_min, world.y_max]),
+                 step_count=np.array(boids.step_count),
+                 rng_state=np.array(json.dumps(boids.rng.bit_generator.state,
+                                               default=to_list)))
+    os.replace(temp_filename, filename)
+
+def load_checkpoint(filename):
+    """
+    Restore a simulation saved with save_checkpoint.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the checkpoint file
+
+    Returns
+    -------
+    boids : Boids
+        The restored boids, with the same world, parameters, step counter
+        and random number generator state as when they were saved. Call
+        Boids.setup_arrays() to continue with the vectorised update.
+    """
+    with np.load(filename) as data:
+        positions = data['positions'].tolist()
+        velocities = data['velocities'].tolist()
+        options = dict(zip(data['param_names'].tolist(),
+                           data['params'].tolist()))
+        boid_params = data['boid_params']
+        world = World(data['world'].tolist())
+        step_count = int(data['step_count'])
+        rng_state = json.loads(str(data['rng_state']))
+
+    boids = Boids(len(positions), world, options)
+    for i in range(boids.num):
+        boid = Boid(i, positions[i], velocities[i], options)
+        set_parameters(boid, boid_params[i])
+        boids.add_boid(boid)
+    boids.step_count = step_count
+    bit_generator = getattr(np.random, rng_state['bit_generator'])()
+    bit_generator.state = rng_state
+    boids.rng = np.random.Generator(bit_generator)
+    return boids
+
+def periodic_checkpoint(boids, every, filename):
+    """
+    Save a checkpoint if 'every' is greater than zero and the step counter
+    is a multiple of 'every'.
+
+    Returns
+    -------
+    bool
+        True if a checkpoint was saved
+    """
+    if every > 0 and boids.step_count % every == 0:
+        save_checkpoint(boids, filename)
+        return True
+    return False
@@ -0,0 +1,319 @@
+"""
+This script contains a spatial domain decomposition of the vectorised boids
+update for MPI. The world is split into vertical strips, one per rank, and
+each rank only stores and updates the boids inside its own strip. Every
+time-step each rank:
+
+    1. receives a halo of 'ghost' copies of the boids within vision_distance
+       of its strip from the ranks owning them,
+    2. finds the neighbours of its own boids among its boids and the ghosts,
+       and updates its own boids with the vectorised (or compiled) update,
+    3. migrates the boids which have moved out of its strip to the ranks
+       that now own them.
+
+Only the boids near the edges of the strips are communicated, and only
+between nearby ranks, so the work done by each rank scales with N/P rather
+than with N. Halos wider than a strip are sent directly to every rank within
+vision_distance, not forwarded from rank to rank.
+
+The boids are sent as rows of [index, x, y, vx, vy] using the buffer based
+(upper case) mpi4py methods, so the arrays are not pickled.
+
+Example
+-------
+    domain = Domain(comm, boids, method='cell_list')
+    domain.scatter(boids)
+    for i in range(num_steps):
+        domain.step()
+    domain.gather(boids)
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Allow imports from parent folder
+import sys, os
+sys.path.insert(0, os.path.abspath('..'))
+
+# Standard library imports
+from math import ceil
+import numpy as np
+
+# Repo module imports
+from boids_core.boids import Boids
+from boids_core.checkpoint import PARAMETERS
+from boids_core import kernels
+
+# -----------------------------------------------------------------------------
+
+# Number of values stored for each boid: index, x, y, vx and vy
+ROW_SIZE = 5
+
+def pack(indices, positions, velocities):
+    """
+    Pack the boids into a single (N, 5) array of [index, x, y, vx, vy] rows.
+    """
+    rows = np.empty((len(indices), ROW_SIZE))
+    rows[:, 0] = indices
+    rows[:, 1:3] = positions
+    rows[:, 3:5] = velocities
+    return rows
+
+def unpack(rows):
+    """
+    Inverse of pack.
+
+    Returns
+    -------
+    indices, positions, velocities : numpy.ndarray
+    """
+    return (rows[:, 0].astype(np.int64),
+            np.ascontiguousarray(rows[:, 1:3]),
+            np.ascontiguousarray(rows[:, 3:5]))
+
+# ---------------------------- Domain decomposition ---------------------------
+
+class Domain():
+    """
+    The part of the boids owned by one MPI rank, see the module docstring.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Comm
+        The communicator to decompose the boids over
+    boids : Boids
+        Gives the world and the boid rule parameters. The boids themselves
+        are distributed with scatter.
+    method : str, optional
+        Neighbour search algorithm, see Boids.find_neighbours_arrays.
+        The default is 'cell_list'.
+    compiled : bool, optional
+        If True and numba is installed, update the boids with the compiled
+        kernel. The default is False.
+    """
+    def __init__(self, comm, boids, method='cell_list', compiled=False):
+        self.comm = comm
+        self.rank = comm.Get_rank()
+        self.size = comm.Get_size()
+        self.world = boids.world
+        self.method = method
+        self.compiled = compiled and kernels.update_boids is not None
+
+        world = self.world
+        self.world_width = world.x_max - world.x_min
+        self.strip_width = self.world_width / self.size
+        self.x_lo = world.x_min + self.rank*self.strip_width
+        self.halo_width = boids.vision_distance
+        if boids.max_speed >= self.strip_width:
+            raise ValueError("The domain strips must be wider than the boid "
+                             "max speed, use fewer ranks or a wider world")
+
+        # Ranks within halo_width of this strip, as offsets from this rank
+        if self.size > 1:
+            self.num_halo_ranks = min(ceil(self.halo_width/self.strip_width),
+                                      self.size - 1)
+        else:
+            self.num_halo_ranks = 0
+
+        # Local Boids object used for the neighbour search and the update.
+        # Rows [0, num_owned) are the boids owned by this rank, and the rest
+        # are the ghosts of the last halo exchange. Its arrays are views of
+        # the position and velocity buffers, which only grow.
+        options = {key: getattr(boids, attribute)
+                   for key, attribute in PARAMETERS}
+        self.local = Boids(0, world, options)
+        self.buffers = [np.empty((0, 2)) for i in range(4)]
+        self.indices = np.empty(0, dtype=np.int64)
+        self.positions = np.empty((0, 2))
+        self.velocities = np.empty((0, 2))
+        self.num_ghosts = 0
+
+    @property
+    def num_owned(self):
+        return len(self.indices)
+
+    def owner(self, positions):
+        """
+        Rank owning each of the positions.
+        """
+        strip = (positions[:, 0] - self.world.x_min) // self.strip_width
+        return np.clip(strip, 0, self.size - 1).astype(np.int64)
+
+    def distance_to_strip(self, positions, rank):
+        """
+        Periodic distance in x from each position to the strip of 'rank'.
+        The distance is 0 inside the strip.
+        """
+        x_lo = self.world.x_min + rank*self.strip_width
+        dx = (positions[:, 0] - x_lo) % self.world_width
+        outside = np.minimum(dx - self.strip_width, self.world_width - dx)
+        return np.where(dx < self.strip_width, 0, outside)
+
+    # ----------------------------- Communication -----------------------------
+
+    def sendrecv(self, rows, dest, source):
+        """
+        Send the (N, 5) array 'rows' to rank 'dest', and receive an array of
+        rows from rank 'source'. The number of rows is sent first, so the
+        receive buffer can be allocated.
+        """
+        count = np.zeros(1, dtype=np.int64)
+        self.comm.Sendrecv(np.array([len(rows)], dtype=np.int64), dest=dest,
+                           recvbuf=count, source=source)
+        received = np.empty((count[0], ROW_SIZE))
+        self.comm.Sendrecv(np.ascontiguousarray(rows), dest=dest,
+                           recvbuf=received, source=source)
+        return received
+
+    def scatter(self, boids, root=0):
+        """
+        Distribute the boids of the Boids object on rank 'root' to the ranks
+        owning them. The Boids objects on the other ranks are not used.
+        """
+        if self.rank == root:
+            if boids.pos_array is not None:
+                positions = boids.pos_array
+                velocities = boids.vel_array
+            else:
+                members = sorted(boids.members, key=lambda boid: boid.index)
+                positions = np.array([boid.pos for boid in members],
+                                     dtype=float)
+                velocities = np.array([boid.vel for boid in members],
+                                      dtype=float)
+            rows = pack(np.arange(len(positions)), positions, velocities)
+            owner = self.owner(positions)
+            # Group the rows by rank, keeping them in order of index
+            rows = rows[np.argsort(owner, kind='stable')]
+            counts = np.bincount(owner, minlength=self.size) * ROW_SIZE
+            data = [rows, counts]
+        else:
+            counts = None
+            data = None
+        count = np.zeros(1, dtype=np.int64)
+        self.comm.Scatter(counts, count, root=root)
+        received = np.empty((count[0]//ROW_SIZE, ROW_SIZE))
+        self.comm.Scatterv(data, received, root=root)
+        self.indices, self.positions, self.velocities = unpack(received)
+
+    def gather(self, boids, root=0):
+        """
+        Gather the positions and velocities of all of the boids into the
+        arrays of the Boids object on rank 'root' (see Boids.setup_arrays),
+        e.g. for plotting or checkpoints.
+        """
+        rows = pack(self.indices, self.positions, self.velocities)
+        counts = np.zeros(self.size, dtype=np.int64)
+        self.comm.Gather(np.array([rows.size], dtype=np.int64), counts, 
+                         root=root)
+        if self.rank == root:
+            received = np.empty((counts.sum()//ROW_SIZE, ROW_SIZE))
+            self.comm.Gatherv(rows, [received, counts], root=root)
+            indices, positions, velocities = unpack(received)
+            if boids.pos_array is None:
+                boids.setup_arrays()
+            boids.pos_array[indices] = positions
+            boids.vel_array[indices] = velocities
+        else:
+            self.comm.Gatherv(rows, None, root=root)
+
+    def exchange_halo(self):
+        """
+        Send the boids within halo_width of the strips of the other ranks to
+        them, and receive the ghost boids near this strip.
+
+        Returns
+        -------
+        rows : numpy.ndarray
+            (G, 5) array of the ghost boids
+        """
+        rows = pack(self.indices, self.positions, self.velocities)
+        received = []
+        for shift in range(1, self.num_halo_ranks + 1):
+            for dest, source in ((self.rank - shift, self.rank + shift),
+                                 (self.rank + shift, self.rank - shift)):
+                dest %= self.size
+                source %= self.size
+                near = self.distance_to_strip(self.positions, dest)
+                near = near <= self.halo_width
+                received.append(self.sendrecv(rows[near], dest, source))
+        if not received:
+            return np.empty((0, ROW_SIZE))
+
+        # With few ranks the same ghost can arrive from both directions
+        ghosts = np.concatenate(received)
+        unique, first = np.unique(ghosts[:, 0], return_index=True)
+        return ghosts[np.sort(first)]
+
+    def migrate(self):
+        """
+        Send the boids which have left this strip to the rank that now owns
+        them, and receive the boids which have entered it. The boids cannot
+        move further than the neighbouring strip in a single time-step.
+        """
+        if self.size == 1:
+            return
+        owner = self.owner(self.positions)
+        rows = pack(self.indices, self.positions, self.velocities)
+        stay = owner == self.rank
+        kept = [rows[stay]]
+        sent = np.count_nonzero(stay)
+        for shift in sorted({1, self.size - 1}):
+            dest = (self.rank + shift) % self.size
+            source = (self.rank - shift) % self.size
+            leaving = owner == dest
+            sent += np.count_nonzero(leaving)
+            kept.append(self.sendrecv(rows[leaving], dest, source))
+        if sent != len(rows):
+            raise RuntimeError("A boid moved further than the neighbouring "
+                               "domain in one time-step")
+        self.indices, self.positions, self.velocities = unpack(
+            np.concatenate(kept))
+
+    # -------------------------------- Update ---------------------------------
+
+    def setup_local(self, ghosts):
+        """
+        Point the arrays of the local Boids object at the first rows of the 
+        buffers, growing them if needed, and copy in the owned boids followed
+        by the ghosts.
+        """
+        num_owned = self.num_owned
+        num = num_owned + len(ghosts)
+        capacity = len(self.buffers[0])
+        if capacity < num:
+            capacity = max(num, 2*capacity)
+            self.buffers = [np.empty((capacity, 2)) for i in range(4)]
+
+        local = self.local
+        local.num = num
+        (local.pos_array, local.vel_array,
+         local.pos_next, local.vel_next) = [buffer[:num]
+                                            for buffer in self.buffers]
+        local.pos_array[:num_owned] = self.positions
+        local.pos_array[num_owned:] = ghosts[:, 1:3]
+        local.vel_array[:num_owned] = self.velocities
+        local.vel_array[num_owned:] = ghosts[:, 3:5]
+
+    def step(self):
+        """
+        Perform a single time-step of the boids owned by this rank. The ghosts
+        are only neighbours, so only the owned boids are searched for 
+        neighbours and updated.
+        """
+        ghosts = self.exchange_halo()
+        num_owned = self.num_owned
+        self.num_ghosts = len(ghosts)
+        self.setup_local(ghosts)
+
+        local = self.local
+        found = local.find_neighbours_arrays(self.method, 
+                                             local.vision_distance,
+                                             num_queries=num_owned)
+        local.neighbour_list.set_pairs(*found, local.num)
+        if self.compiled:
+            local.update_boids_kernel(0, num_owned)
+        else:
+            local.update_boids_arrays(0, num_owned)
+        self.positions = local.pos_next[:num_owned]
+        self.velocities = local.vel_next[:num_owned]
+
+        self.migrate()
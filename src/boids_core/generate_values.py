@@ -17,7 +17,7 @@ The following functions are used to generate the inital values for the
 position of each point.
 """
 
-def random(num_points, span):
+def random(num_points, span, rng=None):
     """
     This function generates a set of random x and y coordinates using the 
     numpy uniform random number generator 'numpy.random.default_rng().uniform'.
@@ -28,6 +28,8 @@ def random(num_points, span):
         The number of points to generate
     span : World class
         The world defines the range of values the coordinates can have
+    rng : numpy.random.Generator, optional
+        The random number generator to use. The default is a new generator.
 
     Returns
     -------
@@ -35,15 +37,17 @@ def random(num_points, span):
         A list of length num_points, where each element is a point
         e.g. [ [x1, y1], [x2, y2], ... [xn, yn] ]
     """
-    x_vals = default_rng().uniform(span.x_min, span.x_max, num_points)
-    y_vals = default_rng().uniform(span.y_min, span.y_max, num_points)
+    if rng is None:
+        rng = default_rng()
+    x_vals = rng.uniform(span.x_min, span.x_max, num_points)
+    y_vals = rng.uniform(span.y_min, span.y_max, num_points)
     pts = [list(i) for i in zip(x_vals.tolist(), y_vals.tolist())]
     
     # Alternative version to return numpy array
     # pts = np.concatenate((x_vals, y_vals)).reshape(-1, 2)
     return pts
 
-def lattice(num_points, span):
+def lattice(num_points, span, rng=None):
     """
     This function generates a set of points which are set on a grid. The points
     are spaced equally in x and y using the numpy.linspace function. To have
@@ -57,6 +61,9 @@ def lattice(num_points, span):
         The number of points to generate
     span : World class
         The world defines the range of values the coordinates can have
+    rng : numpy.random.Generator, optional
+        The random number generator used to remove points. The default is the
+        global numpy random state.
 
     Returns
     -------
@@ -64,6 +71,8 @@ def lattice(num_points, span):
         A list of length num_points, where each element is a point
         e.g. [ [x1, y1], [x2, y2], ... [xn, yn] ]
     """
+    if rng is None:
+        rng = np.random
     num_sqrt = ceil(sqrt(num_points))
     x_vals = np.linspace(span.x_min, span.x_max, num_sqrt)
     y_vals = np.linspace(span.y_min, span.y_max, num_sqrt)
@@ -74,14 +83,16 @@ def lattice(num_points, span):
     if not sqrt(num_points).is_integer():
         current_num = len(pts)
         to_remove = current_num - num_points
-        indices = np.random.choice(current_num, to_remove, replace=False)
+        indices = rng.choice(current_num, to_remove, replace=False)
         pts = [i for j, i in enumerate(pts) if j not in indices]
     return pts
 
-def noisy_lattice(num_points, span, noise_level=5):
-    pts = np.asarray(lattice(num_points, span))
-    x_noise = np.random.normal(0, noise_level, num_points)
-    y_noise = np.random.normal(0, noise_level, num_points)
+def noisy_lattice(num_points, span, noise_level=5, rng=None):
+    if rng is None:
+        rng = np.random
+    pts = np.asarray(lattice(num_points, span, rng))
+    x_noise = rng.normal(0, noise_level, num_points)
+    y_noise = rng.normal(0, noise_level, num_points)
     
     pts[:, 0] += x_noise
     pts[:, 1] += y_noise
@@ -113,7 +124,7 @@ def polar_to_cart(radius, angle):
 
 # --------------------------- Velocities generators ---------------------------
 
-def random_velocities(num_vals, max_speed):
+def random_velocities(num_vals, max_speed, rng=None):
     """
     Returns an list of random velocities for 'num_vals' many particles.
     Firstly a distribution of scalar speeds is generated, along with an
@@ -126,14 +137,18 @@ def random_velocities(num_vals, max_speed):
         The number of particles to generate velocities for.
     max_speed : int, float
         The maximum scalar speed allowed.
+    rng : numpy.random.Generator, optional
+        The random number generator to use. The default is a new generator.
         
     Returns
     -------
     velocities : lists of lists
         [ [x1, y1], [x2, y2], ... [xn, yn] ]
     """
-    speeds = default_rng().uniform(-max_speed, max_speed, num_vals)
-    angles = default_rng().uniform(0, 2*pi, num_vals)
+    if rng is None:
+        rng = default_rng()
+    speeds = rng.uniform(-max_speed, max_speed, num_vals)
+    angles = rng.uniform(0, 2*pi, num_vals)
     velocities = polar_to_cart(speeds, angles)
     return velocities
 
@@ -0,0 +1,116 @@
+"""
+This script contains a compiled kernel for the combined boid update. The
+kernel applies the field of view filter, the alignment, cohesion and
+separation rules, the speed limit and the periodic boundary conditions to
+each boid in a single loop over its neighbours, reading the neighbours from
+the compressed sparse row arrays of a NeighbourList (see 'neighbours.py').
+
+The kernel is compiled with numba when it is installed. numba is optional;
+when it is missing update_boids is None, and Boids.update_boids_kernel falls
+back to the reference Boid class methods.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Standard library imports
+from math import sqrt
+import numpy as np
+
+# Optional imports
+try:
+    import numba
+    from numba import prange
+except ImportError:
+    numba = None
+    prange = range
+
+# ---------------------------------- Kernels ----------------------------------
+
+def _update_boids(pos, vel, new_pos, new_vel, offsets, indices, start, stop,
+                  x_max, y_max, cos_half_fov, vision_distance, safety_zone,
+                  alignment_perception, cohesion_perception,
+                  separation_perception, max_speed):
+    """
+    Update the boids from start up to stop for a single time-step. This gives
+    the same result as Boids.update_boids_arrays, reading from the current
+    frame (pos, vel) and writing into the next frame (new_pos, new_vel).
+
+    Parameters
+    ----------
+    pos, vel : numpy.ndarray
+        Arrays of shape (N, 2) of the current positions and velocities
+    new_pos, new_vel : numpy.ndarray
+        Arrays of shape (N, 2) to write the next positions and velocities to
+    offsets, indices : numpy.ndarray
+        The CSR neighbour arrays, see neighbours.NeighbourList
+    start, stop : int
+        Update the boids from start up to, but not including, stop
+    x_max, y_max : float
+        Size of the periodic world. Like Boid.wrap_world and rules.wrap_world,
+        the world is assumed to start at the origin (x_min = y_min = 0), so
+        the positions are wrapped into [0, x_max) and [0, y_max).
+    The remaining parameters are the boid rule parameters, see Boids.
+    """
+    fov_limit = cos_half_fov * abs(cos_half_fov)
+    vision_sq = vision_distance**2
+    safety_sq = safety_zone**2
+    for i in prange(start, stop):
+        px = pos[i, 0]
+        py = pos[i, 1]
+        vx = vel[i, 0]
+        vy = vel[i, 1]
+        speed_sq = vx*vx + vy*vy
+
+        count = 0
+        num_close = 0
+        ali_x = ali_y = coh_x = coh_y = sep_x = sep_y = 0.0
+        for k in range(offsets[i], offsets[i+1]):
+            j = indices[k]
+            # Minimum image displacement to the neighbour
+            dx = pos[j, 0] - px
+            dy = pos[j, 1] - py
+            dx -= x_max * np.rint(dx / x_max)
+            dy -= y_max * np.rint(dy / y_max)
+
+            # Field of view and vision distance, see rules.restrict_fov
+            dist_sq = dx*dx + dy*dy
+            if not (0 < dist_sq < vision_sq):
+                continue
+            dot = vx*dx + vy*dy
+            if speed_sq > 0 and dot*abs(dot) <= fov_limit*speed_sq*dist_sq:
+                continue
+
+            count += 1
+            ali_x += vel[j, 0]
+            ali_y += vel[j, 1]
+            coh_x += dx
+            coh_y += dy
+            if dist_sq < safety_sq:
+                num_close += 1
+                dist = sqrt(dist_sq)
+                sep_x -= dx / dist
+                sep_y -= dy / dist
+
+        # Boids without any neighbours keep their current velocity
+        if count > 0:
+            vx += (alignment_perception * ali_x / count +
+                   cohesion_perception * coh_x / count)
+            vy += (alignment_perception * ali_y / count +
+                   cohesion_perception * coh_y / count)
+            if num_close > 0:
+                vx += separation_perception * sep_x / num_close
+                vy += separation_perception * sep_y / num_close
+            speed = sqrt(vx*vx + vy*vy)
+            if speed > max_speed:
+                vx *= max_speed / speed
+                vy *= max_speed / speed
+
+        new_vel[i, 0] = vx
+        new_vel[i, 1] = vy
+        new_pos[i, 0] = (px + vx) % x_max
+        new_pos[i, 1] = (py + vy) % y_max
+
+if numba is not None:
+    update_boids = numba.njit(parallel=True, cache=True)(_update_boids)
+else:
+    update_boids = None
@@ -0,0 +1,493 @@
+"""
+This script contains the neighbour search algorithms used by the vectorised
+boids update. Each search function takes a (N, 2) numpy array of positions
+and returns the neighbour pairs as two integer arrays 'idx' and 'nbr', sorted
+by 'idx'. These pairs are stored in a NeighbourList, in compressed sparse 
+row form, which the boid rules read from. See 'rules.py' for how the pairs 
+are used.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Standard library imports
+import numpy as np
+
+# Optional imports
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# ------------------------------ Ghost boids ----------------------------------
+
+def add_ghosts(positions, world, width):
+    """
+    The boids world is periodic, so a boid near one edge should see the boids
+    near the opposite edge. This function makes 'ghost' copies of the boids 
+    within 'width' of an edge of the world, shifted by the world size to lie 
+    just outside the opposite edge. Boids near a corner get three ghosts.
+    Only a band of boids near the edges is copied, rather than the whole world.
+
+    Parameters
+    ----------
+    positions : numpy.ndarray
+        Array of shape (N, 2) of boid positions
+    world : boids.World
+        The world the boids live in
+    width : float
+        Width of the band of boids to copy, normally the neighbour distance
+
+    Returns
+    -------
+    points : numpy.ndarray
+        Array of shape (N+G, 2), the N boid positions followed by the G ghosts
+    owner : numpy.ndarray
+        Array of length N+G, the index of the boid each point is a copy of
+    """
+    num = len(positions)
+    x_vals = positions[:, 0]
+    y_vals = positions[:, 1]
+    every = np.ones(num, dtype=bool)
+    shifts_x = [(0, every),
+                (world.x_max, x_vals < width),
+                (-world.x_max, x_vals >= world.x_max - width)]
+    shifts_y = [(0, every),
+                (world.y_max, y_vals < width),
+                (-world.y_max, y_vals >= world.y_max - width)]
+    
+    points = [positions]
+    owner = [np.arange(num)]
+    for shift_x, near_x in shifts_x:
+        for shift_y, near_y in shifts_y:
+            if shift_x == 0 and shift_y == 0:
+                continue
+            copied = np.nonzero(near_x & near_y)[0]
+            points.append(positions[copied] + [shift_x, shift_y])
+            owner.append(copied)
+    return np.concatenate(points), np.concatenate(owner)
+
+def periodic_search(search, positions, max_dist, world, num_queries=None,
+                    **kwargs):
+    """
+    Run one of the non-periodic searches below on the boids plus their ghosts
+    (see add_ghosts), so neighbours are also found across the edges of the 
+    world. The neighbours found are mapped from the ghosts back to the boids
+    they are copies of.
+
+    Parameters
+    ----------
+    search : function
+        linear_search or cell_list_search
+    positions : numpy.ndarray
+        Array of shape (N, 2) of boid positions
+    max_dist : float
+        Maximum distance between two boids for them to be neighbours
+    world : boids.World
+        The world the boids live in
+    num_queries : int, optional
+        Only find the neighbours of the first num_queries boids. 
+        The default is all of the boids.
+    **kwargs
+        Passed on to the search function
+
+    Returns
+    -------
+    idx : numpy.ndarray
+        Boid index of each neighbour pair
+    nbr : numpy.ndarray
+        Neighbour index of each neighbour pair
+    """
+    num = len(positions)
+    if num_queries is None:
+        num_queries = num
+    points, owner = add_ghosts(positions, world, max_dist)
+    idx, nbr = search(points, max_dist, num_queries=num_queries, **kwargs)
+    nbr = owner[nbr]
+    
+    # With a large max_dist, a boid and its ghost can both be in range
+    if 2*max_dist > min(world.x_max, world.y_max):
+        keep = idx != nbr
+        pairs = np.unique(idx[keep]*num + nbr[keep])
+        idx, nbr = np.divmod(pairs, num)
+    return idx, nbr
+
+# --------------------------------- Searches ----------------------------------
+
+def linear_search(positions, max_dist, num_queries=None, block_size=None):
+    """
+    Vectorised version of Boids.make_neighbourhoods_basic. Every pair of boids
+    is tested, so this is still an O(N**2) algorithm. To limit the memory
+    used, the distance matrix is calculated for a block of rows at a time.
+
+    Parameters
+    ----------
+    positions : numpy.ndarray
+        Array of shape (N, 2) of boid positions
+    max_dist : float
+        Maximum distance between two boids for them to be neighbours
+    num_queries : int, optional
+        Only find the neighbours of the first num_queries boids. 
+        The default is to find the neighbours of all boids.
+    block_size : int, optional
+        Number of rows of the distance matrix calculated at once.
+        The default uses blocks of roughly 4 million elements.
+
+    Returns
+    -------
+    idx : numpy.ndarray
+        Boid index of each neighbour pair
+    nbr : numpy.ndarray
+        Neighbour index of each neighbour pair
+    """
+    num = len(positions)
+    if num_queries is None:
+        num_queries = num
+    if block_size is None:
+        block_size = max(1, 2**22 // max(num, 1))
+    max_dist_sq = max_dist**2
+
+    idx_blocks = []
+    nbr_blocks = []
+    for start in range(0, num_queries, block_size):
+        block = positions[start:min(start+block_size, num_queries)]
+        diff = positions[None, :, :] - block[:, None, :]
+        dist_sq = diff[:, :, 0]**2 + diff[:, :, 1]**2
+        rows, cols = np.nonzero((0 < dist_sq) & (dist_sq < max_dist_sq))
+        idx_blocks.append(rows + start)
+        nbr_blocks.append(cols)
+
+    if not idx_blocks:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    return np.concatenate(idx_blocks), np.concatenate(nbr_blocks)
+
+def cell_list_search(positions, max_dist, num_queries=None, block_size=None):
+    """
+    Neighbour search using a uniform grid of cells (a cell list). The area 
+    covered by the boids is divided into cells which are at least 'max_dist' 
+    wide, so all of the neighbours of a boid are found in the 3x3 block of 
+    cells surrounding the cell the boid is in. Only these cells are tested, 
+    giving roughly an O(N) search for a fixed density of boids.
+    
+    The boids are binned with a radix sort of their cell indices, made of 
+    stable sorts of the low and high 16 bits. numpy sorts 16 bit integers 
+    with a counting sort, so the binning is O(N), unlike a comparison sort of 
+    the cell indices. The number of boids in each cell is counted with 
+    np.bincount. After binning, the boids in cell c are 
+    order[cell_start[c]:cell_start[c]+cell_count[c]].
+
+    Parameters
+    ----------
+    positions : numpy.ndarray
+        Array of shape (N, 2) of boid positions
+    max_dist : float
+        Maximum distance between two boids for them to be neighbours
+    num_queries : int, optional
+        Only find the neighbours of the first num_queries boids. 
+        The default is to find the neighbours of all boids.
+    block_size : int, optional
+        Number of boids to find candidate neighbours for at once.
+        The default limits the candidate arrays to roughly 4 million elements.
+
+    Returns
+    -------
+    idx : numpy.ndarray
+        Boid index of each neighbour pair
+    nbr : numpy.ndarray
+        Neighbour index of each neighbour pair
+    """
+    num = len(positions)
+    if num_queries is None:
+        num_queries = num
+    if num == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    
+    # Bin the boids into cells
+    lower = positions.min(axis=0)
+    span = positions.max(axis=0) - lower
+    nx = max(1, int(span[0] // max_dist))
+    ny = max(1, int(span[1] // max_dist))
+    scale_x = nx / span[0] if span[0] > 0 else 0
+    scale_y = ny / span[1] if span[1] > 0 else 0
+    cx = np.minimum(((positions[:, 0]-lower[0]) * scale_x).astype(np.intp), nx-1)
+    cy = np.minimum(((positions[:, 1]-lower[1]) * scale_y).astype(np.intp), ny-1)
+    cell = cx*ny + cy
+    cell_count = np.bincount(cell, minlength=nx*ny)
+    cell_start = np.cumsum(cell_count) - cell_count
+    order = np.argsort((cell & 0xFFFF).astype(np.uint16), kind='stable')
+    if nx*ny > 2**16:
+        high = (cell[order] >> 16).astype(np.uint16)
+        order = order[np.argsort(high, kind='stable')]
+    
+    # The 3x3 block of cells around the cell of each boid
+    off_x, off_y = np.meshgrid([-1, 0, 1], [-1, 0, 1], indexing='ij')
+    off_x = off_x.ravel()
+    off_y = off_y.ravel()
+    
+    if block_size is None:
+        mean_candidates = 9 * num / (nx*ny) + 1
+        block_size = max(1, int(2**22 // mean_candidates))
+    max_dist_sq = max_dist**2
+    
+    idx_blocks = []
+    nbr_blocks = []
+    for start in range(0, num_queries, block_size):
+        boids = np.arange(start, min(start+block_size, num_queries))
+        ncx = cx[boids, None] + off_x
+        ncy = cy[boids, None] + off_y
+        valid = (0 <= ncx) & (ncx < nx) & (0 <= ncy) & (ncy < ny)
+        ncell = np.where(valid, ncx*ny + ncy, 0).ravel()
+        ncount = np.where(valid.ravel(), cell_count[ncell], 0)
+        
+        # Expand every (boid, cell) pair into (boid, candidate) pairs
+        total = ncount.sum()
+        first = np.cumsum(ncount) - ncount
+        within = np.arange(total) - np.repeat(first, ncount)
+        idx = np.repeat(np.repeat(boids, 9), ncount)
+        nbr = order[np.repeat(cell_start[ncell], ncount) + within]
+        
+        diff = positions[nbr] - positions[idx]
+        dist_sq = diff[:, 0]**2 + diff[:, 1]**2
+        close = (0 < dist_sq) & (dist_sq < max_dist_sq)
+        idx_blocks.append(idx[close])
+        nbr_blocks.append(nbr[close])
+    
+    if not idx_blocks:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    return np.concatenate(idx_blocks), np.concatenate(nbr_blocks)
+
+def kd_tree_search(positions, max_dist, world, num_queries=None, 
+                   block_size=None):
+    """
+    Neighbour search using a KD-tree, giving an O(N log N) search which is 
+    not affected by how clustered the boids are. The tree is built once for 
+    all boids. The boids are then queried in blocks, each block in a single 
+    query of a small tree of the block against the tree of all boids 
+    (cKDTree.sparse_distance_matrix). Only the pairs of one block are held 
+    at a time, so like the other searches the memory used is bounded by 
+    block_size, rather than by the total number of pairs.
+    
+    The tree is periodic, matching the wrap around of Boid.wrap_world, so 
+    boids near one edge of the world find neighbours near the opposite edge.
+    Use the minimum image convention (rules.displacements) to find the 
+    displacement between these boids.
+
+    Parameters
+    ----------
+    positions : numpy.ndarray
+        Array of shape (N, 2) of boid positions
+    max_dist : float
+        Maximum distance between two boids for them to be neighbours
+    world : boids.World
+        The world the boids live in
+    num_queries : int, optional
+        Only find the neighbours of the first num_queries boids. 
+        The default is all of the boids.
+    block_size : int, optional
+        Number of boids to query at once. The default limits the pairs 
+        found by each query to roughly 4 million.
+
+    Returns
+    -------
+    idx : numpy.ndarray
+        Boid index of each neighbour pair
+    nbr : numpy.ndarray
+        Neighbour index of each neighbour pair
+    """
+    if cKDTree is None:
+        raise ImportError("The 'kd_tree' neighbour search requires scipy")
+    
+    # The periodic tree needs all points inside [0, world size)
+    box = np.array([world.x_max, world.y_max], dtype=float)
+    data = np.mod(positions, box)
+    data[data >= box] = 0
+    
+    num = len(positions)
+    if num_queries is None:
+        num_queries = num
+    if block_size is None:
+        mean_pairs = np.pi * max_dist**2 * num / (box[0]*box[1]) + 1
+        block_size = max(1, int(2**22 // mean_pairs))
+    
+    tree = cKDTree(data, boxsize=box)
+    idx_blocks = []
+    nbr_blocks = []
+    for start in range(0, num_queries, block_size):
+        stop = min(start+block_size, num_queries)
+        block = cKDTree(data[start:stop], boxsize=box)
+        pairs = block.sparse_distance_matrix(tree, max_dist, 
+                                             output_type='ndarray')
+        
+        # Remove boids at exactly max_dist, or at the same position
+        close = (0 < pairs['v']) & (pairs['v'] < max_dist)
+        pairs = pairs[close]
+        order = np.argsort(pairs['i'], kind='stable')
+        idx_blocks.append(pairs['i'][order] + start)
+        nbr_blocks.append(pairs['j'][order])
+    
+    if not idx_blocks:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    return np.concatenate(idx_blocks), np.concatenate(nbr_blocks)
+
+# ------------------------------ Neighbour lists ------------------------------
+
+class NeighbourList():
+    """
+    Compressed sparse row (CSR) storage of the neighbours of every boid. The 
+    neighbours of boid i are indices[offsets[i]:offsets[i+1]], so each 
+    neighbour pair takes 4 bytes instead of a Python list [i, j]. Every 
+    neighbour search writes its pairs into a NeighbourList with set_pairs(), 
+    and the rules read them back with pairs() or neighbours_of().
+    
+    The index buffer is kept between frames and only grows, so no memory is
+    allocated once the number of pairs has settled down. The offsets and the 
+    buffer are written in place, so they can be replaced by other arrays, 
+    e.g. in shared memory (see parallel.ParallelUpdater). A larger buffer is 
+    made by calling allocate(capacity, dtype), np.empty by default.
+    
+    Attributes
+    ----------
+    offsets : numpy.ndarray
+        Integer array of length num_boids + 1, the start of the neighbours of
+        each boid in indices. offsets[-1] is the total number of pairs.
+    indices : numpy.ndarray
+        The int32 neighbour indices, grouped by boid
+    """
+    def __init__(self, num_boids=0):
+        self.offsets = np.zeros(num_boids + 1, dtype=np.int64)
+        self.buffer = np.empty(0, dtype=np.int32)
+        self.allocate = np.empty
+        
+    def __len__(self):
+        return int(self.offsets[-1])
+    
+    @property
+    def num_boids(self):
+        return len(self.offsets) - 1
+    
+    @property
+    def indices(self):
+        return self.buffer[:len(self)]
+    
+    def set_pairs(self, idx, nbr, num_boids):
+        """
+        Replace the stored neighbours with the pairs (idx[k], nbr[k]), as 
+        returned by the neighbour searches.
+
+        Parameters
+        ----------
+        idx : numpy.ndarray
+            Boid index of each neighbour pair, sorted
+        nbr : numpy.ndarray
+            Neighbour index of each neighbour pair
+        num_boids : int
+            The total number of boids
+        """
+        if len(self.offsets) != num_boids + 1:
+            self.offsets = np.zeros(num_boids + 1, dtype=np.int64)
+        counts = np.bincount(idx, minlength=num_boids)
+        np.cumsum(counts, out=self.offsets[1:])
+        if len(self.buffer) < len(nbr):
+            self.buffer = self.allocate(max(len(nbr), 2*len(self.buffer)), 
+                                        dtype=np.int32)
+        self.buffer[:len(nbr)] = nbr
+        
+    def neighbours_of(self, i):
+        """
+        Returns
+        -------
+        numpy.ndarray
+            View of the neighbour indices of boid i
+        """
+        return self.buffer[self.offsets[i]:self.offsets[i+1]]
+        
+    def counts(self, start=0, stop=None):
+        """
+        Returns
+        -------
+        numpy.ndarray
+            Number of neighbours of each boid from start up to stop
+        """
+        if stop is None:
+            stop = self.num_boids
+        return np.diff(self.offsets[start:stop+1])
+    
+    def pairs(self, start=0, stop=None):
+        """
+        Expand the neighbours of the boids from start up to stop into pairs.
+
+        Returns
+        -------
+        idx : numpy.ndarray
+            Index of the boid of each pair, counted from start
+        nbr : numpy.ndarray
+            View of the neighbour indices of each pair
+        """
+        if stop is None:
+            stop = self.num_boids
+        idx = np.repeat(np.arange(stop - start), self.counts(start, stop))
+        nbr = self.buffer[self.offsets[start]:self.offsets[stop]]
+        return idx, nbr
+
+# ------------------------------- Verlet lists --------------------------------
+
+class VerletList():
+    """
+    Keep track of when neighbour pairs can be reused over multiple frames. 
+    The neighbours are found with a radius of max_dist + skin. As long as no 
+    boid has moved more than skin/2 since the neighbours were found, no pair 
+    of boids can have moved from further than max_dist + skin to closer than 
+    max_dist, so the stored pairs still contain every neighbour. The rules 
+    remove the extra pairs beyond max_dist (see rules.restrict_fov).
+    
+    The pairs themselves are kept in the NeighbourList they were written to,
+    which is simply not overwritten until the next rebuild.
+    
+    Attributes
+    ----------
+    skin : float
+        The extra search distance
+    num_builds : int
+        Number of times the neighbour pairs have been rebuilt
+    num_steps : int
+        Number of times the neighbour pairs have been requested
+    """
+    def __init__(self, skin):
+        self.skin = skin
+        self.ref_positions = None
+        self.num_builds = 0
+        self.num_steps = 0
+        
+    def needs_rebuild(self, positions, world):
+        """
+        Test if any boid has moved more than skin/2 since the last rebuild. 
+        Displacements use the minimum image convention, so boids which wrap
+        around the edge of the world are not counted as having moved far.
+        """
+        if self.ref_positions is None or len(positions) != len(self.ref_positions):
+            return True
+        moved = positions - self.ref_positions
+        moved[:, 0] -= world.x_max * np.round(moved[:, 0] / world.x_max)
+        moved[:, 1] -= world.y_max * np.round(moved[:, 1] / world.y_max)
+        max_moved_sq = np.max(moved[:, 0]**2 + moved[:, 1]**2, initial=0)
+        return max_moved_sq > (self.skin/2)**2
+    
+    def rebuild(self, positions):
+        """
+        Record the positions that new neighbour pairs, found with a radius of
+        max_dist + skin, were found for.
+        """
+        if self.ref_positions is None or len(positions) != len(self.ref_positions):
+            self.ref_positions = np.empty_like(positions)
+        np.copyto(self.ref_positions, positions)
+        self.num_builds += 1
+        
+    def rebuild_rate(self):
+        """
+        Returns
+        -------
+        float
+            Fraction of steps where the neighbour pairs were rebuilt
+        """
+        if self.num_steps == 0:
+            return 0
+        return self.num_builds / self.num_steps
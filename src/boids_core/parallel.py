@@ -0,0 +1,335 @@
+"""
+This script contains a parallel version of the vectorised boids update for a
+single machine, using a persistent pool of worker processes. Python threads
+cannot run the update in parallel because of the GIL, so processes are used
+instead.
+
+The position, velocity and neighbour arrays are kept in
+multiprocessing.shared_memory blocks, which the Boids arrays and every worker
+view directly. Each time-step the main process finds the neighbours, which
+the neighbour search writes straight into shared memory, then each worker
+updates a slice of the boids with Boids.update_boids_arrays (or
+update_boids_kernel). Only a few integers are sent to the workers each
+time-step, the arrays themselves are never pickled or copied.
+
+Example
+-------
+    boids.setup_arrays()
+    with ParallelUpdater(boids, num_workers=4) as updater:
+        for i in range(num_steps):
+            updater.step(method='cell_list')
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Allow imports from parent folder
+import sys, os
+sys.path.insert(0, os.path.abspath('..'))
+
+# Standard library imports
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+# Repo module imports
+from boids_core.boids import World, Boid, Boids
+from boids_core.checkpoint import PARAMETERS
+
+# ------------------------------ Shared arrays --------------------------------
+
+def create_shared(shape, dtype):
+    """
+    Create a shared memory block holding an array of 'shape' and 'dtype'.
+
+    Returns
+    -------
+    shm : multiprocessing.shared_memory.SharedMemory
+        The shared memory block
+    array : numpy.ndarray
+        Array viewing the shared memory
+    """
+    size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def attach_shared(name, shape, dtype):
+    """
+    Attach to an existing shared memory block created by create_shared.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+# --------------------------------- Workers -----------------------------------
+
+def worker(conn, num_boids, world_size, options, compiled, names):
+    """
+    Main loop of a worker process. The worker keeps its own Boids object
+    whose arrays view the shared memory blocks, and waits for commands from
+    the main process:
+
+    ('update', current, start, stop)
+        Update boids start to stop, reading from buffer 'current' (0 or 1)
+        and writing into the other buffer.
+    ('indices', name, capacity)
+        The neighbour indices have moved to a new, larger block. Release the
+        old block and attach to the new one. The main process only frees the
+        old block once every worker has replied.
+    None
+        Exit
+
+    Every command except None is answered with None, or with a description
+    of the error if it failed.
+    """
+    boids = Boids(num_boids, World(world_size), options)
+    if compiled:
+        # Boid objects for update_boids_kernel to fall back on without numba
+        for i in range(num_boids):
+            boids.add_boid(Boid(i, [0, 0], [0, 0], options))
+    blocks = []
+    positions = []
+    velocities = []
+    for name in names['positions']:
+        shm, array = attach_shared(name, (num_boids, 2), np.float64)
+        blocks.append(shm)
+        positions.append(array)
+    for name in names['velocities']:
+        shm, array = attach_shared(name, (num_boids, 2), np.float64)
+        blocks.append(shm)
+        velocities.append(array)
+    offsets_shm, offsets = attach_shared(names['offsets'], (num_boids + 1,),
+                                         np.int64)
+    boids.neighbour_list.offsets = offsets
+    indices_shm, indices = attach_shared(names['indices'],
+                                         (names['capacity'],), np.int32)
+    boids.neighbour_list.buffer = indices
+
+    while True:
+        command = conn.recv()
+        if command is None:
+            break
+        try:
+            if command[0] == 'indices':
+                action, name, capacity = command
+                boids.neighbour_list.buffer = indices = None
+                indices_shm.close()
+                indices_shm, indices = attach_shared(name, (capacity,),
+                                                     np.int32)
+                boids.neighbour_list.buffer = indices
+                conn.send(None)
+                continue
+            action, current, start, stop = command
+            boids.pos_array = positions[current]
+            boids.vel_array = velocities[current]
+            boids.pos_next = positions[1 - current]
+            boids.vel_next = velocities[1 - current]
+            if compiled:
+                boids.update_boids_kernel(start, stop)
+            else:
+                boids.update_boids_arrays(start, stop)
+            conn.send(None)
+        except Exception as error:
+            conn.send(repr(error))
+
+    # Release the views before closing the shared memory
+    boids.pos_array = boids.vel_array = boids.pos_next = boids.vel_next = None
+    boids.neighbour_list.offsets = boids.neighbour_list.buffer = None
+    positions = velocities = offsets = indices = None
+    for shm in blocks + [offsets_shm, indices_shm]:
+        if shm is not None:
+            shm.close()
+
+# ----------------------------- Parallel updater ------------------------------
+
+class ParallelUpdater():
+    """
+    Update the boids in parallel with a persistent pool of worker processes
+    sharing the boid arrays. Boids.setup_arrays must be called first. The
+    Boids position and velocity arrays are replaced by views of shared
+    memory, so the rest of the programme (plotting, checkpoints, ...) keeps
+    working unchanged.
+
+    Parameters
+    ----------
+    boids : Boids
+        The boids to update
+    num_workers : int, optional
+        Number of worker processes. The default is the number of CPUs.
+    compiled : bool, optional
+        If True, the workers use update_boids_kernel instead of
+        update_boids_arrays. The default is False.
+    """
+    def __init__(self, boids, num_workers=None, compiled=False):
+        if boids.pos_array is None:
+            raise ValueError("Call Boids.setup_arrays before starting the "
+                             "parallel updater")
+        self.boids = boids
+        self.num_workers = num_workers or os.cpu_count()
+        num = boids.num
+
+        # Move the double-buffered arrays into shared memory
+        self.blocks = []
+        self.positions = []
+        self.velocities = []
+        for arrays, source in ((self.positions, (boids.pos_array,
+                                                 boids.pos_next)),
+                               (self.velocities, (boids.vel_array,
+                                                  boids.vel_next))):
+            for array in source:
+                shm, shared = create_shared((num, 2), np.float64)
+                shared[:] = array
+                self.blocks.append(shm)
+                arrays.append(shared)
+        boids.pos_array, boids.pos_next = self.positions
+        boids.vel_array, boids.vel_next = self.velocities
+
+        # The neighbour searches write the neighbour list into shared memory
+        neighbour_list = boids.neighbour_list
+        num_pairs = len(neighbour_list)
+        self.offsets_shm, self.offsets = create_shared((num + 1,), np.int64)
+        self.offsets[:] = neighbour_list.offsets
+        self.indices_shm, self.indices = create_shared(
+            (max(num_pairs, 1024),), np.int32)
+        self.indices[:num_pairs] = neighbour_list.indices
+        neighbour_list.offsets = self.offsets
+        neighbour_list.buffer = self.indices
+        neighbour_list.allocate = self.allocate_indices
+
+        names = {'positions': [shm.name for shm in self.blocks[:2]],
+                 'velocities': [shm.name for shm in self.blocks[2:]],
+                 'offsets': self.offsets_shm.name,
+                 'indices': self.indices_shm.name,
+                 'capacity': len(self.indices)}
+        options = {key: getattr(boids, attribute)
+                   for key, attribute in PARAMETERS}
+        world = boids.world
+        world_size = [world.x_min, world.x_max, world.y_min, world.y_max]
+
+        self.connections = []
+        self.processes = []
+        for i in range(self.num_workers):
+            parent_conn, child_conn = mp.Pipe()
+            process = mp.Process(target=worker, daemon=True,
+                                 args=(child_conn, num, world_size, options,
+                                       compiled, names))
+            process.start()
+            self.connections.append(parent_conn)
+            self.processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def grow_indices(self, capacity):
+        """
+        Replace the shared neighbour indices block with one that can hold at
+        least 'capacity' pairs. The old block is only freed once every worker
+        has attached to the new block and released the old one.
+        """
+        old_shm = self.indices_shm
+        self.indices = None
+        self.indices_shm, self.indices = create_shared((capacity,), np.int32)
+        for conn in self.connections:
+            conn.send(('indices', self.indices_shm.name, capacity))
+        self.check_replies()
+        old_shm.close()
+        old_shm.unlink()
+
+    def allocate_indices(self, capacity, dtype=np.int32):
+        """
+        Used by the neighbour list to grow its index buffer, see
+        NeighbourList.set_pairs. Returns the new shared indices array.
+        """
+        # The old block cannot be freed while the neighbour list views it
+        self.boids.neighbour_list.buffer = None
+        self.grow_indices(capacity)
+        return self.indices
+
+    def split(self):
+        """
+        Split the boids into one contiguous slice per worker, balancing the
+        number of boids plus the number of neighbour pairs in each slice.
+
+        Returns
+        -------
+        bounds : numpy.ndarray
+            Slice i is bounds[i] to bounds[i+1]
+        """
+        num = self.boids.num
+        cost = self.offsets + np.arange(num + 1)
+        targets = np.linspace(0, cost[-1], self.num_workers + 1)
+        bounds = np.searchsorted(cost, targets)
+        bounds[0], bounds[-1] = 0, num
+        return bounds
+
+    def update(self):
+        """
+        Update all of the boids in parallel, reading the current frame and
+        writing the next frame, like Boids.update_boids_arrays.
+        """
+        boids = self.boids
+        neighbour_list = boids.neighbour_list
+        if (neighbour_list.offsets is not self.offsets or
+                neighbour_list.buffer is not self.indices):
+            raise RuntimeError("The neighbour list is not in shared memory")
+
+        if boids.pos_array is self.positions[0]:
+            current = 0
+        elif boids.pos_array is self.positions[1]:
+            current = 1
+        else:
+            raise RuntimeError("The boid arrays are not in shared memory")
+        if boids.vel_array is not self.velocities[current]:
+            raise RuntimeError("The boid arrays are not in shared memory")
+
+        bounds = self.split()
+        for i, conn in enumerate(self.connections):
+            conn.send(('update', current, int(bounds[i]), int(bounds[i+1])))
+        self.check_replies()
+
+    def check_replies(self):
+        """
+        Wait for every worker to reply to the last command, and raise an
+        error if any of them failed.
+        """
+        errors = [conn.recv() for conn in self.connections]
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise RuntimeError(f"Parallel boid update failed: {errors[0]}")
+
+    def step(self, method='linear', skin=0):
+        """
+        Parallel equivalent of Boids.step_arrays.
+        """
+        self.boids.make_neighbourhoods_arrays(method, skin)
+        self.update()
+        self.boids.swap_buffers()
+        self.boids.step_count += 1
+
+    def close(self):
+        """
+        Stop the worker processes and free the shared memory. The Boids
+        arrays are copied back into ordinary numpy arrays.
+        """
+        for conn in self.connections:
+            conn.send(None)
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+        boids = self.boids
+        boids.pos_array = boids.pos_array.copy()
+        boids.vel_array = boids.vel_array.copy()
+        boids.pos_next = boids.pos_next.copy()
+        boids.vel_next = boids.vel_next.copy()
+        neighbour_list = boids.neighbour_list
+        neighbour_list.offsets = neighbour_list.offsets.copy()
+        neighbour_list.buffer = neighbour_list.buffer.copy()
+        neighbour_list.allocate = np.empty
+        self.positions = self.velocities = self.offsets = self.indices = None
+        for shm in self.blocks + [self.offsets_shm, self.indices_shm]:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
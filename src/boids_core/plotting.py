@@ -11,7 +11,8 @@ sys.path.insert(0, os.path.abspath('..'))
 
 # Standard library imports
 import time
-from copy import deepcopy
+import queue
+import threading
 from math import pi
 import numpy as np
 from matplotlib import cm
@@ -24,6 +25,49 @@ except:
     from triangulation_core.linear_algebra import normalise
 from boids_core.settings import options
 
+# Optional imports
+try:
+    import imageio
+except ImportError:
+    imageio = None
+
+# ------------------------------ Helper functions -----------------------------
+
+def make_triangles(positions, velocities, height, width):
+    """
+    Vectorised version of Boid.make_tri. Generate the co-ordinates of the 
+    three points of the triangles used to plot all of the boids at once.
+
+    Parameters
+    ----------
+    positions : numpy.ndarray
+        Array of shape (N, 2) of boid positions
+    velocities : numpy.ndarray
+        Array of shape (N, 2) of boid velocities
+    height : int
+        The height of the boids in pixels.
+    width : int
+        The width of the boids in pixels.
+
+    Returns
+    -------
+    triangles : numpy.ndarray
+        int32 array of shape (N, 3, 2) with the triangle coordinates
+    """
+    speed = np.hypot(velocities[:, 0], velocities[:, 1])[:, None]
+    direction = np.divide(velocities, speed, out=np.zeros_like(velocities), 
+                          where=speed > 0)
+    offset_h = direction * (height/2)
+    offset_w = np.empty_like(direction)
+    offset_w[:, 0] = -direction[:, 1] * (width/2)
+    offset_w[:, 1] = direction[:, 0] * (width/2)
+    
+    triangles = np.empty((len(positions), 3, 2))
+    triangles[:, 0] = positions + offset_h
+    triangles[:, 1] = positions - offset_h + offset_w
+    triangles[:, 2] = positions - offset_h - offset_w
+    return triangles.astype(np.int32)
+
 # ----------------------------- Class definitions -----------------------------
 
 """
@@ -49,6 +93,7 @@ class ColourMap():
             colour = (int(colour[2]), int(colour[1]), int(colour[0]))
             cmap_lite.append(colour)
         self.cmap = cmap_lite
+        self.palette = np.array(cmap_lite, dtype=np.uint8)
         
     def get_colour_basic(self, direction):
         idx = (direction+pi)*(255/(2*pi))
@@ -91,8 +136,147 @@ class ColourMap():
         for i, bin_val in enumerate(self.bins[:-1]):
             if bin_val < direction <= self.bins[i+1]:
                 return self.cmap[i+1]
+            
+    def colour_indices(self, directions):
+        """
+        Batched version of get_colour_fast, giving the index into self.cmap 
+        and self.palette of the colour of every boid at once. The bins all 
+        have the same width, so the index is found with arithmetic instead 
+        of searching the bins. Directions on the edge of a bin can be 
+        rounded into the next bin, so these are moved back to match 
+        get_colour_fast, where each bin includes its upper edge.
+
+        Parameters
+        ----------
+        directions : numpy.ndarray
+            The directions the boids are facing in radians, from -pi to pi
+
+        Returns
+        -------
+        out : numpy.ndarray
+            Integer array of colour indices
+        """
+        directions = np.asarray(directions)
+        scaled = (directions + pi) * (self.num_colours/(2*pi))
+        idx = np.ceil(scaled).astype(np.intp) - 1
+        np.clip(idx, 0, self.num_colours-1, out=idx)
+        
+        bins = np.asarray(self.bins)
+        idx -= (idx > 0) & (directions <= bins[idx-1])
+        idx += (idx < self.num_colours-1) & (directions > bins[idx])
+        return idx
+    
+    def get_colours(self, directions):
+        """
+        Returns
+        -------
+        out : numpy.ndarray
+            uint8 array of shape (N, 3) with the BGR colour of every boid
+        """
+        return self.palette[self.colour_indices(directions)]
+
+class VideoExporter():
+    """
+    Write the frames of an animation to a video file. The frames are handed
+    to a bounded queue and encoded by a background thread, so encoding a 
+    frame overlaps with computing the next time-step. Videos are written 
+    with cv2.VideoWriter. GIFs are written with imageio, if installed, which
+    keeps the frames in memory until the file is closed, so GIFs are only 
+    suitable for short animations.
+
+    Parameters
+    ----------
+    filename : str
+        The output file, e.g. 'boids.mp4' or 'boids.gif'
+    width, height : int
+        Size of the frames in pixels
+    fps : float, optional
+        Frames per second of the video. The default is 30.
+    codec : str, optional
+        Four character code of the video codec. The default is 'mp4v'.
+    max_queued : int, optional
+        Maximum number of frames waiting to be encoded. If the encoder cannot 
+        keep up, the animation waits for space in the queue. 
+        The default is 8.
+    """
+    def __init__(self, filename, width, height, fps=30, codec='mp4v', 
+                 max_queued=8):
+        self.filename = filename
+        self.is_gif = filename.lower().endswith('.gif')
+        if self.is_gif:
+            if imageio is None:
+                raise ImportError("Exporting a GIF requires imageio")
+            self.writer = imageio.get_writer(filename, mode='I', 
+                                             duration=1000/fps, loop=0)
+        else:
+            fourcc = cv2.VideoWriter_fourcc(*codec)
+            self.writer = cv2.VideoWriter(filename, fourcc, fps, 
+                                          (int(width), int(height)))
+            if not self.writer.isOpened():
+                raise ValueError(f"Unable to open video file '{filename}'")
+        self.num_frames = 0
+        self.max_queued = max_queued
+        
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._error = None
+        self._thread = threading.Thread(target=self._encode_frames, 
+                                        daemon=True)
+        self._thread.start()
+        
+    def write(self, img):
+        """
+        Queue a frame to be encoded. The image is not copied, so it must not 
+        be changed afterwards.
+        """
+        if self._error is not None:
+            raise self._error
+        self._queue.put(img)
+        self.num_frames += 1
+        
+    def _encode_frames(self):
+        """
+        Background thread encoding the queued frames.
+        """
+        while True:
+            img = self._queue.get()
+            if img is None:
+                break
+            if self._error is not None:
+                continue
+            try:
+                if self.is_gif:
+                    # cv2 images are BGR, imageio expects RGB
+                    rgb = np.ascontiguousarray(img[:, :, ::-1])
+                    self.writer.append_data(rgb)
+                else:
+                    self.writer.write(img)
+            except Exception as error:
+                self._error = error
+                
+    def close(self):
+        """
+        Wait for the queued frames to be encoded and close the file.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self.is_gif:
+            self.writer.close()
+        else:
+            self.writer.release()
+        if self._error is not None:
+            raise self._error
 
 class Plotter():
+    """
+    Class to plot the boids with cv2. 
+    
+    The Plotter owns a ring of frame buffers, which are cleared in place by
+    tabula_rasa() instead of allocating a new image every frame. The frame 
+    being drawn is self.img, which consumers can read directly without 
+    copying. It stays unchanged until the ring of buffers wraps around, 
+    i.e. for len(self.frames) - 1 further calls to tabula_rasa().
+    """
     def __init__(self, options, world):
         # Plot size options
         if options['plot_border']:
@@ -104,8 +288,12 @@ class Plotter():
         
         # Background colour options
         self.background = options['background_colour']
-        self.blank_black = np.zeros((self.height, self.width, 3), np.uint8)
-        self.blank_white = deepcopy(self.blank_black) + 255
+        if self.background == 'white':
+            self.background_value = 255
+        elif self.background == 'black':
+            self.background_value = 0
+        else:
+            raise ValueError("Invalid background colour")
         
         # Boid triangle plotting
         self.dir_len = options['direction_line_len']
@@ -113,18 +301,39 @@ class Plotter():
         self.triangle_width = options['triangle_width']
         self.plot_cmap = options['plot_boid_colours']
         
-        self.img = self.tabula_rasa()   # Set plot to blank
+        self.set_num_buffers(1)   # Set plot to blank
+        
+    def set_num_buffers(self, num_buffers):
+        """
+        Allocate a ring of 'num_buffers' frame buffers, and clear the first 
+        one to be self.img. More than one buffer is needed when finished 
+        frames are still being read, e.g. by a VideoExporter, while the next
+        frame is drawn.
+        """
+        self.frames = [np.empty((self.height, self.width, 3), np.uint8)
+                       for i in range(num_buffers)]
+        self.frame_index = -1
+        self.img = self.tabula_rasa()
         
     def tabula_rasa(self):
         """
-        2.65ms/frame improvement using deepcopy instead of calling np.zeros
+        Move on to the next frame buffer in the ring and clear it in place to
+        the background colour.
+        
+        Improvements
+        ------------
+        Clearing a persistent buffer in place avoids allocating and copying a
+        new image every frame.
+
+        Returns
+        -------
+        img : numpy.ndarray
+            The cleared frame buffer
         """
-        if self.background == 'white':
-            return deepcopy(self.blank_white)
-        elif self.background == 'black':
-            return deepcopy(self.blank_black)
-        else:
-            raise ValueError("Invlaid background colour")
+        self.frame_index = (self.frame_index + 1) % len(self.frames)
+        img = self.frames[self.frame_index]
+        img.fill(self.background_value)
+        return img
     
     def plot_neighbours(self, boid, positions):
         boid_pos = (int(boid.pos[0]+self.shift), int(boid.pos[1]+self.shift))
@@ -134,25 +343,44 @@ class Plotter():
         boid_vel = (int(dir_x+boid_pos[0]), int(dir_y+boid_pos[1]))
         self.img = cv2.line(self.img, boid_pos, boid_vel, (255, 255, 255), 2)
         for neighbour in boid.neighbours:
-            n_pos = positions[neighbour[1]]
+            n_pos = positions[neighbour]
             n_pos = (int(n_pos[0]+self.shift), int(n_pos[1]+self.shift))
             self.img = cv2.line(self.img, boid_pos, n_pos, (255, 255, 255), 1)
     
     def plot_boids(self, boids, colour_map):
-        for i in range(boids.num):
-            test_boid = boids.members[i]
-            triangle = test_boid.make_tri(self.triangle_height, self.triangle_width)
-            direction = test_boid.direction()
-            if self.plot_cmap:
-                col = colour_map.get_colour_fast(direction)
-            elif self.background=='black':
+        """
+        Plot all of the boids as triangles pointing in their direction of 
+        travel. The triangles are calculated for all boids at once (see 
+        make_triangles), grouped by colour and each colour group is drawn 
+        with a single call to cv2.fillPoly.
+        """
+        if boids.pos_array is not None:
+            positions = boids.pos_array
+            velocities = boids.vel_array
+        else:
+            positions = np.array([boid.pos for boid in boids.members])
+            velocities = np.array([boid.vel for boid in boids.members])
+        triangles = make_triangles(positions, velocities, 
+                                   self.triangle_height, self.triangle_width)
+        if self.shift != 0:
+            triangles += self.shift    # Shift the triangles to create border
+        
+        if self.plot_cmap:
+            directions = np.arctan2(velocities[:, 1], velocities[:, 0])
+            colour_idx = colour_map.colour_indices(directions)
+            order = np.argsort(colour_idx, kind='stable')
+            bounds = np.searchsorted(colour_idx[order], 
+                                     np.arange(colour_map.num_colours + 1))
+            for i, col in enumerate(colour_map.palette.tolist()):
+                group = order[bounds[i]:bounds[i+1]]
+                if len(group) > 0:
+                    cv2.fillPoly(self.img, triangles[group], col)
+        else:
+            if self.background=='black':
                 col = (0, 0, 0)
             elif self.background=='white':
                 col = (255, 255, 255)
-            
-            if self.shift != 0:
-                triangle += self.shift    # Shift the triangles to create border
-            self.img = cv2.drawContours(self.img, [triangle], 0, col, -1)
+            cv2.fillPoly(self.img, triangles, col)
             
     def display(self):
         cv2.imshow("image", self.img) 
@@ -164,20 +392,63 @@ class Plotter():
             raise Exception("Must include file extension with filename")
         cv2.imwrite(filename, self.img) 
     
-    def animation(self, boids, plot_func, cmap, verbose=False, print_fps=24):
+    def animation(self, boids, plot_func, cmap, verbose=False, print_fps=24,
+                  video=None, video_fps=30, num_frames=None, display=True):
+        """
+        Animate the boids, calling plot_func to update them every frame.
+
+        Parameters
+        ----------
+        boids : boids.Boids
+            The boids to animate
+        plot_func : function
+            Function updating the boids by one time-step
+        cmap : ColourMap
+            Colour map used to colour the boids
+        verbose : bool, optional
+            Print the frames per second. The default is False.
+        print_fps : int, optional
+            Print the frames per second every this many frames. 
+            The default is 24.
+        video : str, optional
+            If given, export the animation to this video file (see 
+            VideoExporter). The default is None.
+        video_fps : float, optional
+            Frames per second of the exported video. The default is 30.
+        num_frames : int, optional
+            Stop after this many frames. The default is None, which runs until
+            the 'esc' key is pressed.
+        display : bool, optional
+            Show the animation in a window. Set to False to export a video 
+            without a display attached. The default is True.
+        """
+        if not display and num_frames is None:
+            raise ValueError("num_frames is needed when there is no display")
+        exporter = None
+        if video is not None:
+            exporter = VideoExporter(video, self.img.shape[1], 
+                                     self.img.shape[0], fps=video_fps)
+            # Frames waiting in the queue, or being encoded, must not be 
+            # cleared while the next frame is drawn
+            self.set_num_buffers(exporter.max_queued + 2)
         start = time.time()
         iterations = 0
-        cv2.imshow("image", self.img)
+        if display: cv2.imshow("image", self.img)
         if verbose: print("frame number, frames per second")
-        while True:
+        while num_frames is None or iterations < num_frames:
             self.img = self.tabula_rasa()
             boids = plot_func(boids)
             self.plot_boids(boids, cmap)
-            cv2.imshow("image", self.img)
-            k = cv2.waitKey(1)
-            if k == 27:
-                break
+            if exporter is not None:
+                exporter.write(self.img)
+            if display:
+                cv2.imshow("image", self.img)
+                k = cv2.waitKey(1)
+                if k == 27:
+                    break
             if verbose and iterations%print_fps==0:
                 print(f"{iterations},{iterations/(time.time()-start):0.3f}")
             iterations += 1
-        cv2.destroyWindow("image")
+        if display: cv2.destroyWindow("image")
+        if exporter is not None:
+            exporter.close()
@@ -0,0 +1,195 @@
+"""
+This script contains a recorder for saving the full trajectories of the
+boids, i.e. the positions and velocities of every boid at every (or every
+k-th) time-step, for offline analysis.
+
+The frames are written to a directory of chunk files, each a preallocated
+.npy array of shape (chunk_size, num_boids, 4) holding x, y, vx and vy for
+each boid, along with a .npy array of the time-step of each frame. Only the
+chunk being written is memory-mapped, so the memory used does not grow with
+the length of the run. The writing happens in a background thread: the
+simulation loop only copies the current frame into a bounded queue, and the
+thread writes the frames to disk.
+
+A trajectory can be read back one chunk at a time with read_trajectory.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Standard library imports
+import os
+import json
+import queue
+import threading
+import numpy as np
+
+# -----------------------------------------------------------------------------
+
+METADATA_FILE = 'trajectory.json'
+
+def chunk_filename(path, chunk, name='frames'):
+    return os.path.join(path, f"chunk_{chunk:05d}_{name}.npy")
+
+# ----------------------------- Trajectory recorder ---------------------------
+
+class TrajectoryRecorder():
+    """
+    Record the positions and velocities of the boids to disk.
+
+    Parameters
+    ----------
+    path : str
+        Directory to write the trajectory to. It is created if needed.
+    num_boids : int
+        The number of boids
+    every : int, optional
+        Only record time-steps which are a multiple of this. The default is 1.
+    chunk_size : int, optional
+        Number of frames in each chunk file. The default is 1000.
+    dtype : numpy.dtype, optional
+        Data type the frames are stored as. The default is float64.
+    max_queued : int, optional
+        Maximum number of frames waiting to be written. If the disk cannot
+        keep up the simulation waits for space in the queue, which limits the
+        memory used. The default is 16.
+    """
+    def __init__(self, path, num_boids, every=1, chunk_size=1000,
+                 dtype=np.float64, max_queued=16):
+        self.path = path
+        self.num_boids = num_boids
+        self.every = every
+        self.chunk_size = chunk_size
+        self.dtype = np.dtype(dtype)
+        self.num_frames = 0
+        os.makedirs(path, exist_ok=True)
+
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._error = None
+        self._thread = threading.Thread(target=self._write_frames, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record(self, boids):
+        """
+        Record the current positions and velocities of the boids, if the step
+        counter boids.step_count is a multiple of self.every.
+
+        Returns
+        -------
+        bool
+            True if the frame was recorded
+        """
+        if boids.step_count % self.every != 0:
+            return False
+        if boids.pos_array is not None:
+            positions = boids.pos_array
+            velocities = boids.vel_array
+        else:
+            members = sorted(boids.members, key=lambda boid: boid.index)
+            positions = [boid.pos for boid in members]
+            velocities = [boid.vel for boid in members]
+        self.record_arrays(boids.step_count, positions, velocities)
+        return True
+
+    def record_arrays(self, step, positions, velocities):
+        """
+        Record a frame from arrays of shape (num_boids, 2). The arrays are
+        copied, so they can be changed as soon as this returns.
+        """
+        if self._error is not None:
+            raise self._error
+        frame = np.empty((self.num_boids, 4), dtype=self.dtype)
+        frame[:, :2] = positions
+        frame[:, 2:] = velocities
+        self._queue.put((step, frame))
+        self.num_frames += 1
+
+    def _write_frames(self):
+        """
+        Background thread writing the queued frames into the chunk files.
+        """
+        chunk = steps = None
+        chunk_index = 0
+        row = 0
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue
+            try:
+                if chunk is None:
+                    shape = (self.chunk_size, self.num_boids, 4)
+                    chunk = np.lib.format.open_memmap(
+                        chunk_filename(self.path, chunk_index), mode='w+', 
+                        dtype=self.dtype, shape=shape)
+                    steps = np.lib.format.open_memmap(
+                        chunk_filename(self.path, chunk_index, 'steps'), 
+                        mode='w+', dtype=np.int64, shape=(self.chunk_size,))
+                steps[row], chunk[row] = item
+                row += 1
+                if row == self.chunk_size:
+                    chunk.flush()
+                    steps.flush()
+                    chunk = steps = None
+                    chunk_index += 1
+                    row = 0
+            except Exception as error:
+                self._error = error
+        if chunk is not None:
+            chunk.flush()
+            steps.flush()
+
+    def close(self):
+        """
+        Wait for all of the queued frames to be written, then write the
+        trajectory metadata.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+        metadata = {'num_boids': self.num_boids,
+                    'num_frames': self.num_frames,
+                    'every': self.every,
+                    'chunk_size': self.chunk_size,
+                    'dtype': self.dtype.str}
+        with open(os.path.join(self.path, METADATA_FILE), 'w') as file:
+            json.dump(metadata, file, indent=4)
+
+# ----------------------------- Trajectory reader -----------------------------
+
+def read_trajectory(path):
+    """
+    Read a trajectory written by TrajectoryRecorder one chunk at a time.
+
+    Parameters
+    ----------
+    path : str
+        Directory the trajectory was written to
+
+    Yields
+    ------
+    steps : numpy.ndarray
+        The time-step of each frame in the chunk
+    positions : numpy.ndarray
+        Memory-mapped array of shape (frames, num_boids, 2)
+    velocities : numpy.ndarray
+        Memory-mapped array of shape (frames, num_boids, 2)
+    """
+    with open(os.path.join(path, METADATA_FILE)) as file:
+        metadata = json.load(file)
+    num_frames = metadata['num_frames']
+    chunk_size = metadata['chunk_size']
+    for start in range(0, num_frames, chunk_size):
+        chunk_index = start // chunk_size
+        chunk = np.load(chunk_filename(path, chunk_index), mmap_mode='r')
+        steps = np.load(chunk_filename(path, chunk_index, 'steps'))
+        frames = min(chunk_size, num_frames - start)
+        yield steps[:frames], chunk[:frames, :, :2], chunk[:frames, :, 2:]
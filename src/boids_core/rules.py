@@ -0,0 +1,159 @@
+"""
+This script contains vectorised versions of the boid rules found in the Boid
+class of 'boids.py'. Instead of looping over each boid and each neighbour in
+Python, the rules are applied to every boid at once using numpy arrays.
+
+The rules are applied to a contiguous block of 'own' boids, which may be all
+of the boids or only a slice of them. The neighbourhoods are given as two 
+integer arrays 'idx' and 'nbr' of equal length, where each pair 
+(idx[k], nbr[k]) means the boid nbr[k] is a neighbour of the own boid idx[k].
+The 'idx' values are row indices into the own boids arrays, while the 'nbr' 
+values are row indices into the arrays of all boids. Positions and velocities
+are numpy arrays of shape (N, 2).
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Standard library imports
+import numpy as np
+
+# ------------------------------ Helper functions -----------------------------
+
+def sum_by_boid(idx, values, num_boids):
+    """
+    Sum the rows of 'values' belonging to each boid. This is the vectorised
+    equivalent of the 'for neighbour in self.neighbours' loops in the Boid
+    class rules.
+
+    Parameters
+    ----------
+    idx : numpy.ndarray
+        Index of the boid each row of values belongs to
+    values : numpy.ndarray
+        Array of shape (M, 2) of values to sum
+    num_boids : int
+        The total number of boids
+
+    Returns
+    -------
+    out : numpy.ndarray
+        Array of shape (num_boids, 2)
+    """
+    out = np.empty((num_boids, 2))
+    out[:, 0] = np.bincount(idx, weights=values[:, 0], minlength=num_boids)
+    out[:, 1] = np.bincount(idx, weights=values[:, 1], minlength=num_boids)
+    return out
+
+def mean_by_boid(idx, values, counts):
+    """
+    Average the rows of 'values' belonging to each boid. Boids with no rows
+    are given a value of zero.
+    """
+    total = sum_by_boid(idx, values, len(counts))
+    has_values = counts > 0
+    total[has_values] /= counts[has_values, None]
+    return total
+
+# ------------------------------- Displacements -------------------------------
+
+def displacements(own_pos, positions, idx, nbr, world=None):
+    """
+    Calculate the displacement vector from each boid to each of its 
+    neighbours. If a world is given, the world is treated as periodic (as it 
+    is by wrap_world) and the minimum image displacement is returned, i.e. the 
+    shortest vector to the neighbour allowing for the wrap around the edges.
+
+    Returns
+    -------
+    diff : numpy.ndarray
+        Array of shape (M, 2) of neighbour position minus boid position
+    """
+    diff = positions[nbr] - own_pos[idx]
+    if world is not None:
+        diff[:, 0] -= world.x_max * np.round(diff[:, 0] / world.x_max)
+        diff[:, 1] -= world.y_max * np.round(diff[:, 1] / world.y_max)
+    return diff
+
+# -------------------------------- Boid rules ---------------------------------
+
+def restrict_fov(own_vel, diff, idx, cos_half_fov, vision_distance):
+    """
+    Vectorised version of Boid.restrict_fov. Neighbours beyond the
+    field_of_view/2 angle, or further away than the vision_distance, are
+    removed from the set of neighbours.
+    
+    A neighbour is in view when the angle between the boid velocity v and the
+    displacement d is less than field_of_view/2, i.e. when
+    v.d > cos(field_of_view/2)|v||d|. Both sides are squared, keeping their 
+    signs, so that neither angles nor square roots are needed. Comparing 
+    directions this way has no problem with angles wrapping around at +-pi. 
+    Boids which are not moving have no direction and see all around them.
+
+    Parameters
+    ----------
+    own_vel : numpy.ndarray
+        Velocities of the own boids
+    diff : numpy.ndarray
+        Array of shape (M, 2) of displacements from boid to neighbour
+    idx : numpy.ndarray
+        Index of the own boid for each displacement
+    cos_half_fov : float
+        The cosine of half the field of view, cos(field_of_view/2)
+    vision_distance : float
+        The maximum distance a boid can see
+
+    Returns
+    -------
+    keep : numpy.ndarray
+        Boolean array, True for the neighbour pairs which are kept
+    """
+    dot = own_vel[idx, 0]*diff[:, 0] + own_vel[idx, 1]*diff[:, 1]
+    dist_sq = diff[:, 0]**2 + diff[:, 1]**2
+    # Speeds are per boid, so only square them once per boid
+    speed_sq = own_vel[:, 0]**2 + own_vel[:, 1]**2
+    limit = cos_half_fov * abs(cos_half_fov) * speed_sq
+    keep = dot*np.abs(dot) > limit[idx] * dist_sq
+    keep |= (speed_sq == 0)[idx]
+    keep &= (0 < dist_sq) & (dist_sq < vision_distance**2)
+    return keep
+
+def separation(diff, idx, num_boids, safety_zone, perception):
+    """
+    Vectorised version of Boid.separation.
+    """
+    distance = np.hypot(diff[:, 0], diff[:, 1])
+    too_close = distance < safety_zone
+    counts = np.bincount(idx[too_close], minlength=num_boids)
+    resultant = mean_by_boid(idx[too_close],
+                             -diff[too_close] / distance[too_close, None],
+                             counts)
+    return perception * resultant
+
+def cohesion(diff, idx, counts, perception):
+    """
+    Vectorised version of Boid.cohesion. The mean displacement to the 
+    neighbours is the displacement to the centre of the neighbours.
+    """
+    return perception * mean_by_boid(idx, diff, counts)
+
+def alignment(velocities, idx, nbr, counts, perception):
+    """
+    Vectorised version of Boid.alignment.
+    """
+    return perception * mean_by_boid(idx, velocities[nbr], counts)
+
+def limit_speed(velocities, max_speed):
+    """
+    Rescale, in place, any velocities faster than 'max_speed' so that they
+    have a speed of exactly 'max_speed'.
+    """
+    speed = np.hypot(velocities[:, 0], velocities[:, 1])
+    too_fast = speed > max_speed
+    velocities[too_fast] *= (max_speed / speed[too_fast])[:, None]
+
+def wrap_world(positions, world):
+    """
+    Vectorised version of Boid.wrap_world. Positions are wrapped in place.
+    """
+    np.mod(positions[:, 0], world.x_max, out=positions[:, 0])
+    np.mod(positions[:, 1], world.y_max, out=positions[:, 1])
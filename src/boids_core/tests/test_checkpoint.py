@@ -0,0 +1,101 @@
+"""
+Tests of saving and restoring a simulation (checkpoint.save_checkpoint and
+load_checkpoint). A simulation restarted from a checkpoint is compared with
+one which ran without interruption.
+
+Run with pytest from any directory.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Allow imports from the src folder
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+# Standard library imports
+import numpy as np
+import pytest
+
+# Repo module imports
+from boids_core.settings import options
+from boids_core.boids import World, Boids
+from boids_core import checkpoint
+
+# -----------------------------------------------------------------------------
+
+def make_boids(bit_generator):
+    boids = Boids(150, World([0, 400, 0, 300]), dict(options, 
+                                                     vision_distance=60))
+    boids.rng = np.random.Generator(bit_generator(5))
+    boids.generate_boids(options, distribution='random')
+    boids.setup_arrays()
+    return boids
+
+@pytest.mark.parametrize("bit_generator", [np.random.PCG64, np.random.Philox,
+                                           np.random.MT19937])
+def test_restart_matches_uninterrupted(tmp_path, bit_generator):
+    filename = str(tmp_path / 'boids')
+    uninterrupted = make_boids(bit_generator)
+    interrupted = make_boids(bit_generator)
+    for step in range(5):
+        uninterrupted.step_arrays('cell_list')
+        interrupted.step_arrays('cell_list')
+    interrupted.members[3].max_speed = 4.0
+    checkpoint.save_checkpoint(interrupted, filename)
+    
+    restarted = checkpoint.load_checkpoint(filename + '.npz')
+    restarted.setup_arrays()
+    assert restarted.step_count == 5
+    assert restarted.members[3].max_speed == 4.0
+    for key, attribute in checkpoint.PARAMETERS:
+        assert getattr(restarted, attribute) == getattr(uninterrupted, 
+                                                        attribute)
+    for step in range(5):
+        uninterrupted.step_arrays('cell_list')
+        restarted.step_arrays('cell_list')
+    np.testing.assert_array_equal(restarted.pos_array, 
+                                  uninterrupted.pos_array)
+    np.testing.assert_array_equal(restarted.vel_array, 
+                                  uninterrupted.vel_array)
+    
+    # The random number generator continues from the same state
+    assert type(restarted.rng.bit_generator) is bit_generator
+    np.testing.assert_array_equal(restarted.rng.random(10), 
+                                  uninterrupted.rng.random(10))
+    
+def test_failed_save_keeps_previous_checkpoint(tmp_path, monkeypatch):
+    filename = str(tmp_path / 'boids.npz')
+    boids = make_boids(np.random.PCG64)
+    checkpoint.save_checkpoint(boids, filename)
+    saved = boids.pos_array.copy()
+    
+    def interrupted_savez(file, **arrays):
+        file.write(b'partial')
+        raise KeyboardInterrupt
+    boids.step_arrays('cell_list')
+    monkeypatch.setattr(np, 'savez', interrupted_savez)
+    with pytest.raises(KeyboardInterrupt):
+        checkpoint.save_checkpoint(boids, filename)
+    monkeypatch.undo()
+    
+    restored = checkpoint.load_checkpoint(filename)
+    restored.setup_arrays()
+    np.testing.assert_array_equal(restored.pos_array, saved)
+    assert restored.step_count == 0
+    
+    # The next save replaces the checkpoint and the partial temporary file
+    checkpoint.save_checkpoint(boids, filename)
+    assert os.listdir(tmp_path) == ['boids.npz']
+    assert checkpoint.load_checkpoint(filename).step_count == 1
+    
+def test_periodic_checkpoint(tmp_path):
+    filename = str(tmp_path / 'boids.npz')
+    boids = make_boids(np.random.PCG64)
+    saved = []
+    for step in range(7):
+        boids.step_arrays('cell_list')
+        saved.append(checkpoint.periodic_checkpoint(boids, 3, filename))
+    assert saved == [False, False, True, False, False, True, False]
+    assert checkpoint.load_checkpoint(filename).step_count == 6
+    assert not checkpoint.periodic_checkpoint(boids, 0, filename)
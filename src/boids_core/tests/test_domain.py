@@ -0,0 +1,209 @@
+"""
+Tests of the MPI domain decomposition of the vectorised update 
+(domain.Domain). A time-step of the boids split over the domains is compared
+with a time-step of all of the boids with Boids.step_arrays. 
+
+The ranks are simulated with threads sharing a FakeComm, so several ranks can
+be tested without MPI. The single rank test uses mpi4py, if installed.
+
+Run with pytest from any directory.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Allow imports from the src folder
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+# Standard library imports
+import copy
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+
+# Repo module imports
+from boids_core.settings import options
+from boids_core.boids import World, Boids
+from boids_core.domain import Domain
+
+# -----------------------------------------------------------------------------
+
+class FakeComm():
+    """
+    Stand in for an MPI communicator between threads, with the buffer based
+    methods used by Domain. Every message is put in a queue for its source
+    and destination rank, so sends never block and messages between two 
+    ranks arrive in order, as with MPI.
+    """
+    def __init__(self, rank, queues):
+        self.rank = rank
+        self.queues = queues
+        
+    def Get_rank(self):
+        return self.rank
+    
+    def Get_size(self):
+        return len(self.queues)
+    
+    def send(self, data, dest):
+        self.queues[self.rank][dest].put(np.array(data))
+        
+    def recv(self, out, source):
+        data = self.queues[source][self.rank].get(timeout=10)
+        out[...] = data.reshape(out.shape)
+        
+    def Sendrecv(self, sendbuf, dest, recvbuf, source):
+        self.send(sendbuf, dest)
+        self.recv(recvbuf, source)
+        
+    def Scatter(self, sendbuf, recvbuf, root):
+        if self.rank == root:
+            for rank in range(self.Get_size()):
+                self.send(sendbuf[rank:rank+1], rank)
+        self.recv(recvbuf, root)
+        
+    def Scatterv(self, sendbuf, recvbuf, root):
+        if self.rank == root:
+            data, counts = sendbuf
+            data = data.reshape(-1)
+            starts = np.cumsum(counts) - counts
+            for rank, (start, count) in enumerate(zip(starts, counts)):
+                self.send(data[start:start+count], rank)
+        self.recv(recvbuf, root)
+        
+    def Gather(self, sendbuf, recvbuf, root):
+        self.send(sendbuf, root)
+        if self.rank == root:
+            for rank in range(self.Get_size()):
+                self.recv(recvbuf[rank:rank+1], rank)
+                
+    def Gatherv(self, sendbuf, recvbuf, root):
+        self.send(sendbuf, root)
+        if self.rank == root:
+            data, counts = recvbuf
+            data = data.reshape(-1)
+            starts = np.cumsum(counts) - counts
+            for rank, (start, count) in enumerate(zip(starts, counts)):
+                self.recv(data[start:start+count], rank)
+
+def run_ranks(size, function):
+    """
+    Call function(comm) for each of 'size' ranks, each in its own thread.
+    
+    Returns
+    -------
+    out : list
+        The value returned on each rank
+    """
+    queues = [[queue.Queue() for dest in range(size)] for rank in range(size)]
+    with ThreadPoolExecutor(size) as executor:
+        futures = [executor.submit(function, FakeComm(rank, queues))
+                   for rank in range(size)]
+        return [future.result() for future in futures]
+    
+def make_boids(num_boids, vision_distance, seed):
+    world = World([0, 600, 0, 400])
+    opts = dict(options, vision_distance=vision_distance)
+    boids = Boids(num_boids, world, opts)
+    boids.rng = np.random.default_rng(seed)
+    boids.generate_boids(opts, distribution='random')
+    boids.setup_arrays()
+    return boids
+
+def run_domains(comm, boids, method, num_steps):
+    """
+    Run num_steps of the domain decomposed update of a copy of 'boids'. 
+    
+    Returns
+    -------
+    boids : Boids
+        The copy of the boids, gathered on rank 0
+    domain : Domain
+    """
+    boids = copy.deepcopy(boids)
+    domain = Domain(comm, boids, method=method)
+    domain.scatter(boids)
+    for step in range(num_steps):
+        domain.step()
+    domain.gather(boids)
+    return boids, domain
+
+def check_matches_serial(boids, serial):
+    np.testing.assert_allclose(boids.pos_array, serial.pos_array, 
+                               rtol=0, atol=1e-9)
+    np.testing.assert_allclose(boids.vel_array, serial.vel_array, 
+                               rtol=0, atol=1e-9)
+
+@pytest.mark.parametrize("method", ['linear', 'cell_list', 'kd_tree'])
+def test_single_rank_matches_arrays(method):
+    MPI = pytest.importorskip('mpi4py.MPI')
+    if method == 'kd_tree':
+        pytest.importorskip('scipy')
+    serial = make_boids(300, 60, 0)
+    boids, domain = run_domains(MPI.COMM_SELF, serial, method, 10)
+    for step in range(10):
+        serial.step_arrays(method)
+    check_matches_serial(boids, serial)
+    assert domain.num_owned == 300
+    assert domain.num_ghosts == 0
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5])
+@pytest.mark.parametrize("vision_distance", [60, 250])
+@pytest.mark.parametrize("method", ['cell_list', 'kd_tree'])
+def test_fake_ranks_match_arrays(size, vision_distance, method):
+    if method == 'kd_tree':
+        pytest.importorskip('scipy')
+    serial = make_boids(300, vision_distance, 1)
+    results = run_ranks(size, lambda comm: run_domains(comm, serial, method,
+                                                       10))
+    for step in range(10):
+        serial.step_arrays(method)
+    check_matches_serial(results[0][0], serial)
+    
+    # Every boid is owned by exactly one rank, and in the last step only the
+    # boids owned before migrating were searched for neighbours
+    owned = np.concatenate([domain.indices for boids, domain in results])
+    np.testing.assert_array_equal(np.sort(owned), np.arange(300))
+    for boids, domain in results:
+        neighbour_list = domain.local.neighbour_list
+        num_searched = domain.local.num - domain.num_ghosts
+        assert neighbour_list.num_boids == domain.local.num
+        assert neighbour_list.counts(0, num_searched).any()
+        assert not neighbour_list.counts(num_searched).any()
+        if size > 1:
+            assert domain.num_ghosts > 0
+    
+@pytest.mark.parametrize("skip", [False, True])
+def test_migrate_skipped_strip(skip):
+    # Four strips 150 wide. Rank 0 moves one boid into the next strip and
+    # one around the world into the last strip, and with 'skip' one boid 
+    # two strips along.
+    serial = make_boids(200, 60, 2)
+    
+    def move_and_migrate(comm):
+        domain = Domain(comm, serial)
+        domain.scatter(serial)
+        if domain.rank == 0:
+            domain.positions[:3, 0] = [160, 590, 310 if skip else 140]
+            moved = domain.indices[:3].tolist()
+        else:
+            moved = []
+        domain.migrate()
+        return domain, moved
+    
+    if not skip:
+        results = run_ranks(4, move_and_migrate)
+        domains = [domain for domain, moved in results]
+        moved = results[0][1]
+        assert moved[0] in domains[1].indices
+        assert moved[1] in domains[3].indices
+        assert moved[2] in domains[0].indices
+        for domain in domains:
+            np.testing.assert_array_equal(domain.owner(domain.positions), 
+                                          domain.rank)
+        return
+
+    with pytest.raises(RuntimeError, match="neighbouring domain"):
+        run_ranks(4, move_and_migrate)
@@ -0,0 +1,56 @@
+"""
+Tests that Boids.triangulate_boids(incremental=True), which repairs the
+triangulation from the previous frame, finds the same neighbours as
+triangulating from scratch every frame, over many frames of a simulation.
+
+Run with pytest from any directory.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Allow imports from the src folder
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+# Standard library imports
+import copy
+import numpy as np
+import pytest
+
+# Repo module imports
+from boids_core.settings import options
+from boids_core.boids import World, Boids
+
+# -----------------------------------------------------------------------------
+
+@pytest.mark.parametrize("distribution", ['random', 'lattice_with_noise'])
+@pytest.mark.parametrize("vision_distance", [60, 150])
+def test_incremental_matches_full(distribution, vision_distance):
+    opts = dict(options, vision_distance=vision_distance)
+    world = World([0, 600, 0, 400])
+    full = Boids(200, world, opts)
+    full.rng = np.random.default_rng(0)
+    full.generate_boids(opts, distribution=distribution)
+    incremental = copy.deepcopy(full)
+
+    for step in range(40):
+        full.triangulate_boids(incremental=False)
+        incremental.triangulate_boids(incremental=True)
+        full.make_neighbourhoods()
+        incremental.make_neighbourhoods()
+        for boid, other in zip(full.members, incremental.members):
+            assert boid.index == other.index
+            assert sorted(boid.neighbours) == sorted(other.neighbours)
+        for boids in (full, incremental):
+            for boid in boids.members:
+                boid.update_boid(boids.positions, boids.velocities, world)
+
+    # The boids wrapped around the world and ghosts came and went, without
+    # the triangulation being rebuilt
+    state = incremental.incremental_triangulation
+    assert state.num_rebuilds == 1
+    assert state.num_repairs == 39
+    assert np.any(state.image != 0)
+    np.testing.assert_array_equal([boid.pos for boid in full.members],
+                                  [boid.pos for boid in incremental.members])
@@ -0,0 +1,137 @@
+"""
+Tests of the NeighbourList (CSR) storage of the neighbour pairs, and of the
+linear, cell_list and kd_tree neighbour searches against a brute force search
+of the periodic world.
+
+Run with pytest from any directory.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Allow imports from the src folder
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+# Standard library imports
+import numpy as np
+import pytest
+
+# Repo module imports
+from boids_core.settings import options
+from boids_core.boids import World, Boids
+from boids_core.neighbours import (NeighbourList, cell_list_search, 
+                                   kd_tree_search)
+
+# -----------------------------------------------------------------------------
+
+WORLD = World([0, 300, 0, 200])
+
+def random_pairs(rng, num_boids, num_pairs):
+    """
+    Random neighbour pairs, sorted by boid as returned by the searches.
+    """
+    idx = np.sort(rng.integers(0, num_boids, num_pairs))
+    nbr = rng.integers(0, num_boids, num_pairs)
+    return idx, nbr
+
+def brute_force_pairs(positions, max_dist, world):
+    """
+    Every pair of boids closer than max_dist, using the minimum image
+    convention for the displacement between them.
+    """
+    box = np.array([world.x_max, world.y_max])
+    diff = positions[None, :, :] - positions[:, None, :]
+    diff -= box * np.round(diff / box)
+    dist_sq = diff[:, :, 0]**2 + diff[:, :, 1]**2
+    idx, nbr = np.nonzero((0 < dist_sq) & (dist_sq < max_dist**2))
+    return set(zip(idx.tolist(), nbr.tolist()))
+
+def test_csr_round_trip():
+    rng = np.random.default_rng(0)
+    neighbour_list = NeighbourList(10)
+    # Fill the list, then reuse its buffer for fewer pairs and more boids
+    for num_boids, num_pairs in [(10, 40), (10, 5), (25, 0), (25, 100)]:
+        idx, nbr = random_pairs(rng, num_boids, num_pairs)
+        neighbour_list.set_pairs(idx, nbr, num_boids)
+
+        assert neighbour_list.num_boids == num_boids
+        assert len(neighbour_list) == num_pairs
+        np.testing.assert_array_equal(neighbour_list.indices, nbr)
+        np.testing.assert_array_equal(neighbour_list.counts(),
+                                      np.bincount(idx, minlength=num_boids))
+
+        out_idx, out_nbr = neighbour_list.pairs()
+        np.testing.assert_array_equal(out_idx, idx)
+        np.testing.assert_array_equal(out_nbr, nbr)
+        for i in range(num_boids):
+            np.testing.assert_array_equal(neighbour_list.neighbours_of(i),
+                                          nbr[idx == i])
+
+def test_csr_pairs_of_slice():
+    rng = np.random.default_rng(1)
+    idx, nbr = random_pairs(rng, 20, 80)
+    neighbour_list = NeighbourList()
+    neighbour_list.set_pairs(idx, nbr, 20)
+
+    start, stop = 5, 12
+    out_idx, out_nbr = neighbour_list.pairs(start, stop)
+    in_slice = (start <= idx) & (idx < stop)
+    np.testing.assert_array_equal(out_idx, idx[in_slice] - start)
+    np.testing.assert_array_equal(out_nbr, nbr[in_slice])
+    np.testing.assert_array_equal(neighbour_list.counts(start, stop),
+                                  np.bincount(idx, minlength=20)[start:stop])
+
+@pytest.mark.parametrize("method", ['linear', 'cell_list', 'kd_tree'])
+@pytest.mark.parametrize("max_dist", [15, 60, 120])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_search_matches_brute_force(method, max_dist, seed):
+    if method == 'kd_tree':
+        pytest.importorskip('scipy')
+    rng = np.random.default_rng(seed)
+    boids = Boids(300, WORLD, dict(options, vision_distance=max_dist))
+    boids.rng = rng
+    boids.generate_boids(options, distribution='random')
+    boids.setup_arrays()
+    # Put some of the boids close to the edges and corners of the world
+    edge = rng.choice([0.5, WORLD.x_max - 0.5], 50)
+    boids.pos_array[:50, 0] = edge
+    corner = rng.choice([0.5, WORLD.y_max - 0.5], 20)
+    boids.pos_array[:20, 1] = corner
+
+    boids.make_neighbourhoods_arrays(method)
+
+    idx, nbr = boids.neighbour_list.pairs()
+    found = list(zip(idx.tolist(), nbr.tolist()))
+    assert len(found) == len(set(found))
+    assert set(found) == brute_force_pairs(boids.pos_array, max_dist, WORLD)
+
+@pytest.mark.parametrize("num_queries", [None, 120])
+def test_kd_tree_blocks(num_queries):
+    pytest.importorskip('scipy')
+    rng = np.random.default_rng(3)
+    positions = rng.uniform(0, 200, (300, 2))
+    expected = kd_tree_search(positions, 30, WORLD, num_queries)
+    found = kd_tree_search(positions, 30, WORLD, num_queries, block_size=7)
+    
+    # The blocks give the same pairs, sorted by boid
+    assert np.all(np.diff(found[0]) >= 0)
+    assert set(zip(*(i.tolist() for i in found))) == set(zip(*(
+        i.tolist() for i in expected)))
+    if num_queries is not None:
+        assert found[0].max() < num_queries
+
+@pytest.mark.parametrize("max_dist", [40, 3])
+def test_cell_list_bins(max_dist):
+    # With max_dist 3 there are more than 2**16 cells, so the boids are 
+    # binned by both the low and the high 16 bits of their cells
+    rng = np.random.default_rng(2)
+    positions = rng.uniform(0, 1000, (2000, 2))
+    idx, nbr = cell_list_search(positions, max_dist)
+    
+    assert np.all(np.diff(idx) >= 0)
+    diff = positions[None, :, :] - positions[:, None, :]
+    dist_sq = diff[:, :, 0]**2 + diff[:, :, 1]**2
+    expected = np.nonzero((0 < dist_sq) & (dist_sq < max_dist**2))
+    assert set(zip(idx.tolist(), nbr.tolist())) == set(zip(*(
+        i.tolist() for i in expected)))
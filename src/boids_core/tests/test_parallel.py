@@ -0,0 +1,61 @@
+"""
+Tests of the parallel update with worker processes sharing the boid arrays
+(parallel.ParallelUpdater). The result is compared with the serial
+vectorised update, Boids.update_boids_arrays.
+
+Run with pytest from any directory.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Allow imports from the src folder
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+# Standard library imports
+import copy
+from multiprocessing import shared_memory
+import numpy as np
+import pytest
+
+# Repo module imports
+from boids_core.settings import options
+from boids_core.boids import World, Boids
+from boids_core.parallel import ParallelUpdater
+
+# -----------------------------------------------------------------------------
+
+def test_parallel_step_matches_arrays():
+    world = World([0, 500, 0, 500])
+    serial = Boids(400, world, options)
+    serial.rng = np.random.default_rng(0)
+    serial.generate_boids(options, distribution='random')
+    serial.setup_arrays()
+    parallel = copy.deepcopy(serial)
+
+    with ParallelUpdater(parallel, num_workers=2) as updater:
+        first_indices = updater.indices_shm.name
+        for step in range(5):
+            serial.step_arrays('cell_list')
+            updater.step('cell_list')
+            np.testing.assert_array_equal(parallel.pos_array,
+                                          serial.pos_array)
+            np.testing.assert_array_equal(parallel.vel_array,
+                                          serial.vel_array)
+        # The neighbour indices outgrew the first shared block
+        assert updater.indices_shm.name != first_indices
+        names = [shm.name for shm in updater.blocks]
+        names += [updater.offsets_shm.name, updater.indices_shm.name,
+                  first_indices]
+
+    # close() frees every shared memory block and copies the arrays back
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+    assert updater.processes == []
+    assert parallel.pos_array.base is None
+    assert parallel.neighbour_list.buffer.base is None
+    parallel.step_arrays('cell_list')
+    serial.step_arrays('cell_list')
+    np.testing.assert_array_equal(parallel.pos_array, serial.pos_array)
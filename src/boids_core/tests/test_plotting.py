@@ -0,0 +1,100 @@
+"""
+Tests of the plotting helpers. The batched colour lookup 
+(ColourMap.colour_indices and get_colours) is compared with the per-boid 
+lookup ColourMap.get_colour_fast, and videos written with VideoExporter are
+read back. plotting uses cv2, so these tests are skipped if it is not 
+installed. The GIF tests also need imageio.
+
+Run with pytest from any directory.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Allow imports from the src folder
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+# Standard library imports
+from math import pi
+import numpy as np
+import pytest
+
+# Repo module imports
+cv2 = pytest.importorskip('cv2')
+from boids_core.settings import options
+from boids_core import plotting
+
+# -----------------------------------------------------------------------------
+
+@pytest.mark.parametrize("num_colours", [1, 4, 7, 12])
+def test_colours_match_per_boid_lookup(num_colours):
+    colour_map = plotting.ColourMap(dict(options, num_colours=num_colours))
+    rng = np.random.default_rng(0)
+    velocities = rng.normal(0, 1, (500, 2))
+    directions = np.arctan2(velocities[:, 1], velocities[:, 0])
+    # Include the ends of the range and the edges of the bins
+    directions = np.concatenate((directions, [-pi, pi], colour_map.bins))
+    
+    idx = colour_map.colour_indices(directions)
+    colours = colour_map.get_colours(directions)
+    assert colours.dtype == np.uint8
+    for i, direction in enumerate(directions.tolist()):
+        expected = colour_map.get_colour_fast(direction)
+        assert colour_map.cmap[idx[i]] == expected
+        assert tuple(colours[i].tolist()) == expected
+
+def make_frames(num_frames, width, height):
+    """
+    Frames of a single BGR colour, cycling through blue, green and red.
+    """
+    frames = np.zeros((num_frames, height, width, 3), dtype=np.uint8)
+    for i in range(num_frames):
+        frames[i, :, :, i % 3] = 255
+    return frames
+
+def test_export_video(tmp_path):
+    filename = str(tmp_path / 'boids.mp4')
+    frames = make_frames(12, 64, 48)
+    exporter = plotting.VideoExporter(filename, 64, 48, fps=10, max_queued=2)
+    for frame in frames:
+        exporter.write(frame)
+    exporter.close()
+    assert not exporter._thread.is_alive()
+    assert exporter.num_frames == 12
+    
+    capture = cv2.VideoCapture(filename)
+    read = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        read.append(frame)
+    capture.release()
+    assert len(read) == 12
+    for frame, expected in zip(read, frames):
+        # The video is lossy, so only check the colour of each frame
+        assert frame.shape == expected.shape
+        assert np.argmax(frame.mean(axis=(0, 1))) == np.argmax(
+            expected.mean(axis=(0, 1)))
+
+def test_export_gif(tmp_path):
+    imageio = pytest.importorskip('imageio')
+    filename = str(tmp_path / 'boids.gif')
+    frames = make_frames(6, 32, 24)
+    exporter = plotting.VideoExporter(filename, 32, 24, max_queued=2)
+    for frame in frames:
+        exporter.write(frame)
+    exporter.close()
+    
+    # The GIF is RGB, and the frames were BGR
+    read = imageio.mimread(filename)
+    assert len(read) == 6
+    for frame, expected in zip(read, frames):
+        np.testing.assert_array_equal(np.asarray(frame)[:, :, :3], 
+                                      expected[:, :, ::-1])
+
+def test_export_gif_without_imageio(tmp_path, monkeypatch):
+    monkeypatch.setattr(plotting, 'imageio', None)
+    with pytest.raises(ImportError):
+        plotting.VideoExporter(str(tmp_path / 'boids.gif'), 32, 24)
@@ -0,0 +1,58 @@
+"""
+Tests of recording the trajectories of the boids to disk 
+(recorder.TrajectoryRecorder) and reading them back (recorder.read_trajectory).
+
+Run with pytest from any directory.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Allow imports from the src folder
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+# Standard library imports
+import numpy as np
+import pytest
+
+# Repo module imports
+from boids_core.settings import options
+from boids_core.boids import World, Boids
+from boids_core.recorder import TrajectoryRecorder, read_trajectory
+
+# -----------------------------------------------------------------------------
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_record_and_read(tmp_path, dtype):
+    boids = Boids(50, World([0, 300, 0, 200]), options)
+    boids.rng = np.random.default_rng(0)
+    boids.generate_boids(options, distribution='random')
+    boids.setup_arrays()
+    
+    # 10 frames at every 3rd step, in chunks of 4 frames
+    path = str(tmp_path / 'trajectory')
+    steps, positions, velocities = [], [], []
+    recorder = TrajectoryRecorder(path, boids.num, every=3, chunk_size=4,
+                                  dtype=dtype, max_queued=2)
+    with recorder:
+        for step in range(30):
+            if recorder.record(boids):
+                steps.append(step)
+                positions.append(boids.pos_array.copy())
+                velocities.append(boids.vel_array.copy())
+            boids.step_arrays('cell_list')
+    assert not recorder._thread.is_alive()
+    assert recorder.num_frames == 10
+    
+    chunks = list(read_trajectory(path))
+    assert [len(chunk_steps) for chunk_steps, pos, vel in chunks] == [4, 4, 2]
+    np.testing.assert_array_equal(
+        np.concatenate([chunk_steps for chunk_steps, pos, vel in chunks]), 
+        np.arange(0, 30, 3))
+    assert steps == list(range(0, 30, 3))
+    read_pos = np.concatenate([pos for chunk_steps, pos, vel in chunks])
+    read_vel = np.concatenate([vel for chunk_steps, pos, vel in chunks])
+    assert read_pos.dtype == dtype
+    np.testing.assert_array_equal(read_pos, np.array(positions, dtype=dtype))
+    np.testing.assert_array_equal(read_vel, np.array(velocities, dtype=dtype))
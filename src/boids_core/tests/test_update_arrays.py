@@ -0,0 +1,122 @@
+"""
+Tests that the vectorised update (Boids.update_boids_arrays) and
+Boids.update_boids_kernel give the same positions and velocities as the
+reference Boid.update_boid, for each of the neighbour search backends. Without
+numba update_boids_kernel falls back to Boid.update_boid, so the kernel 
+(kernels._update_boids) is also run directly as plain Python and compared with
+update_boids_arrays.
+
+Run with pytest from any directory.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Allow imports from the src folder
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+# Standard library imports
+import copy
+import numpy as np
+import pytest
+
+# Repo module imports
+from boids_core.settings import options
+from boids_core.boids import World, Boids
+from boids_core import kernels
+
+# -----------------------------------------------------------------------------
+
+# A short vision distance, so that some of the boids have no neighbours
+OPTIONS = dict(options, vision_distance=100)
+NUM_BOIDS = 60
+WORLD = World([0, options['world_width'], 0, options['world_height']])
+
+def setup_boids(seed, method):
+    """
+    Random boids with neighbours found by the 'method' search. Some of the
+    boids start faster than the speed limit.
+    """
+    boids = Boids(NUM_BOIDS, WORLD, OPTIONS)
+    boids.rng = np.random.default_rng(seed)
+    boids.generate_boids(OPTIONS, distribution='random')
+    for boid in boids.members[::4]:
+        boid.vel = [3*boid.vel[0], 3*boid.vel[1]]
+    boids.setup_arrays()
+    boids.make_neighbourhoods_arrays(method)
+    return boids
+
+def reference_update(boids):
+    """
+    Update a copy of each boid with Boid.update_boid, using the neighbours
+    and the positions and velocities from the start of the time-step.
+    """
+    positions = boids.pos_array.tolist()
+    velocities = boids.vel_array.tolist()
+    new_pos = np.empty((boids.num, 2))
+    new_vel = np.empty((boids.num, 2))
+    num_alone = 0
+    for boid in boids.members:
+        boid = copy.copy(boid)
+        i = boid.index
+        boid.pos = positions[i][:]
+        boid.vel = velocities[i][:]
+        boid.neighbours = boids.neighbour_list.neighbours_of(i)
+        boid.update_boid(positions, velocities, boids.world)
+        num_alone += len(boid.neighbours) == 0
+        new_pos[i] = boid.pos
+        new_vel[i] = boid.vel
+    return new_pos, new_vel, num_alone
+
+@pytest.mark.parametrize("method", ['linear', 'cell_list', 'kd_tree'])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("update", ['update_boids_arrays',
+                                    'update_boids_kernel'])
+def test_update_matches_reference(seed, method, update):
+    if method == 'kd_tree':
+        pytest.importorskip('scipy')
+    boids = setup_boids(seed, method)
+    ref_pos, ref_vel, num_alone = reference_update(boids)
+    assert num_alone > 0
+
+    getattr(boids, update)()
+
+    np.testing.assert_allclose(boids.vel_next, ref_vel, rtol=0, atol=1e-9)
+    # Positions are compared allowing for wrapping around the world
+    diff = boids.pos_next - ref_pos
+    diff[:, 0] -= WORLD.x_max * np.round(diff[:, 0] / WORLD.x_max)
+    diff[:, 1] -= WORLD.y_max * np.round(diff[:, 1] / WORLD.y_max)
+    np.testing.assert_allclose(diff, 0, rtol=0, atol=1e-9)
+
+@pytest.mark.parametrize("method", ['linear', 'cell_list', 'kd_tree'])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_python_kernel_matches_arrays(seed, method):
+    if method == 'kd_tree':
+        pytest.importorskip('scipy')
+    boids = setup_boids(seed, method)
+    new_pos = np.empty_like(boids.pos_array)
+    new_vel = np.empty_like(boids.vel_array)
+    kernels._update_boids(boids.pos_array, boids.vel_array, new_pos, new_vel,
+                          boids.neighbour_list.offsets,
+                          boids.neighbour_list.buffer, 0, boids.num,
+                          WORLD.x_max, WORLD.y_max, boids.cos_half_fov,
+                          boids.vision_distance, boids.safety_zone,
+                          boids.alignment_perception,
+                          boids.cohesion_perception,
+                          boids.separation_perception, boids.max_speed)
+
+    boids.update_boids_arrays()
+
+    np.testing.assert_allclose(new_vel, boids.vel_next, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(new_pos, boids.pos_next, rtol=0, atol=1e-12)
+
+def test_boids_without_neighbours_keep_velocity():
+    boids = setup_boids(3, 'linear')
+    alone = np.diff(boids.neighbour_list.offsets) == 0
+    assert alone.any()
+
+    boids.update_boids_arrays()
+
+    np.testing.assert_array_equal(boids.vel_next[alone],
+                                  boids.vel_array[alone])
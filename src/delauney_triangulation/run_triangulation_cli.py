@@ -13,6 +13,8 @@ import numpy as np
 from triangulation_core.linear_algebra import lexigraphic_sort
 import triangulation_core.points_tools.generate_values as generate_values
 from triangulation_core.triangulation import triangulate
+from triangulation_core.edge_topology import (TriangulationEdges, 
+                                              ArrayTriangulationEdges)
 from utilities.settings import World
 from utilities.settings import world_options
 import utilities.utilities as utilities
@@ -45,6 +47,12 @@ def set_options(world_options):
                       default=False, action='store_true',
                       help=('Plot the resulting Delauney triangulation. '
                             'Only available without --num_points_scan option.'))
+    parser.add_argument('--array_edges', 
+                      default=False, action='store_true',
+                      help=('Store the edges in numpy arrays '
+                            '(ArrayTriangulationEdges), which uses around a '
+                            'tenth of the memory, for very large numbers of '
+                            'points.'))
     
     # Points options
     points = parser.add_argument_group('Points options')
@@ -92,6 +100,7 @@ def set_options(world_options):
     
     # General options
     general_options['plot'] = args.plot
+    general_options['array_edges'] = args.array_edges
     
     # Points options
     points_options['num_points'] = args.num_points
@@ -149,6 +158,10 @@ def main(options):
     WORLD_SIZE = [0, options['max_x_val'], 
                   0, options['max_y_val']]
     world = World(WORLD_SIZE)
+    if options['array_edges']:
+        edge_class = ArrayTriangulationEdges
+    else:
+        edge_class = TriangulationEdges
 
     if options['num_points_scan']:
         steps = np.arange(2, 4.1, 1/3)
@@ -159,7 +172,7 @@ def main(options):
             options['num_points'] = num_pts
             positions = setup_points(options, world)
             start = time.time()
-            triangulation = triangulate(positions)
+            triangulation = triangulate(positions, edge_class)
             elapsed = time.time() - start
             
             # print as comma seperated values for easy cut and paste
@@ -168,7 +181,7 @@ def main(options):
     else:
         positions = setup_points(options, world)
         start = time.time()
-        triangulation = triangulate(positions)
+        triangulation = triangulate(positions, edge_class)
         elapsed = time.time() - start
         print(f'Triangulation completed:\n    Triangulated {options["num_points"]} '
               f'points in {elapsed*1000:0.2f} ms')
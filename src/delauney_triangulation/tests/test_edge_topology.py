@@ -0,0 +1,182 @@
+"""
+Tests of the edge storage backends of the triangulation. The triangulations
+made with TriangulationEdges and ArrayTriangulationEdges are compared with
+each other and with scipy.spatial.Delaunay, and the edge topology of each is
+checked for consistency.
+
+Run with pytest from any directory.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Allow imports from the src folder
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+# Standard library imports
+import numpy as np
+import pytest
+
+# Repo module imports
+from delauney_triangulation.triangulation_core.triangulation import triangulate
+from delauney_triangulation.triangulation_core.edge_topology import (TriangulationEdges,
+                                                                     ArrayTriangulationEdges)
+
+# -----------------------------------------------------------------------------
+
+BACKENDS = [TriangulationEdges, ArrayTriangulationEdges]
+
+def random_points(seed, num_points):
+    """
+    Random points, sorted lexicographically as triangulate() needs.
+    """
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, 1000, (num_points, 2))
+    return points[np.lexsort((points[:, 1], points[:, 0]))]
+
+def faces(triangulation):
+    """
+    Split the live edges into the faces on their left.
+
+    Returns
+    -------
+    out : list
+        List of faces, each a list of the edge indices around the face
+    """
+    seen = set()
+    found = []
+    for edge in triangulation.edges:
+        if edge.deactivate or edge.index in seen:
+            continue
+        face = [edge.index]
+        e = triangulation.lnext(edge.index)
+        while e != edge.index:
+            face.append(e)
+            e = triangulation.lnext(e)
+        seen.update(face)
+        found.append(face)
+    return found
+
+def triangles(triangulation):
+    """
+    Returns
+    -------
+    out : set
+        The triangles of the triangulation, each a frozenset of point indices
+    """
+    return {frozenset(triangulation.edges[e].org for e in face)
+            for face in faces(triangulation) if len(face) == 3
+            and triangulation.is_triangle(face[0])}
+
+def check_references(triangulation):
+    """
+    Check the sym, onext and oprev references of every live edge point to
+    live edges and are consistent with each other.
+    
+    Returns
+    -------
+    out : int
+        The number of live edges
+    """
+    edges = triangulation.edges
+    num_alive = 0
+    for edge in edges:
+        if edge.deactivate:
+            continue
+        num_alive += 1
+        e = edge.index
+        sym = edges[edge.sym]
+        assert edge.sym != e and sym.sym == e
+        assert not sym.deactivate
+        assert sym.org == edge.dest and sym.dest == edge.org
+        for other in (edge.onext, edge.oprev):
+            assert 0 <= other < triangulation.num_edges
+            assert not edges[other].deactivate
+            assert edges[other].org == edge.org
+        assert edges[edge.onext].oprev == e
+        assert edges[edge.oprev].onext == e
+    for e in triangulation.free:
+        assert edges[e].deactivate and edges[e + 1].deactivate
+    return num_alive
+
+def check_topology(triangulation):
+    """
+    Check the edge references (see check_references), and that the faces 
+    form a triangulation of all the points with a single outer face.
+    """
+    edges = triangulation.edges
+    num_alive = check_references(triangulation)
+
+    # Euler's formula, V - E + F = 2, for the points with edges
+    num_points = len({edge.org for edge in edges if not edge.deactivate})
+    all_faces = faces(triangulation)
+    assert num_points - num_alive//2 + len(all_faces) == 2
+    outer = [face for face in all_faces if not
+             (len(face) == 3 and triangulation.is_triangle(face[0]))]
+    assert len(outer) == 1
+
+@pytest.mark.parametrize("num_points", [3, 4, 5, 17, 200, 1000])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_backends_match_scipy(seed, num_points):
+    Delaunay = pytest.importorskip('scipy.spatial').Delaunay
+    points = random_points(seed, num_points)
+    expected = {frozenset(simplex.tolist())
+                for simplex in Delaunay(points).simplices}
+
+    results = []
+    for edge_class in BACKENDS:
+        triangulation = triangulate(points.tolist(), edge_class)
+        check_topology(triangulation)
+        assert triangles(triangulation) == expected
+        results.append(triangulation.to_arrays()[0])
+    np.testing.assert_array_equal(results[0], results[1])
+
+@pytest.mark.parametrize("edge_class", BACKENDS)
+def test_collinear_points(edge_class):
+    points = [[float(i), 2.0*i] for i in range(10)]
+    triangulation = triangulate(points, edge_class)
+    check_topology(triangulation)
+    assert triangles(triangulation) == set()
+    assert triangulation.num_edges == 2*(len(points) - 1)
+
+@pytest.mark.parametrize("edge_class", BACKENDS)
+def test_compact_remaps_edges(edge_class):
+    points = random_points(3, 300).tolist()
+    triangulation = triangulate(points, edge_class)
+    # The edges killed while merging are reused or compacted away
+    assert not triangulation.free
+    assert not any(edge.deactivate for edge in triangulation.edges)
+    rng = np.random.default_rng(3)
+    # Kill some edges, keeping the extreme edges of the hull
+    keep = {triangulation.inner, triangulation.outer}
+    for e in rng.choice(triangulation.num_edges, 100, replace=False).tolist():
+        edge = triangulation.edges[e]
+        if not edge.deactivate and not {e, edge.sym} & keep:
+            triangulation.kill_edge(e)
+    assert triangulation.free
+
+    def end_points(e):
+        edge = triangulation.edges[e]
+        return edge.org, edge.dest
+
+    # The end points of each live edge and of the edges it refers to
+    before = {}
+    for edge in triangulation.edges:
+        if not edge.deactivate:
+            before[edge.index] = [end_points(e) for e in (edge.index, edge.sym,
+                                                          edge.onext, edge.oprev)]
+    extreme = [end_points(triangulation.inner), end_points(triangulation.outer)]
+
+    new_index = triangulation.compact()
+
+    assert triangulation.num_edges == len(before)
+    assert not triangulation.free
+    assert not any(edge.deactivate for edge in triangulation.edges)
+    for old, ends in before.items():
+        edge = triangulation.edges[int(new_index[old])]
+        assert [end_points(e) for e in (edge.index, edge.sym, edge.onext,
+                                        edge.oprev)] == ends
+    assert [end_points(triangulation.inner),
+            end_points(triangulation.outer)] == extreme
+    check_references(triangulation)
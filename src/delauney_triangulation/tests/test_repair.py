@@ -0,0 +1,192 @@
+"""
+Tests of updating a triangulation as its points move, are added and are
+removed (TriangulationEdges.repair, insert_point, remove_point and locate).
+After every change the edges are compared with a triangulation of the same
+points made from scratch.
+
+Run with pytest from any directory.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Allow imports from the src folder
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Standard library imports
+import numpy as np
+import pytest
+
+# Repo module imports
+from delauney_triangulation.triangulation_core.triangulation import triangulate_indexed
+from delauney_triangulation.triangulation_core.edge_topology import (TriangulationEdges,
+                                                                     ArrayTriangulationEdges)
+from delauney_triangulation.triangulation_core.linear_algebra import on_left, on_right
+from test_edge_topology import check_topology
+
+# -----------------------------------------------------------------------------
+
+BACKENDS = [TriangulationEdges, ArrayTriangulationEdges]
+
+def make_triangulation(points, edge_class):
+    """
+    Triangulate a list of points from scratch, with the edges stored in
+    'edge_class'.
+    """
+    triangulation = triangulate_indexed(points)
+    if edge_class is TriangulationEdges:
+        return triangulation
+    edges, array_points = triangulation.to_arrays()
+    triangulation = edge_class.from_arrays(edges, array_points,
+                                           triangulation.inner,
+                                           triangulation.outer)
+    triangulation.points = list(points)
+    return triangulation
+
+def edge_set(triangulation):
+    """
+    Returns
+    -------
+    out : set
+        The live edges, each a frozenset of the indices of its end points
+    """
+    return {frozenset((edge.org, edge.dest)) for edge in triangulation.edges
+            if not edge.deactivate}
+
+def expected_edges(points, subset=None):
+    """
+    The edges of a triangulation of points[subset] made from scratch, as
+    indices of 'points'.
+    """
+    if subset is None:
+        subset = range(len(points))
+    subset = list(subset)
+    triangulation = triangulate_indexed([points[i] for i in subset])
+    return {frozenset(subset[i] for i in edge)
+            for edge in edge_set(triangulation)}
+
+@pytest.fixture
+def removed_points(monkeypatch):
+    """
+    Record the points removed with remove_point.
+    """
+    removed = []
+    remove_point = TriangulationEdges.remove_point
+    def recorded(self, p):
+        removed.append(p)
+        return remove_point(self, p)
+    monkeypatch.setattr(TriangulationEdges, 'remove_point', recorded)
+    return removed
+
+@pytest.mark.parametrize("edge_class", BACKENDS)
+@pytest.mark.parametrize("jitter", [0.5, 3, 6])
+def test_repair_matches_triangulate(edge_class, jitter, removed_points):
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0, 1000, (400, 2))
+    triangulation = make_triangulation(points.tolist(), edge_class)
+
+    num_repaired = 0
+    for frame in range(15):
+        points = points + rng.normal(0, jitter, points.shape)
+        if not triangulation.repair(points.tolist()):
+            # Too many points needed moving, triangulate from scratch
+            triangulation = make_triangulation(points.tolist(), edge_class)
+            continue
+        num_repaired += 1
+        check_topology(triangulation)
+        assert edge_set(triangulation) == expected_edges(points.tolist())
+    assert num_repaired > 0
+    if jitter > 1:
+        # Some triangles were inverted and fixed locally
+        assert removed_points
+
+@pytest.mark.parametrize("edge_class", BACKENDS)
+def test_repair_inverted_triangle(edge_class, removed_points):
+    rng = np.random.default_rng(4)
+    points = rng.uniform(0, 100, (100, 2)).tolist()
+    triangulation = make_triangulation(points, edge_class)
+    # Move one point across the triangles around it to another part of the
+    # triangulation, inverting them
+    new_points = [point[:] for point in points]
+    moved = min(range(len(points)),
+                key=lambda i: (points[i][0] - 30)**2 + (points[i][1] - 30)**2)
+    new_points[moved] = [70.5, 69.5]
+
+    assert triangulation.repair(new_points)
+    assert moved in removed_points
+    check_topology(triangulation)
+    assert edge_set(triangulation) == expected_edges(new_points)
+
+@pytest.mark.parametrize("edge_class", BACKENDS)
+def test_repair_hull_becomes_concave(edge_class):
+    rng = np.random.default_rng(1)
+    points = rng.uniform(0, 100, (50, 2)).tolist()
+    triangulation = make_triangulation(points, edge_class)
+    # Pull the left most point into the middle of the points
+    new_points = [point[:] for point in points]
+    left = min(range(len(points)), key=lambda i: points[i])
+    new_points[left] = [50.0, 50.5]
+
+    assert triangulation.repair(new_points)
+    check_topology(triangulation)
+    assert edge_set(triangulation) == expected_edges(new_points)
+
+@pytest.mark.parametrize("edge_class", BACKENDS)
+def test_insert_and_remove_points(edge_class):
+    rng = np.random.default_rng(2)
+    # Some points inside and some outside the first triangulation
+    points = np.concatenate((rng.uniform(300, 700, (60, 2)),
+                             rng.uniform(0, 1000, (60, 2)))).tolist()
+    present = list(range(40))
+    triangulation = make_triangulation(points[:40], edge_class)
+    triangulation.points = points
+
+    for p in range(40, len(points)):
+        assert triangulation.insert_point(p, near=present[-1])
+        present.append(p)
+        check_topology(triangulation)
+        assert edge_set(triangulation) == expected_edges(points, present)
+
+    for p in rng.permutation(len(points))[:100].tolist():
+        assert triangulation.remove_point(p) is not None
+        present.remove(p)
+        assert triangulation.edge_of(p) is None
+        # The hole left by the point is made Delaunay again with flips
+        hole = [edge.index for edge in triangulation.edges
+                if not edge.deactivate]
+        assert triangulation.legalise(hole)
+        check_topology(triangulation)
+        assert edge_set(triangulation) == expected_edges(points, present)
+
+def test_insert_point_on_edge_fails():
+    points = [[0.0, 0.0], [10.0, 0.0], [0.0, 10.0], [5.0, 0.0]]
+    triangulation = make_triangulation(points[:3], TriangulationEdges)
+    triangulation.points = points
+    assert not triangulation.insert_point(3)
+
+@pytest.mark.parametrize("edge_class", BACKENDS)
+def test_locate(edge_class):
+    rng = np.random.default_rng(3)
+    points = rng.uniform(0, 1000, (200, 2)).tolist()
+    triangulation = make_triangulation(points, edge_class)
+    edges = triangulation.edges
+
+    for x in rng.uniform(-200, 1200, (300, 2)).tolist():
+        e, outside = triangulation.locate(x, int(rng.integers(
+            triangulation.num_edges)))
+        org = points[edges[e].org]
+        dest = points[edges[e].dest]
+        if outside:
+            # A hull edge, with the outer face and x on its left
+            assert not triangulation.is_triangle(e)
+            assert on_left(org, dest, x)
+        else:
+            # x is inside the triangle on the left of e
+            assert triangulation.is_triangle(e)
+            e2 = triangulation.lnext(e)
+            e3 = triangulation.lnext(e2)
+            for g in (e, e2, e3):
+                assert not on_right(points[edges[g].org],
+                                    points[edges[g].dest], x)
@@ -1,15 +1,32 @@
 """
 This module implements the quad-edge data structure used by Gubias and Stolfi,
 as well as defining classes for storing multiple edge objects.
+
+Two storage backends are available. TriangulationEdges stores a list of Edge
+class objects. ArrayTriangulationEdges stores the same fields in numpy arrays,
+which takes around a tenth of the memory per edge, for triangulating very 
+large numbers of points.
+
+A Hull is a sub-triangulation whose edges are stored in a larger 
+triangulation, used by triangulate() to merge hulls without copying edges.
 """
 
 # ---------------------------------- Imports ----------------------------------
 
+# Standard library imports
+from operator import attrgetter
+import numpy as np
+
 # Repo module imports
 try:
-    from delauney_triangulation.triangulation_core.linear_algebra import list_equal
+    from delauney_triangulation.triangulation_core.linear_algebra import (list_equal, 
+                                                                          ccw_angle,
+                                                                          in_circle,
+                                                                          on_left,
+                                                                          on_right)
 except:
-    from triangulation_core.linear_algebra import list_equal
+    from triangulation_core.linear_algebra import (list_equal, ccw_angle, in_circle,
+                                                   on_left, on_right)
 
 # --------------------------------- Edge class --------------------------------
 
@@ -136,11 +153,22 @@ class Edges():
         self.num_edges = 0
         self.inner = None
         self.outer = None
+        # Index of the first of each pair of killed edges, reused by connect
+        self.free = []
+        # An edge leaving each point, see TriangulationEdges.edge_of
+        self.vertex_edge = None
         
     def push_back(self, new_edge):
         self.edges.append(new_edge)
         self.num_edges += 1
         
+    def reserve(self, capacity):
+        """
+        Make space for 'capacity' edges. The list of edges grows as needed, 
+        so this does nothing. See ArrayTriangulationEdges.reserve.
+        """
+        pass
+        
     def set_extreme_edges(self, left_most_edge, right_most_edge):
         self.inner = left_most_edge
         self.outer = right_most_edge
@@ -165,6 +193,29 @@ class Edges():
         self.edges[edge1].onext = onext_2
         self.edges[edge2].onext = onext_1
     
+    def add_edge(self, origin, dest):
+        """
+        Add an edge from 'origin' to 'dest' and its symetric edge, which are 
+        not yet connected to any other edges. The slots of a killed edge are
+        reused if there are any on the free list.
+
+        Returns
+        -------
+        out : int
+            index of the new edge. The symetric edge is the next index.
+        """
+        if self.free:
+            # Reuse the slots of a killed edge and its symetric edge
+            current_index = self.free.pop()
+            edge, edge_sym = setup_edge(origin, dest, current_index)
+            self.edges[current_index] = edge
+            self.edges[current_index + 1] = edge_sym
+        else:
+            edge, edge_sym = setup_edge(origin, dest, self.num_edges)
+            self.push_back(edge)
+            self.push_back(edge_sym)
+        return edge.index
+    
     def connect(self, edge1, edge2):
         """
         This function takes two seperated edges and creates a new edge 
@@ -180,25 +231,21 @@ class Edges():
         out : int
             index of the created edge
         """
-    
-        current_index = self.num_edges
-        edge, edge_sym = setup_edge(self.edges[edge1].dest, self.edges[edge2].org, current_index)
-        
-        self.push_back(edge)
-        self.push_back(edge_sym)
+        e = self.add_edge(self.edges[edge1].dest, self.edges[edge2].org)
     
         edge1_sym_oprev = self.edges[self.edges[edge1].sym].oprev
         
-        self.splice(edge.index, edge1_sym_oprev)
-        self.splice(self.edges[edge.index].sym, edge2)
+        self.splice(e, edge1_sym_oprev)
+        self.splice(self.edges[e].sym, edge2)
         
-        return edge.index
+        return e
         
     def kill_edge(self, e):
         """
         This function removes an edge from the triangulation by setting the 
         status of edge.deactivate to True. The function also fixed the
-        connecting edges too.
+        connecting edges too. The slots of the edge and its symetric edge are
+        added to the free list, to be reused by connect.
     
         Parameters
         ----------
@@ -212,9 +259,97 @@ class Edges():
         # Set the status of the edge and it's symetric edge to kill
         self.edges[e].deactivate = True
         self.edges[self.edges[e].sym].deactivate = True
+        self.free.append(min(e, self.edges[e].sym))
         
+    def lnext(self, e):
+        """
+        Returns
+        -------
+        out : int
+            index of the next edge around the left face of edge e
+        """
+        return self.edges[self.edges[e].sym].oprev
+
+    def flip_edge(self, e):
+        """
+        This function takes the edge e shared by two triangles and replaces it
+        with the other diagonal of the quadrilateral formed by the two 
+        triangles. This is the 'swap' operation of Guibas and Stolfi. The edge
+        keeps its index.
+
+        Parameters
+        ----------
+        e : int
+            index of edge to flip
+        """
+        e_sym = self.edges[e].sym
+        a = self.edges[e].oprev
+        b = self.edges[e_sym].oprev
+        
+        if self.vertex_edge is not None:
+            # The end points lose the edge, record another edge of each
+            self.vertex_edge[self.edges[e].org] = a
+            self.vertex_edge[self.edges[e_sym].org] = b
+        
+        # Detach the edge from its end points
+        self.splice(e, a)
+        self.splice(e_sym, b)
+        
+        # Reattach the edge to the other two corners of the quadrilateral
+        self.splice(e, self.lnext(a))
+        self.splice(e_sym, self.lnext(b))
+        
+        self.edges[e].org = self.edges[a].dest
+        self.edges[e].dest = self.edges[b].dest
+        self.edges[e_sym].org = self.edges[b].dest
+        self.edges[e_sym].dest = self.edges[a].dest
+
+    def compact(self):
+        """
+        Remove the killed edges and renumber the remaining edges, so that the
+        memory used is proportional to the number of live edges. The sym, 
+        onext and oprev references and the extreme edges are remapped to the
+        new edge indices, and the free list is emptied.
+        
+        Any other edge indices held outside of the triangulation are no 
+        longer valid, use the returned mapping to update them.
+
+        Returns
+        -------
+        new_index : list
+            The new index of each old edge, or -1 for removed edges
+        """
+        new_index = [-1]*self.num_edges
+        alive = [edge for edge in self.edges if not edge.deactivate]
+        for i, edge in enumerate(alive):
+            new_index[edge.index] = i
+        for edge in alive:
+            edge.index = new_index[edge.index]
+            edge.sym = new_index[edge.sym]
+            edge.onext = new_index[edge.onext]
+            edge.oprev = new_index[edge.oprev]
+        
+        # Replace the contents of the list, which may be shared with Hulls
+        self.edges[:] = alive
+        self.num_edges = len(alive)
+        self.free = []
+        self.vertex_edge = None
+        self.remap_extreme_edges(new_index)
+        return new_index
+    
+    def remap_extreme_edges(self, new_index):
+        if self.inner is not None:
+            self.inner = int(new_index[self.inner])
+        if self.outer is not None:
+            self.outer = int(new_index[self.outer])
+        if self.inner == -1 or self.outer == -1:
+            self.inner = self.outer = None
+
     def filter_deactivated(self):
-        self.edges = [e for e in self.edges if e.deactivate == False]
+        """
+        Remove the killed edges, see compact.
+        """
+        self.compact()
 
     def get_unique(self, num):
         unique = ['']*num
@@ -248,8 +383,793 @@ class TriangulationEdges(Edges):
         # Combine the edges data from the two triangulations
         self.edges += second_hull.edges
         self.num_edges = len1 + len2
+        self.free += [e + len1 for e in second_hull.free]
         
     def combine_triangulations(self, triangulation):
         self.merge_hulls(triangulation)
         self.points += triangulation.points
         return self
+
+    def to_arrays(self):
+        """
+        Pack the triangulation into numpy arrays, e.g. so that it can be sent
+        with the buffer based MPI methods instead of being pickled. 
+        See from_arrays.
+
+        Returns
+        -------
+        edges : numpy.ndarray
+            Array of shape (num_edges, 6). Row i is edge i, with the columns
+            [org, dest, sym, onext, oprev, deactivate].
+        points : numpy.ndarray
+            Array of shape (num_points, 2) of the points
+        """
+        edges = np.array([[edge.org, edge.dest, edge.sym, edge.onext, 
+                           edge.oprev, edge.deactivate] 
+                          for edge in self.edges], dtype=np.int64)
+        points = np.array(self.points, dtype=float)
+        return edges.reshape(-1, 6), points.reshape(-1, 2)
+
+    @classmethod
+    def from_arrays(cls, edges, points, inner, outer):
+        """
+        Make a TriangulationEdges class object from the arrays returned by
+        to_arrays, and the indices of its extreme edges.
+        """
+        triangulation = cls(points.tolist())
+        for i, (org, dest, sym, onext, oprev, deactivate) in enumerate(
+                edges.tolist()):
+            edge = Edge(i, org, dest, sym, onext, oprev)
+            edge.deactivate = bool(deactivate)
+            triangulation.push_back(edge)
+        triangulation.set_extreme_edges(inner, outer)
+        return triangulation
+
+    def interior_edges(self, points):
+        """
+        Find the edges which have a triangle on their left hand side, given 
+        the positions of the points. Edges around the outside of the convex 
+        hull have the outer face on their left instead.
+
+        Returns
+        -------
+        interior : list
+            List of bools, True for edges with a triangle on their left
+        """
+        interior = [False]*self.num_edges
+        for edge in self.edges:
+            if edge.deactivate:
+                continue
+            e1 = edge.index
+            e2 = self.lnext(e1)
+            e3 = self.lnext(e2)
+            if self.lnext(e3) == e1:
+                p1 = points[edge.org]
+                p2 = points[edge.dest]
+                p3 = points[self.edges[e2].dest]
+                interior[e1] = ccw_angle(p1, p2, p3) < 0
+        return interior
+    
+    # ------------------- Moving, adding and removing points -------------------
+
+    def edge_of(self, p):
+        """
+        Returns
+        -------
+        out : int
+            index of an edge leaving point p, or None if the point is not
+            connected to any edges
+        """
+        vertex_edge = self.vertex_edge
+        if vertex_edge is not None:
+            if p >= len(vertex_edge) or vertex_edge[p] is None:
+                return None
+            e = vertex_edge[p]
+            if e < self.num_edges:
+                edge = self.edges[e]
+                if not edge.deactivate and edge.org == p:
+                    return e
+
+        # The record is missing or out of date, find an edge of every point
+        vertex_edge = [None]*len(self.points)
+        for edge in self.edges:
+            if not edge.deactivate:
+                vertex_edge[edge.org] = edge.index
+        self.vertex_edge = vertex_edge
+        return vertex_edge[p]
+
+    def is_triangle(self, e):
+        """
+        Returns
+        -------
+        out : bool
+            True if the face on the left of edge e is a triangle, False if it
+            is the outer face of the triangulation
+        """
+        e2 = self.lnext(e)
+        if self.lnext(self.lnext(e2)) != e:
+            return False
+        edge = self.edges[e]
+        return on_left(self.points[edge.org], self.points[edge.dest],
+                       self.points[self.edges[e2].dest])
+
+    def legalise(self, stack, max_flips=None, interior=None):
+        """
+        Restore the Delaunay property by flipping any edges which fail the
+        in-circle test (Lawson's algorithm), starting from the edges in
+        'stack'. The four outer edges of the quadrilateral of each flipped
+        edge are checked next, so only the edges near the changes are tested.
+
+        Parameters
+        ----------
+        stack : list
+            Indices of the edges which could need flipping
+        max_flips : int, optional
+            Give up after this many flips. The default is no limit.
+        interior : list, optional
+            List of bools, True for edges with a triangle on their left (see
+            interior_edges), to save testing the faces again. Flips do not
+            change it. The default is to test the faces.
+
+        Returns
+        -------
+        out : bool
+            False if more than max_flips flips were needed
+        """
+        edges = self.edges
+        points = self.points
+        lnext = self.lnext
+        stack = list(dict.fromkeys(min(e, edges[e].sym) for e in stack))
+        in_stack = set(stack)
+        num_flips = 0
+        while stack:
+            e = stack.pop()
+            in_stack.discard(e)
+            edge = edges[e]
+            if edge.deactivate:
+                continue
+            e_sym = edge.sym
+            if interior is None:
+                if not (self.is_triangle(e) and self.is_triangle(e_sym)):
+                    continue
+            elif not (interior[e] and interior[e_sym]):
+                continue
+            p1 = points[edge.org]
+            p2 = points[edge.dest]
+            p3 = points[edges[lnext(e)].dest]
+            p4 = points[edges[lnext(e_sym)].dest]
+            if not in_circle(p1, p2, p3, p4):
+                continue
+
+            self.flip_edge(e)
+            num_flips += 1
+            if max_flips is not None and num_flips > max_flips:
+                return False
+
+            # The four outer edges of the quadrilateral may now need flipping
+            for outer in [lnext(e), lnext(lnext(e)),
+                          lnext(e_sym), lnext(lnext(e_sym))]:
+                outer = min(outer, edges[outer].sym)
+                if outer not in in_stack:
+                    stack.append(outer)
+                    in_stack.add(outer)
+        return True
+
+    def locate(self, x, e):
+        """
+        Find the triangle containing the point x by walking across the
+        triangulation from edge e, the 'Locate' procedure of Guibas and
+        Stolfi. The convex hull of the points must be convex.
+
+        Returns
+        -------
+        e : int
+            If x is inside the triangulation, an edge of the triangle
+            containing x, with the triangle on its left. Otherwise an edge of
+            the convex hull, with the outer face and x on its left.
+        outside : bool
+            True if x is outside of the triangulation
+        """
+        edges = self.edges
+        points = self.points
+        if not self.is_triangle(e):
+            e = edges[e].sym
+            if not self.is_triangle(e):
+                return e, True
+        for i in range(self.num_edges + 1):
+            edge = edges[e]
+            p1 = points[edge.org]
+            p2 = points[edge.dest]
+            if on_right(p1, p2, x):
+                e = edge.sym
+            elif not on_right(p1, points[edges[edge.onext].dest], x):
+                e = edge.onext
+            else:
+                # Dprev, the edge before e around its destination
+                dprev = edges[self.lnext(e)].sym
+                if not on_right(points[edges[dprev].org], p2, x):
+                    e = dprev
+                else:
+                    return e, False
+            if not self.is_triangle(e):
+                return e, True
+        raise RuntimeError("The walk across the triangulation did not finish")
+
+    def insert_point(self, p, near=None):
+        """
+        Add point p, an index of self.points which is not connected to any
+        edges, to the triangulation. The point is connected to the corners
+        of the triangle containing it, or to the hull edges it can see if it
+        is outside of the triangulation, and the Delaunay property is then
+        restored with edge flips.
+
+        Parameters
+        ----------
+        p : int
+            Index of the point to add
+        near : int, optional
+            A point of the triangulation near p, where the search for the
+            triangle containing p starts. The default is to start anywhere.
+
+        Returns
+        -------
+        out : bool
+            False if the point could not be added, because it is exactly on
+            an existing edge or point
+        """
+        edges = self.edges
+        points = self.points
+        x = points[p]
+        start = self.edge_of(near) if near is not None else None
+        if start is None:
+            start = next((edge.index for edge in edges
+                          if not edge.deactivate), None)
+            if start is None:
+                return False
+        e, outside = self.locate(x, start)
+
+        def visible(g):
+            return on_left(points[edges[g].org], points[edges[g].dest], x)
+
+        if outside:
+            if not visible(e):
+                return False
+            # Find the run of hull edges which can be seen from the point
+            first = e
+            g = edges[edges[first].onext].sym
+            while g != e and visible(g):
+                first = g
+                g = edges[edges[first].onext].sym
+            chain = [first]
+            g = self.lnext(first)
+            while g != first and visible(g):
+                chain.append(g)
+                g = self.lnext(g)
+            stack = list(chain)
+        else:
+            stack = [e, self.lnext(e), self.lnext(self.lnext(e))]
+            for g in stack:
+                edge = edges[g]
+                if ccw_angle(points[edge.org], points[edge.dest], x) == 0:
+                    return False
+            chain = stack[:2]
+
+        # Connect the point to the start of the chain, then to the end of
+        # each edge of the chain
+        base = self.add_edge(edges[chain[0]].org, p)
+        self.splice(base, chain[0])
+        for g in chain:
+            base = self.connect(g, edges[base].sym)
+
+        if self.vertex_edge is not None:
+            if p >= len(self.vertex_edge):
+                self.vertex_edge += [None]*(p + 1 - len(self.vertex_edge))
+            self.vertex_edge[p] = edges[base].sym
+        return self.legalise(stack)
+
+    def remove_point(self, p):
+        """
+        Remove point p from the triangulation. The edges of the point are
+        flipped away from it until it is the corner of only three triangles,
+        or if it is on the convex hull until none of its edges can be flipped,
+        and its remaining edges are then killed. The point stays in
+        self.points but is no longer connected to any edges.
+
+        The triangles around the hole left by the point are not necessarily
+        Delaunay, the returned edges should be checked with legalise.
+
+        Returns
+        -------
+        edges : list
+            Indices of the edges around the hole and the flipped edges, or
+            None if the point could not be removed
+        """
+        edges = self.edges
+        points = self.points
+        e0 = self.edge_of(p)
+        if e0 is None:
+            return []
+        flipped = []
+        while True:
+            ring = [e0]
+            e = edges[e0].onext
+            while e != e0:
+                ring.append(e)
+                e = edges[e].onext
+            interior = [self.is_triangle(e) for e in ring]
+            on_hull = not all(interior)
+            if not on_hull and len(ring) <= 3:
+                break
+
+            # Flip an edge of the point whose quadrilateral is convex. The
+            # face on the right of an edge is the face on the left of the
+            # previous edge around the point.
+            for i, e in enumerate(ring):
+                if not (interior[i] and interior[i - 1]):
+                    continue
+                c = points[edges[self.lnext(e)].dest]
+                d = points[edges[self.lnext(edges[e].sym)].dest]
+                if (ccw_angle(c, d, points[p]) *
+                        ccw_angle(c, d, points[edges[e].dest]) < 0):
+                    self.flip_edge(e)
+                    flipped.append(e)
+                    break
+            else:
+                break
+            e0 = self.edge_of(p)
+
+        if len(ring) < 2 or (not on_hull and len(ring) > 3):
+            return None
+        link = [self.lnext(e) for e in ring]
+        for e, g in zip(ring, link):
+            self.vertex_edge[edges[e].dest] = g
+        for e in ring:
+            self.kill_edge(e)
+        self.vertex_edge[p] = None
+        for e in (self.inner, self.outer):
+            if e is not None and edges[e].deactivate:
+                # The extreme edges are only needed to merge triangulations
+                self.inner = self.outer = None
+        return link + flipped
+
+    def repair(self, new_points, max_flips=None):
+        """
+        Incrementally update the triangulation after the points have moved,
+        instead of triangulating the points again from scratch. The edges are
+        kept and the Delaunay property is restored by flipping any edges which
+        fail the in-circle test (Lawson's algorithm). For small movements of
+        the points only a few edges near the moving points need flipping.
+
+        Flips can only fix the triangulation if all the triangles keep the
+        same orientation and the convex hull stays convex. The corners of
+        any triangle which the movement would invert, and any point which
+        would make the hull concave, are removed before the points move and
+        added again afterwards (see remove_point and insert_point), so that
+        inverted triangles are fixed locally. Points without any edges are
+        ignored.
+
+        Parameters
+        ----------
+        new_points : list
+            New positions of the points, in the same order as self.points
+        max_flips : int, optional
+            Give up after this many flips. The default is 10 flips per edge.
+
+        Returns
+        -------
+        out : bool
+            True if the triangulation was repaired. If False the repair
+            failed part way through, and the points must be triangulated
+            again from scratch.
+        """
+        edges = self.edges
+        lnext = self.lnext
+        old_points = self.points
+        interior = [False]*self.num_edges
+        affected = set()
+
+        def check_face(e):
+            # Find whether the face on the left of edge e is a triangle from
+            # the old positions, and whether the new positions invert it
+            edge = edges[e]
+            e2 = lnext(e)
+            org, dest, third = edge.org, edge.dest, edges[e2].dest
+            if (lnext(lnext(e2)) == e and on_left(old_points[org],
+                                                  old_points[dest],
+                                                  old_points[third])):
+                interior[e] = True
+                if not on_left(new_points[org], new_points[dest],
+                               new_points[third]):
+                    affected.update((org, dest, third))
+            else:
+                # The outer face, the hull must stay convex at dest
+                interior[e] = False
+                if on_left(new_points[org], new_points[dest],
+                           new_points[third]):
+                    affected.add(dest)
+
+        # Check every face, and find the edges with a triangle on both sides
+        # which could need flipping
+        stack = []
+        for edge in edges:
+            if edge.deactivate:
+                continue
+            e = edge.index
+            check_face(e)
+            if e > edge.sym and interior[e] and interior[edge.sym]:
+                stack.append(edge.sym)
+
+        # Remove the corners of the faces to fix from the old triangulation,
+        # until none of the new faces are inverted. If many points have to be
+        # moved this way it is quicker to triangulate from scratch.
+        removed = []
+        while affected:
+            if len(removed) + len(affected) > len(new_points) // 4:
+                return False
+            changed = []
+            for p in affected:
+                hole = self.remove_point(p)
+                if hole is None:
+                    return False
+                if hole:
+                    removed.append((p, edges[hole[0]].org))
+                    changed += hole
+            affected = set()
+            for e in changed:
+                if not edges[e].deactivate:
+                    # The faces on both sides, and the face before e around
+                    # the hole in case it is the outer face
+                    for g in (e, edges[e].sym, edges[edges[e].onext].sym):
+                        check_face(g)
+            stack += changed
+
+        self.points = new_points
+        if max_flips is None:
+            max_flips = 10*self.num_edges
+        if not self.legalise(stack, max_flips, interior):
+            return False
+        for p, near in removed:
+            if not self.insert_point(p, near):
+                return False
+        return True
+
+# ------------------------------ Hulls in a pool ------------------------------
+
+class Hull():
+    """
+    A triangulation of a run of the points of a larger triangulation, whose 
+    edges are stored in the larger triangulation, the 'pool'. All of the 
+    hulls made by triangulate() share one pool of edges and points, so two
+    hulls can be merged by only adding the edges between them, without 
+    renumbering the edges or copying the points (see merge_hulls).
+    
+    A Hull has the same attributes and edge methods as TriangulationEdges, 
+    so the merging functions work with either. The pool must not be 
+    compacted while its hulls are in use, as this renumbers the edges.
+
+    Parameters
+    ----------
+    pool : TriangulationEdges
+        The triangulation storing the edges and points
+    inner : int
+        Index of the edge with the left most point
+    outer : int
+        Index of the edge with the right most point
+    """
+    def __init__(self, pool, inner, outer):
+        self.pool = pool
+        self.points = pool.points
+        self.edges = pool.edges
+        self.inner = inner
+        self.outer = outer
+        self.splice = pool.splice
+        self.connect = pool.connect
+        self.kill_edge = pool.kill_edge
+        self.lnext = pool.lnext
+        
+    @property
+    def num_edges(self):
+        return self.pool.num_edges
+        
+    def set_extreme_edges(self, left_most_edge, right_most_edge):
+        self.inner = left_most_edge
+        self.outer = right_most_edge
+        
+    def merge_hulls(self, second_hull):
+        """
+        The edges of both hulls are already in the pool, so nothing needs 
+        to be copied or renumbered.
+        """
+        if second_hull.pool is not self.pool:
+            raise ValueError("Only hulls sharing a pool can be merged")
+        
+    def combine_triangulations(self, triangulation):
+        self.merge_hulls(triangulation)
+        return self
+
+# ------------------------ Array backed triangulations ------------------------
+
+def _edge_field(name):
+    """
+    Property of EdgeRef reading and writing the array 'name' of its store.
+    """
+    get_array = attrgetter('store.' + name)
+    def getter(self):
+        return get_array(self)[self.index]
+    def setter(self, value):
+        get_array(self)[self.index] = value
+    return property(getter, setter)
+
+class EdgeRef():
+    """
+    A view of a single edge of an ArrayTriangulationEdges, with the same
+    attributes as the Edge class. Reading or setting an attribute reads or 
+    writes the arrays of the triangulation, so existing code written for 
+    Edge class objects works with either backend.
+    """
+    __slots__ = ('store', 'index')
+    
+    def __init__(self, store, idx):
+        self.store = store
+        self.index = idx
+        
+    org = _edge_field('_org')
+    dest = _edge_field('_dest')
+    sym = _edge_field('_sym')
+    onext = _edge_field('_onext')
+    oprev = _edge_field('_oprev')
+    
+    @property
+    def deactivate(self):
+        return not self.store._alive[self.index]
+    
+    @deactivate.setter
+    def deactivate(self, value):
+        self.store._alive[self.index] = not value
+        
+    __repr__ = Edge.__repr__
+    return_point = Edge.return_point
+    find_connections = Edge.find_connections
+
+class EdgeView():
+    """
+    Read-only sequence of the edges of an ArrayTriangulationEdges, used as
+    its 'edges' attribute. Indexing or iterating gives EdgeRef objects.
+    """
+    __slots__ = ('store',)
+    
+    def __init__(self, store):
+        self.store = store
+        
+    def __len__(self):
+        return self.store.num_edges
+        
+    def __getitem__(self, e):
+        store = self.store
+        if 0 <= e < store.num_edges:
+            return EdgeRef(store, e)
+        if -store.num_edges <= e < 0:
+            return EdgeRef(store, e + store.num_edges)
+        raise IndexError("edge index out of range")
+    
+    def __iter__(self):
+        store = self.store
+        for e in range(store.num_edges):
+            yield EdgeRef(store, e)
+
+class ArrayTriangulationEdges(TriangulationEdges):
+    """
+    Alternative backend for TriangulationEdges. Instead of a list of Edge 
+    class objects, the origin, destination, sym, onext and oprev of every 
+    edge are stored in preallocated int32 numpy arrays, and the status of 
+    each edge in a bool array. The arrays double in size when they are full,
+    so adding an edge is amortised O(1).
+    
+    The splice, connect, kill_edge and lnext methods work on the arrays 
+    directly, through memoryviews of them, which return plain Python ints. 
+    The 'edges' attribute is an EdgeView, so all of the other methods and 
+    functions written for TriangulationEdges also work.
+    
+    An edge takes 21 bytes, compared with ~200 bytes for an Edge class 
+    object and its list entry. compact() shrinks the arrays to the live 
+    edges.
+
+    Parameters
+    ----------
+    points_subset : list
+        The points of the triangulation
+    capacity : int, optional
+        Number of edges to allocate space for. The default is 8.
+    """
+    def __init__(self, points_subset, capacity=8):
+        self.points = points_subset
+        self.num_edges = 0
+        self.inner = None
+        self.outer = None
+        self._org = self._dest = self._sym = None
+        self._onext = self._oprev = self._alive = None
+        self.free = []
+        self.vertex_edge = None
+        self.capacity = 0
+        self.reserve(capacity)
+        self.edges = EdgeView(self)
+    
+    @property
+    def org(self):
+        return self._org.obj[:self.num_edges]
+    
+    @property
+    def dest(self):
+        return self._dest.obj[:self.num_edges]
+    
+    @property
+    def alive(self):
+        return self._alive.obj[:self.num_edges]
+    
+    @property
+    def nbytes(self):
+        """
+        Memory used by the edge arrays, in bytes.
+        """
+        return self.capacity * (5*4 + 1)
+        
+    def reserve(self, capacity):
+        """
+        Make sure there is space for at least 'capacity' edges, growing the
+        arrays to the larger of 'capacity' and twice their size if needed.
+        """
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, 2*self.capacity)
+        num = self.num_edges
+        arrays = []
+        for old, dtype in ((self._org, np.int32), (self._dest, np.int32), 
+                           (self._sym, np.int32), (self._onext, np.int32), 
+                           (self._oprev, np.int32), (self._alive, np.bool_)):
+            new = np.zeros(capacity, dtype=dtype)
+            if old is not None:
+                new[:num] = old.obj[:num]
+            # memoryviews give fast access to single elements as Python ints
+            arrays.append(memoryview(new))
+        (self._org, self._dest, self._sym, 
+         self._onext, self._oprev, self._alive) = arrays
+        self.capacity = capacity
+        
+    def add_edge(self, origin, dest):
+        """
+        Add an edge from 'origin' to 'dest' and its symmetric edge, like 
+        setup_edge and push_back. The slots of a killed edge are reused if 
+        there are any on the free list.
+
+        Returns
+        -------
+        out : int
+            index of the new edge. The symmetric edge is the next index.
+        """
+        if self.free:
+            e = self.free.pop()
+        else:
+            e = self.num_edges
+            if e + 2 > self.capacity:
+                self.reserve(e + 2)
+            self.num_edges += 2
+        self._org[e] = self._dest[e+1] = origin
+        self._dest[e] = self._org[e+1] = dest
+        self._sym[e] = self._onext[e+1] = self._oprev[e+1] = e + 1
+        self._sym[e+1] = self._onext[e] = self._oprev[e] = e
+        self._alive[e] = self._alive[e+1] = True
+        return e
+        
+    def push_back(self, new_edge):
+        """
+        Add an Edge class object. Its index must be the next edge index.
+        """
+        e = self.num_edges
+        if new_edge.index != e:
+            raise ValueError("Edges must be added in order of index")
+        if e + 1 > self.capacity:
+            self.reserve(e + 1)
+        self._org[e] = new_edge.org
+        self._dest[e] = new_edge.dest
+        self._sym[e] = new_edge.sym
+        self._onext[e] = new_edge.onext
+        self._oprev[e] = new_edge.oprev
+        self._alive[e] = not new_edge.deactivate
+        self.num_edges += 1
+        
+    def splice(self, edge1, edge2):
+        onext = self._onext
+        oprev = self._oprev
+        onext_1 = onext[edge1]
+        onext_2 = onext[edge2]
+        oprev[onext_1] = edge2
+        oprev[onext_2] = edge1
+        onext[edge1] = onext_2
+        onext[edge2] = onext_1
+        
+    def connect(self, edge1, edge2):
+        e = self.add_edge(self._dest[edge1], self._org[edge2])
+        self.splice(e, self._oprev[self._sym[edge1]])
+        self.splice(e + 1, edge2)
+        return e
+    
+    def kill_edge(self, e):
+        e_sym = self._sym[e]
+        self.splice(e, self._oprev[e])
+        self.splice(e_sym, self._oprev[e_sym])
+        self._alive[e] = False
+        self._alive[e_sym] = False
+        self.free.append(min(e, e_sym))
+        
+    def lnext(self, e):
+        return self._oprev[self._sym[e]]
+    
+    def shift_indices(self, shift_edges, shift_points):
+        num = self.num_edges
+        for array, shift in ((self._org, shift_points), 
+                             (self._dest, shift_points),
+                             (self._sym, shift_edges), 
+                             (self._onext, shift_edges),
+                             (self._oprev, shift_edges)):
+            array.obj[:num] += shift
+            
+    def merge_hulls(self, second_hull):
+        len1 = self.num_edges
+        len2 = second_hull.num_edges
+        second_hull.shift_indices(len1, len(self.points))
+        self.reserve(len1 + len2)
+        for name in ('_org', '_dest', '_sym', '_onext', '_oprev', '_alive'):
+            getattr(self, name).obj[len1:len1 + len2] = \
+                getattr(second_hull, name).obj[:len2]
+        self.num_edges = len1 + len2
+        self.free += [e + len1 for e in second_hull.free]
+        
+    def compact(self):
+        """
+        See Edges.compact. The arrays are reallocated to hold only the live
+        edges, and new_index is returned as a numpy array.
+        """
+        num = self.num_edges
+        alive = self.alive
+        num_alive = int(np.count_nonzero(alive))
+        new_index = np.full(num, -1, dtype=np.int32)
+        new_index[alive] = np.arange(num_alive, dtype=np.int32)
+        arrays = []
+        for old, remap in ((self._org, False), (self._dest, False), 
+                           (self._sym, True), (self._onext, True), 
+                           (self._oprev, True)):
+            new = old.obj[:num][alive]
+            if remap:
+                new = new_index[new]
+            arrays.append(memoryview(np.ascontiguousarray(new, 
+                                                          dtype=np.int32)))
+        arrays.append(memoryview(np.ones(num_alive, dtype=np.bool_)))
+        (self._org, self._dest, self._sym, 
+         self._onext, self._oprev, self._alive) = arrays
+        self.capacity = self.num_edges = num_alive
+        self.free = []
+        self.vertex_edge = None
+        self.remap_extreme_edges(new_index)
+        return new_index
+        
+    def to_arrays(self):
+        num = self.num_edges
+        edges = np.empty((num, 6), dtype=np.int64)
+        for col, array in enumerate((self._org, self._dest, self._sym, 
+                                     self._onext, self._oprev)):
+            edges[:, col] = array.obj[:num]
+        edges[:, 5] = ~self._alive.obj[:num]
+        return edges, np.array(self.points, dtype=float).reshape(-1, 2)
+    
+    @classmethod
+    def from_arrays(cls, edges, points, inner, outer):
+        num = len(edges)
+        triangulation = cls(points.tolist(), capacity=max(num, 8))
+        for col, array in enumerate((triangulation._org, triangulation._dest, 
+                                     triangulation._sym, triangulation._onext, 
+                                     triangulation._oprev)):
+            array.obj[:num] = edges[:, col]
+        triangulation._alive.obj[:num] = edges[:, 5] == 0
+        triangulation.num_edges = num
+        triangulation.set_extreme_edges(inner, outer)
+        return triangulation
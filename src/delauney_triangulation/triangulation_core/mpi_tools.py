@@ -0,0 +1,173 @@
+"""
+This module contains functions for sharing the work of the Delaunay
+triangulation between MPI ranks. The sorted points are scattered between the
+ranks, each rank triangulates its own points, and the triangulations are
+merged in a binary tree (see tree_merge). The points and the edges of the
+triangulations are sent as contiguous numpy arrays with the buffer based
+(upper case) mpi4py methods, with the counts and displacements of each rank
+worked out in advance, instead of pickling lists of points and
+TriangulationEdges class objects.
+"""
+
+# ---------------------------------- Imports ----------------------------------
+
+# Standard library imports
+import numpy as np
+
+# Repo module imports
+try:
+    import delauney_triangulation.triangulation_core.points_tools.split_list as split_list
+    from delauney_triangulation.triangulation_core.edge_topology import TriangulationEdges
+    from delauney_triangulation.triangulation_core.triangulation import merge_triangulations
+except:
+    import triangulation_core.points_tools.split_list as split_list
+    from triangulation_core.edge_topology import TriangulationEdges
+    from triangulation_core.triangulation import merge_triangulations
+
+# --------------------------- Counts and displacements ------------------------
+
+def split_counts(num_points, size):
+    """
+    Split 'num_points' sorted points between 'size' ranks. Each rank is given
+    a run of whole groups of split_list.groups_of_3, so the groups made by
+    each rank from its own points are the same as the groups of all of the
+    points. Ranks at the end can be given no points.
+
+    Returns
+    -------
+    counts : numpy.ndarray
+        Number of points given to each rank
+    displs : numpy.ndarray
+        Index of the first point given to each rank
+    """
+    sizes = split_list.group_sizes(num_points)
+    groups_per_rank = int(len(sizes)/size) + 1
+    counts = np.array([sum(sizes[i:i + groups_per_rank])
+                       for i in range(0, groups_per_rank*size,
+                                      groups_per_rank)], dtype=np.int64)
+    displs = np.zeros(size, dtype=np.int64)
+    displs[1:] = np.cumsum(counts)[:-1]
+    return counts, displs
+
+# ------------------------------- Communication -------------------------------
+
+def scatter_points(comm, points, root=0):
+    """
+    Scatter sorted points from the 'root' rank, see split_counts.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Comm
+    points : numpy.ndarray
+        Array of shape (N, 2) of lexicographically sorted points. Only used
+        on the root rank.
+    root : int, optional
+        The rank holding the points. The default is 0.
+
+    Returns
+    -------
+    points : list
+        The points given to this rank, of the form [ [x1, y1], ... ]. 
+        Splitting these with split_list.groups_of_3, e.g. in triangulate(), 
+        gives the same groups as splitting all of the points.
+    """
+    rank = comm.Get_rank()
+    num_points = np.zeros(1, dtype=np.int64)
+    if rank == root:
+        points = np.ascontiguousarray(points, dtype=float)
+        num_points[0] = len(points)
+    comm.Bcast(num_points, root=root)
+
+    counts, displs = split_counts(int(num_points[0]), comm.Get_size())
+    local = np.empty((counts[rank], 2))
+    if rank == root:
+        comm.Scatterv([points, (2*counts, 2*displs)], local, root=root)
+    else:
+        comm.Scatterv(None, local, root=root)
+    return local.tolist()
+
+def send_triangulation(comm, triangulation, dest):
+    """
+    Send a triangulation to rank 'dest' as numpy buffers, see 
+    TriangulationEdges.to_arrays. A header with the sizes of the arrays and
+    the extreme edges is sent first. 'triangulation' can be None, e.g. for a
+    rank which had no points.
+    """
+    if triangulation is None:
+        comm.Send(np.array([0, 0, -1, -1], dtype=np.int64), dest=dest)
+        return
+    edges, points = triangulation.to_arrays()
+    header = np.array([len(edges), len(points), 
+                       triangulation.inner, triangulation.outer], 
+                      dtype=np.int64)
+    comm.Send(header, dest=dest)
+    comm.Send(edges, dest=dest)
+    comm.Send(points, dest=dest)
+
+def recv_triangulation(comm, source):
+    """
+    Receive a triangulation sent with send_triangulation from rank 'source'.
+
+    Returns
+    -------
+    triangulation : TriangulationEdges
+        The triangulation, or None if no triangulation was sent
+    """
+    header = np.empty(4, dtype=np.int64)
+    comm.Recv(header, source=source)
+    num_edges, num_points, inner, outer = header.tolist()
+    if num_points == 0:
+        return None
+    edges = np.empty((num_edges, 6), dtype=np.int64)
+    points = np.empty((num_points, 2))
+    comm.Recv(edges, source=source)
+    comm.Recv(points, source=source)
+    return TriangulationEdges.from_arrays(edges, points, inner, outer)
+
+def tree_merge(comm, triangulation):
+    """
+    Merge the triangulations of the ranks into a single triangulation with a
+    binary tree reduction. The triangulation of each rank must be of points
+    to the left of the points of the next rank, as given by scatter_points.
+    
+    In round k, each rank r with r % 2**(k+1) == 0 receives the 
+    triangulation of rank r + 2**k, the adjacent strip to its right, and 
+    merges the two. The merges of each round happen in parallel, and all of 
+    the points are triangulated after ceil(log2(P)) rounds. Any number of 
+    ranks is supported, a rank without a partner in a round just waits for
+    the next round.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Comm
+    triangulation : TriangulationEdges
+        The triangulation made by this rank, or None if this rank had no
+        points to triangulate
+
+    Returns
+    -------
+    triangulation : TriangulationEdges
+        On rank 0, the triangulation of all of the points, without any 
+        deleted edges. None on the other ranks.
+    """
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    step = 1
+    while step < size:
+        if rank % (2*step) == step:
+            if triangulation is not None and triangulation.free:
+                # Only send the live edges
+                triangulation.compact()
+            send_triangulation(comm, triangulation, rank - step)
+            return None
+        if rank + step < size:
+            right = recv_triangulation(comm, rank + step)
+            if triangulation is None:
+                triangulation = right
+            elif right is not None:
+                triangulation = merge_triangulations([[triangulation, 
+                                                       right]])[0][0]
+        step *= 2
+    if triangulation is not None and triangulation.free:
+        triangulation.compact()
+    return triangulation
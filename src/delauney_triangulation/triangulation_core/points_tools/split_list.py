@@ -47,3 +47,14 @@ def groups_of_3(points):
         split = [[points[0], points[1]]]
         split2 = [points[i:i+3] for i in range(2, num, 3)]
     return split + split2
+
+def group_sizes(num_points):
+    """
+    The number of points in each group made by groups_of_3 from 'num_points'
+    points.
+    """
+    if num_points%3 == 0:
+        return [3]*(num_points//3)
+    elif num_points%3 == 1:
+        return [2, 2] + [3]*((num_points - 4)//3)
+    return [2] + [3]*((num_points - 2)//3)
@@ -4,6 +4,13 @@ algorithm as presented in:
     L. J. Guibas, J. Stolfi, "Primitives for the manipulation of general 
     subdivisions and the computation of Voronoi diagrams" (1985)
 This algorithm computes the Delaunay triangulation of a set of input points.
+
+All of the edges made by triangulate() are stored in a single pool, allocated 
+up front, and the sub-triangulations being merged are edge_topology.Hull 
+objects referring to the pool. Merging two hulls only adds the edges between 
+them, the edges of the hulls are never copied or renumbered. The slots of 
+the edges deleted while merging are reused for new edges, and the deleted 
+edges left at the end are removed (see TriangulationEdges.compact).
 """
 
 # ---------------------------------- Imports ----------------------------------
@@ -12,11 +19,13 @@ This algorithm computes the Delaunay triangulation of a set of input points.
 try:
     import delauney_triangulation.triangulation_core.points_tools.split_list as split_list
     import delauney_triangulation.triangulation_core.linear_algebra as linalg
-    from delauney_triangulation.triangulation_core.triangulation_primitives import make_primitives
+    from delauney_triangulation.triangulation_core.triangulation_primitives import make_pooled_primitives
+    from delauney_triangulation.triangulation_core.edge_topology import TriangulationEdges, Hull
 except:
     import triangulation_core.points_tools.split_list as split_list
     import triangulation_core.linear_algebra as linalg
-    from triangulation_core.triangulation_primitives import make_primitives
+    from triangulation_core.triangulation_primitives import make_pooled_primitives
+    from triangulation_core.edge_topology import TriangulationEdges, Hull
     
 # --------------------------- Edge finding functions --------------------------
 
@@ -48,24 +57,29 @@ def lowest_common_tangent(h_left, h_right):
     
     pts_left = h_left.points
     pts_right = h_right.points
+    edges_left = h_left.edges
+    edges_right = h_right.edges
     
-    p1 = pts_left[h_left.edges[left_e].org]
-    p2 = pts_left[h_left.edges[left_e].dest]
+    edge = edges_left[left_e]
+    p1 = pts_left[edge.org]
+    p2 = pts_left[edge.dest]
 
-    p4 = pts_right[h_right.edges[right_e].org]
-    p5 = pts_right[h_right.edges[right_e].dest] 
+    edge = edges_right[right_e]
+    p4 = pts_right[edge.org]
+    p5 = pts_right[edge.dest] 
 
     while True:
-        if linalg.on_right(p1, p2, pts_right[h_right.edges[right_e].org]):
-            left_e = h_left.edges[h_left.edges[left_e].sym].onext
-
-            p1 = pts_left[h_left.edges[left_e].org]
-            p2 = pts_left[h_left.edges[left_e].dest]
-
-        elif linalg.on_left(p4, p5, pts_left[h_left.edges[left_e].org]):
-            right_e = h_right.edges[h_right.edges[right_e].sym].oprev
-            p4 = pts_right[h_right.edges[right_e].org]
-            p5 = pts_right[h_right.edges[right_e].dest]
+        if linalg.on_right(p1, p2, p4):
+            left_e = edges_left[edges_left[left_e].sym].onext
+            edge = edges_left[left_e]
+            p1 = pts_left[edge.org]
+            p2 = pts_left[edge.dest]
+
+        elif linalg.on_left(p4, p5, p1):
+            right_e = edges_right[edges_right[right_e].sym].oprev
+            edge = edges_right[right_e]
+            p4 = pts_right[edge.org]
+            p5 = pts_right[edge.dest]
             
         else:
             return left_e, right_e
@@ -96,16 +110,16 @@ def rcand_func(rhull, rcand, b1, b2):
     rcand : TYPE
         DESCRIPTION.
     """
+    edges = rhull.edges
+    points = rhull.points
     completed = False
     while not completed:
-        rcand_onext_dest = rhull.edges[rhull.edges[rcand].onext].dest
-        rcand_dest = rhull.edges[rcand].dest
-        ccw_test = linalg.on_right(b1, b2, rhull.points[rcand_onext_dest])
-        next_cand_invalid = linalg.in_circle(b2, b1, 
-                                             rhull.points[rcand_dest], 
-                                             rhull.points[rcand_onext_dest])
-        if ccw_test and next_cand_invalid:
-            t = rhull.edges[rcand].onext
+        edge = edges[rcand]
+        t = edge.onext
+        rcand_onext_dest = edges[t].dest
+        ccw_test = linalg.on_right(b1, b2, points[rcand_onext_dest])
+        if ccw_test and linalg.in_circle(b2, b1, points[edge.dest], 
+                                         points[rcand_onext_dest]):
             rhull.kill_edge(rcand)
             rcand = t
         else:
@@ -117,16 +131,16 @@ def lcand_func(lhull, lcand, b1, b2):
     This function performs the same task as the above 'rcand_func' but testing
     for the left candidate edge. 
     """
+    edges = lhull.edges
+    points = lhull.points
     completed = False
     while not completed:
-        lcand_oprev_dest = lhull.edges[lhull.edges[lcand].oprev].dest
-        lcand_dest = lhull.edges[lcand].dest
-        ccw_test = linalg.on_right(b1, b2, lhull.points[lcand_oprev_dest])
-        next_cand_invalid = linalg.in_circle(b2, b1, 
-                                             lhull.points[lcand_dest], 
-                                             lhull.points[lcand_oprev_dest])
-        if ccw_test and next_cand_invalid:
-            t = lhull.edges[lcand].oprev
+        edge = edges[lcand]
+        t = edge.oprev
+        lcand_oprev_dest = edges[t].dest
+        ccw_test = linalg.on_right(b1, b2, points[lcand_oprev_dest])
+        if ccw_test and linalg.in_circle(b2, b1, points[edge.dest], 
+                                         points[lcand_oprev_dest]):
             lhull.kill_edge(lcand)
             lcand = t
         else:
@@ -154,19 +168,22 @@ def candidate_decider(rcand, lcand, lcand_valid, triangulation):
     result : bool
         DESCRIPTION.
     """
-    pt1 = triangulation.points[triangulation.edges[rcand].dest]
-    pt2 = triangulation.points[triangulation.edges[rcand].org]
-    pt3 = triangulation.points[triangulation.edges[lcand].org]
-    pt4 = triangulation.points[triangulation.edges[lcand].dest]
-    result = lcand_valid and linalg.in_circle(pt1, pt2, pt3, pt4)
-    return result
+    if not lcand_valid:
+        return False
+    points = triangulation.points
+    r_edge = triangulation.edges[rcand]
+    l_edge = triangulation.edges[lcand]
+    return linalg.in_circle(points[r_edge.dest], points[r_edge.org], 
+                            points[l_edge.org], points[l_edge.dest])
 
 # ----------------------------- Merging functions -----------------------------
 
 def combine_triangulations(ldi, rdi, hull_left, hull_right):
     """
     This function takes two TriangulationEdges class objects and combines
-    them into a single TriangulationEdges object.
+    them into a single TriangulationEdges object. If the two triangulations
+    are Hull objects sharing a pool of edges, the right hull is not 
+    renumbered and the combined hull is the left hull.
 
     Parameters
     ----------
@@ -188,8 +205,10 @@ def combine_triangulations(ldi, rdi, hull_left, hull_right):
     """
     ldo = hull_left.inner
     rdo = hull_right.outer
-    rdi += hull_left.num_edges
-    rdo += hull_left.num_edges
+    if not isinstance(hull_left, Hull):
+        # The edges of the right hull are moved after those of the left hull
+        rdi += hull_left.num_edges
+        rdo += hull_left.num_edges
     
     edges = hull_left.combine_triangulations(hull_right)
     base = edges.connect(edges.edges[ldi].sym, rdi)
@@ -228,18 +247,21 @@ def zip_hulls(base, triang):
         Instance of TriangulationEdges class object containing the finished
         Delaunay triangulation of the input triangulation. 
     """
+    edges = triang.edges
+    points = triang.points
     while True:
         # Make variables for commonly used base edge points
-        base1 = triang.points[triang.edges[base].org]
-        base2 = triang.points[triang.edges[base].dest]
+        base_edge = edges[base]
+        base1 = points[base_edge.org]
+        base2 = points[base_edge.dest]
         
         # Find the first candidate edges for triangulation from each subset
-        rcand = triang.edges[triang.edges[base].sym].onext
-        pt1 = triang.points[triang.edges[rcand].dest]
+        rcand = edges[base_edge.sym].onext
+        pt1 = points[edges[rcand].dest]
         rcand_valid = linalg.on_right(base1, base2, pt1)
         
-        lcand = triang.edges[base].oprev
-        pt2 = triang.points[triang.edges[lcand].dest]
+        lcand = base_edge.oprev
+        pt2 = points[edges[lcand].dest]
         lcand_valid = linalg.on_right(base1, base2, pt2)
         
         # If neither candidate is valid, hull merge is complete
@@ -255,9 +277,9 @@ def zip_hulls(base, triang):
         lcand_strong_valid = candidate_decider(rcand, lcand, lcand_valid, triang)
         
         if not rcand_valid or lcand_strong_valid:
-            base = triang.connect(lcand, triang.edges[base].sym)
+            base = triang.connect(lcand, base_edge.sym)
         else:
-            base = triang.connect(triang.edges[base].sym, triang.edges[rcand].sym)
+            base = triang.connect(base_edge.sym, edges[rcand].sym)
     return triang
 
 def merge_triangulations(groups):
@@ -312,7 +334,12 @@ def recursive_group_merge(groups):
 
 # ------------------------------- Main function -------------------------------
 
-def triangulate(pts_subset):
+# Space reserved for the edges made by triangulate(), per point. A Delaunay
+# triangulation has fewer than 6 edges (counting both directions) per point,
+# and the edges deleted during the merges are reused by the new edges.
+EDGES_PER_POINT = 6
+
+def triangulate(pts_subset, edge_class=TriangulationEdges):
     """
     This function encapsulates the whole triangulation algorithm into four
     steps. The function takes as input a list of points. Each point is of the 
@@ -322,7 +349,9 @@ def triangulate(pts_subset):
             two or three points.
     Step 2) For each group of two point, a single edge is generated. For each
             group of three points, three edges forming a triangle are 
-            generated. These are the 'primitive' triangulations. 
+            generated. These are the 'primitive' triangulations. The edges
+            of all of the primitives, and of the merges, are stored in a 
+            single edge_class object, allocated once for all of the points.
     Step 3) The primitive triangulations are paired into groups. 
     Step 4) The groups are then recursively merged until there is only a 
             single triangulation of all points remaining.
@@ -333,6 +362,10 @@ def triangulate(pts_subset):
         A list of points with the form [ [x1, y1], [x2, y2], ..., [xn, yn] ]
         The first element of each list represents the x-coordinate, the second 
         entry the y-coordinate. 
+    edge_class : class, optional
+        The class used to store the edges, TriangulationEdges or the more
+        memory efficient ArrayTriangulationEdges. 
+        The default is TriangulationEdges.
 
     Returns
     -------
@@ -341,8 +374,43 @@ def triangulate(pts_subset):
         the completed Delauney triangulation of the input points. 
         See TriangulationEdges docstring for further info.
     """
-    split_pts = split_list.groups_of_3(pts_subset)
-    primitives = make_primitives(split_pts)
+    num_points = len(pts_subset)
+    pool = edge_class(list(pts_subset))
+    pool.reserve(EDGES_PER_POINT*num_points)
+    
+    sizes = split_list.group_sizes(num_points)
+    primitives = make_pooled_primitives(pool, sizes)
     groups = [primitives[i:i+2] for i in range(0, len(primitives), 2)]
     groups = recursive_group_merge(groups)
-    return groups[0][0]
+    
+    hull = groups[0][0]
+    pool.set_extreme_edges(hull.inner, hull.outer)
+    if pool.free:
+        # Remove the deleted edges which were not reused
+        pool.compact()
+    return pool
+
+def triangulate_indexed(points):
+    """
+    Triangulate a list of points which is not sorted. The points are sorted 
+    for the triangulate() function and the point indices of the edges are
+    then mapped back to the order of the input points.
+
+    Parameters
+    ----------
+    points : list
+        A list of points with the form [ [x1, y1], [x2, y2], ..., [xn, yn] ]
+
+    Returns
+    -------
+    triangulation : TriangulationEdges
+        The Delauney triangulation, with triangulation.points in the same 
+        order as the input points
+    """
+    order = sorted(range(len(points)), key=lambda i: [points[i][0], points[i][1]])
+    triangulation = triangulate([points[i] for i in order])
+    for edge in triangulation.edges:
+        edge.org = order[edge.org]
+        edge.dest = order[edge.dest]
+    triangulation.points = list(points)
+    return triangulation
@@ -15,19 +15,17 @@ except:
 
 # -------------------------------- Definitions --------------------------------
 
-def line_primitive(pts_subset):
+def add_line(triangulation, p1):
     """
-    This function takes in a list of two points and forms an edge. 
-    The symetric edge, where the origin and destination points are reversed, 
-    is also constructed. These two edge are added into a new TriangulationEdges
-    class object which is returned by the function. 
-    
+    Add the line-primitive of points p1 and p1 + 1 to a triangulation. The 
+    edges are added after the existing edges of the triangulation.
+
     Parameters
     ----------
-    pts_index : list
-        List of the indices of the two points
-    pts_subset : lists of lists
-        A set of two points with the form [ [x1, y1], [x2, y2] ]
+    triangulation : TriangulationEdges
+        The triangulation to add the edges to
+    p1 : int
+        Index of the first of the two points in triangulation.points
 
     Returns
     -------
@@ -35,89 +33,153 @@ def line_primitive(pts_subset):
         Index of edge with the left most point
     right_most_edge : int
        Index of the edge with the right most point
-    line : TriangulationEdges
-        The resulting triangulation of two points
     """
-    p1, p2 = 0, 1
-    edge, edge_sym = edge_topology.setup_edge(p1, p2, 0)
-    line = edge_topology.TriangulationEdges(pts_subset)
-    line.push_back(edge)
-    line.push_back(edge_sym)
-
-    left_most_edge = edge.index
-    right_most_edge = line.edges[edge.index].sym
-    
-    line.set_extreme_edges(left_most_edge, right_most_edge)
-    return line
+    p2 = p1 + 1
+    edge, edge_sym = edge_topology.setup_edge(p1, p2, triangulation.num_edges)
+    triangulation.push_back(edge)
+    triangulation.push_back(edge_sym)
+    return edge.index, edge_sym.index
 
-def triangle_primitive(pts_subset):
+def add_triangle(triangulation, p1):
     """
-    This function takes a list of three points and forms three edges to 
-    create a single triangle. This triangle has the property that the origin
-    of one edge is connected to the destination of the next edge in a CCW 
-    orientation.
+    Add the triangle-primitive of points p1, p1 + 1 and p1 + 2 to a 
+    triangulation. The edges are added after the existing edges of the 
+    triangulation.
 
     Parameters
     ----------
-    pts_index : list
-        List of the indices of the three points
-    pts_subset : lists of lists
-        A set of three points with the form [ [x1, y1], [x2, y2] , [x3, y3] ]
+    triangulation : TriangulationEdges
+        The triangulation to add the edges to
+    p1 : int
+        Index of the first of the three points in triangulation.points
 
     Returns
     -------
-    out1 : int
+    left_most_edge : int
         Index of edge with the left most point
-    ou2 : int
+    right_most_edge : int
        Index of the edge with the right most point
-    edges : TriangulationEdges
-        The resulting triangulation of three points
     """
-    p1, p2, p3 = 0, 1, 2
-    triang = edge_topology.TriangulationEdges(pts_subset)
+    p2, p3 = p1 + 1, p1 + 2
+    points = triangulation.points
     
     # Create the first two edges of the triangle
-    edge1, edge1_sym = edge_topology.setup_edge(p1, p2, 0)
-    triang.push_back(edge1)
-    triang.push_back(edge1_sym)
+    edge1, edge1_sym = edge_topology.setup_edge(p1, p2, 
+                                                triangulation.num_edges)
+    triangulation.push_back(edge1)
+    triangulation.push_back(edge1_sym)
     
-    edge2, edge2_sym = edge_topology.setup_edge(p2, p3, 2)
-    triang.push_back(edge2)
-    triang.push_back(edge2_sym)
+    edge2, edge2_sym = edge_topology.setup_edge(p2, p3, 
+                                                triangulation.num_edges)
+    triangulation.push_back(edge2)
+    triangulation.push_back(edge2_sym)
     
-    triang.splice(edge1_sym.index, edge2.index)
+    triangulation.splice(edge1_sym.index, edge2.index)
     
     # To maintain the counter-clockwise orientation of the edges in the 
     # triangle, we determine where p3 is in relation to the two existing edges.
-    pt1 = pts_subset[triang.edges[edge1.index].org]
-    pt2 = pts_subset[triang.edges[edge1.index].dest]
-    pt3 = pts_subset[p3]
+    pt1 = points[p1]
+    pt2 = points[p2]
+    pt3 = points[p3]
     
     if linalg.on_right(pt1, pt2, pt3):
         # Points are in CCW orientiaton
-        c = triang.connect(edge2.index, edge1.index)
-        triang.set_extreme_edges(edge1.index, edge2_sym.index)
-        return triang
+        c = triangulation.connect(edge2.index, edge1.index)
+        return edge1.index, edge2_sym.index
     
     if linalg.on_left(pt1, pt2, pt3):
         # Points are in CW orientiaton
-        c = triang.connect(edge2.index, edge1.index)
-        triang.set_extreme_edges(triang.edges[c].sym, c)
-        return triang
+        c = triangulation.connect(edge2.index, edge1.index)
+        return triangulation.edges[c].sym, c
     
     # Points are collinear
-    triang.set_extreme_edges(edge1.index, edge2_sym.index)
+    return edge1.index, edge2_sym.index
+
+def line_primitive(pts_subset, edge_class=edge_topology.TriangulationEdges):
+    """
+    This function takes in a list of two points and forms an edge. 
+    The symetric edge, where the origin and destination points are reversed, 
+    is also constructed. These two edge are added into a new TriangulationEdges
+    class object which is returned by the function. 
+    
+    Parameters
+    ----------
+    pts_subset : lists of lists
+        A set of two points with the form [ [x1, y1], [x2, y2] ]
+    edge_class : class, optional
+        TriangulationEdges or ArrayTriangulationEdges, the class used to
+        store the edges. The default is TriangulationEdges.
+
+    Returns
+    -------
+    line : TriangulationEdges
+        The resulting triangulation of two points
+    """
+    line = edge_class(pts_subset)
+    line.set_extreme_edges(*add_line(line, 0))
+    return line
+
+def triangle_primitive(pts_subset, edge_class=edge_topology.TriangulationEdges):
+    """
+    This function takes a list of three points and forms three edges to 
+    create a single triangle. This triangle has the property that the origin
+    of one edge is connected to the destination of the next edge in a CCW 
+    orientation.
+
+    Parameters
+    ----------
+    pts_subset : lists of lists
+        A set of three points with the form [ [x1, y1], [x2, y2] , [x3, y3] ]
+    edge_class : class, optional
+        The class used to store the edges, see line_primitive
+
+    Returns
+    -------
+    triang : TriangulationEdges
+        The resulting triangulation of three points
+    """
+    triang = edge_class(pts_subset)
+    triang.set_extreme_edges(*add_triangle(triang, 0))
     return triang
     
-def make_primitives(split_pts):
+def make_primitives(split_pts, edge_class=edge_topology.TriangulationEdges):
     primitives = []
     for pts_subset in split_pts:
         
         if len(pts_subset) == 2:
             # 2 points define a single edge
-            primitives.append(line_primitive(pts_subset))
+            primitives.append(line_primitive(pts_subset, edge_class))
     
         elif len(pts_subset) == 3:
             # 3 points define a single triangle
-            primitives.append(triangle_primitive(pts_subset))
+            primitives.append(triangle_primitive(pts_subset, edge_class))
+    return primitives
+
+def make_pooled_primitives(pool, sizes):
+    """
+    Make the primitive triangulations of consecutive groups of the points of
+    'pool', with all of their edges stored in 'pool'. 
+
+    Parameters
+    ----------
+    pool : TriangulationEdges
+        Triangulation holding all of the points, and no edges
+    sizes : list
+        The number of points, 2 or 3, in each group, see 
+        split_list.group_sizes
+
+    Returns
+    -------
+    primitives : list
+        List of edge_topology.Hull class objects, one for each group
+    """
+    primitives = []
+    p1 = 0
+    for size in sizes:
+        if size == 2:
+            inner, outer = add_line(pool, p1)
+        else:
+            inner, outer = add_triangle(pool, p1)
+        primitives.append(edge_topology.Hull(pool, inner, outer))
+        p1 += size
     return primitives
@@ -30,46 +30,75 @@ def mpi_setup():
     rank = comm.Get_rank()
     return {'comm':comm, 'size':size, 'rank':rank}
 
+def split_counts(num_points, size):
+    """
+    Split the points as evenly as possible between the cores. Returns the
+    number of points given to each core, and the index of the first point
+    of each core, as numpy arrays.
+    """
+    counts = np.full(size, num_points//size, dtype=np.int64)
+    counts[:num_points%size] += 1
+    displs = np.zeros(size, dtype=np.int64)
+    displs[1:] = np.cumsum(counts)[:-1]
+    return counts, displs
+
 def main(mpi, num_points, max_neighbour_dist, scan):
     # Setup
+    comm = mpi['comm']
+    rank = mpi['rank']
     world_size = [0, 1000, 0, 1000]
     world = World(world_size)
     boids = Boids(num_points, world, max_neighbour_dist)
-    boids.generate_boids()
     
-    if mpi['rank'] == 0 and not scan:
+    if rank == 0 and not scan:
         print(f'Running on {mpi["size"]} cores...')
         print('Manhattan distance with MPI:')
-        
-    if mpi['rank'] == 0:
-        wt_start = MPI.Wtime()
-        pts_per_core = int(len(boids.members)/mpi['size'])+1
-        data = [boids.members[i:i + pts_per_core] for i in range(0, len(boids.members), pts_per_core)]
+    
+    # The points are sent as numpy buffers rather than pickled Boid objects.
+    # The counts and displacements of each core are known in advance.
+    counts, displs = split_counts(num_points, mpi['size'])
+    positions = np.empty((num_points, 2))
+    if rank == 0:
+        boids.generate_boids()
+        positions[:] = boids.positions
+        num_found = np.empty(mpi['size'], dtype=np.int64)
     else:
-        data = None
+        num_found = None
     
     # Start timer
     wt_start = MPI.Wtime()
     
-    # Scatter data to seperate cores
-    data = mpi['comm'].scatter(data, root=0)
+    # Every core searches all of the points for the neighbours of its own 
+    # share of the points, so every core needs all of the points
+    comm.Bcast(positions, root=0)
+    start = displs[rank]
+    stop = start + counts[rank]
+    
+    points = positions.tolist()
     max_dist_half = boids.max_dist/2
-    for member in data:
-        for i, pos in enumerate(boids.positions):
-            diff_x = pos[0] - member.pos[0]
-            diff_y = pos[1] - member.pos[1]
+    found = []
+    for index in range(start, stop):
+        member_pos = points[index]
+        for i, pos in enumerate(points):
+            diff_x = pos[0] - member_pos[0]
+            diff_y = pos[1] - member_pos[1]
             if -max_dist_half < diff_x < max_dist_half and \
                 -max_dist_half < diff_y < max_dist_half:
-                member.neighbours.append([member.index, i])
+                found += [index, i]
+    found = np.array(found, dtype=np.int64)
                 
-    # Gather data
-    data_gathered = mpi['comm'].gather(data,root=0)
-    
-    if mpi['rank'] == 0:
-        new_members = []
-        for data in data_gathered:
-            new_members += data
-        boids.members = new_members
+    # Gather the number of values found by each core, then the values
+    comm.Gather(np.array([len(found)], dtype=np.int64), num_found, root=0)
+    
+    if rank == 0:
+        pairs = np.empty(num_found.sum(), dtype=np.int64)
+        comm.Gatherv(found, [pairs, num_found], root=0)
+        pairs = pairs.reshape(-1, 2)
+        
+        # The pairs are in order of boid index
+        bounds = np.searchsorted(pairs[:, 0], np.arange(1, num_points))
+        for member, neighbours in zip(boids.members, np.split(pairs, bounds)):
+            member.neighbours = neighbours.tolist()
         
         # End timer and print elasped time
         wt_end = MPI.Wtime()
@@ -78,6 +107,8 @@ def main(mpi, num_points, max_neighbour_dist, scan):
             return [num_points, elapsed*1000]
         else:
             return f'\t {elapsed*1000:0.1f} ms'
+    else:
+        comm.Gatherv(found, None, root=0)
 
 def make_df(repeats, results, disable_averaging):
     if args.repeats==0 or disable_averaging==True:
@@ -10,10 +10,51 @@ Simulation options:
                         (type: int)
   --still_image         Instead of an animation, show a single still frame
                         (default: False)
+  --steps               Run this many time-steps headless, with no window or 
+                        rendering, then report the steps per second and the 
+                        time spent in each phase of the simulation
+                        (type: int)
   --boid_distribution [{random,lattice,lattice_with_noise}]
                         Define how the boids are initally arranged within the world
                         (choices: random, lattice, lattice_with_noise) 
                         (default: lattice)
+  --neighbour_search [{triangulation,linear,cell_list,kd_tree}]
+                        Algorithm used to find the neighbours of each boid. 
+                        All but 'triangulation' use the vectorised update
+                        (choices: triangulation, linear, cell_list, kd_tree) 
+                        (default: triangulation)
+  --verlet_skin         Reuse the neighbours of the vectorised update until a 
+                        boid has moved half of this distance
+                        (default: 0, search every frame) (type: float)
+  --incremental_triangulation
+                        Repair the previous frame's triangulation with edge 
+                        flips instead of triangulating from scratch
+                        (default: False)
+  --numba               Update the boids with the numba compiled kernel in the 
+                        vectorised update, falling back to the reference Boid 
+                        methods if numba is not installed
+                        (default: False)
+  --workers             Update the vectorised boids in parallel with this many 
+                        worker processes sharing the boid arrays, see 
+                        boids_core.parallel
+                        (default: 0, update in this process) (type: int)
+  --checkpoint_every, --checkpoint-every
+                        Save the state of the simulation every this many 
+                        time-steps
+                        (default: 0, never) (type: int)
+  --checkpoint_file, --checkpoint-file
+                        File the checkpoints are saved to
+                        (default: boids_checkpoint.npz) (type: str)
+  --restart_from, --restart-from
+                        Restart the simulation from a checkpoint file, instead 
+                        of generating new boids. The number of boids, the world
+                        size and the boid options are taken from the checkpoint
+                        (type: str)
+  --record              Record the positions and velocities of the boids to 
+                        this directory, see boids_core.recorder
+                        (type: str)
+  --record_every        Only record every this many time-steps
+                        (default: 1) (type: int)
 
 Boid world options:
   -ww , --world_width   Width of the boids plot in pixels
@@ -45,6 +86,16 @@ Output plot options:
                         (choices: black, white)
   --save SAVE           Save the output, given a filename
                         (type: str)
+  --video VIDEO         Export the animation to a video file, e.g. boids.mp4. 
+                        The frames are encoded in a background thread
+                        (type: str)
+  --video_fps           Frames per second of the exported video
+                        (default: 30) (type: float)
+  --frames              Stop the animation after this many frames
+                        (type: int)
+  --no_display          Do not show the animation in a window, e.g. to export 
+                        a video without a display. Requires --frames
+                        (default: False)
 
 Boid options:
   -vmax , --max_speed   Boid max speed in pixels per timestep
@@ -75,12 +126,16 @@ Boid options:
 
 # Standard library imports
 import argparse
+import time
 from math import pi
 
 # Repo module imports
 from boids_core.settings import world_options, plotting_options, boids_options
 from boids_core.boids import World, Boids
 from boids_core import plotting 
+from boids_core import checkpoint
+from boids_core.recorder import TrajectoryRecorder
+from boids_core.parallel import ParallelUpdater
 
 # -----------------------------------------------------------------------------  
 
@@ -127,12 +182,82 @@ def set_options(world_options, plotting_options, boids_options):
                             help=("Instead of an animation, show a single "
                                   "still frame \n"
                                   "(default: False)"))
+    simulation.add_argument("--steps", 
+                            type=int, default=None, metavar='',
+                            help=("Run this many time-steps headless, with no "
+                                  "window or rendering, then report the steps "
+                                  "per second and the time spent in each "
+                                  "phase of the simulation \n"
+                                  "(type: %(type)s)"))
     simulation.add_argument("--boid_distribution",
                             default='lattice', const='lattice', nargs="?",
                             choices=['random', 'lattice', 'lattice_with_noise'],
                             help=("Define how the boids are initally arranged "
                                   "within the world \n"
                                   "(choices: %(choices)s) (default: %(default)s)"))
+    simulation.add_argument("--neighbour_search",
+                            default='triangulation', const='triangulation', 
+                            nargs="?",
+                            choices=['triangulation', 'linear', 'cell_list',
+                                     'kd_tree'],
+                            help=("Algorithm used to find the neighbours of "
+                                  "each boid. All but 'triangulation' use the "
+                                  "vectorised update \n"
+                                  "(choices: %(choices)s) (default: %(default)s)"))
+    simulation.add_argument("--verlet_skin", 
+                            type=float, default=0, metavar='',
+                            help=("Reuse the neighbours of the vectorised "
+                                  "update until a boid has moved half of this "
+                                  "distance \n"
+                                  "(default: 0, search every frame) "
+                                  "(type: %(type)s)"))
+    simulation.add_argument("--incremental_triangulation", 
+                            action="store_true", default=False,
+                            help=("Repair the previous frame's triangulation "
+                                  "with edge flips instead of triangulating "
+                                  "from scratch \n"
+                                  "(default: False)"))
+    simulation.add_argument("--numba", 
+                            action="store_true", default=False,
+                            help=("Update the boids with the numba compiled "
+                                  "kernel in the vectorised update, falling "
+                                  "back to the reference Boid methods if "
+                                  "numba is not installed \n"
+                                  "(default: False)"))
+    simulation.add_argument("--workers", 
+                            type=int, default=0, metavar='',
+                            help=("Update the vectorised boids in parallel "
+                                  "with this many worker processes sharing "
+                                  "the boid arrays, see boids_core.parallel \n"
+                                  "(default: 0, update in this process) "
+                                  "(type: %(type)s)"))
+    simulation.add_argument("--checkpoint_every", "--checkpoint-every",
+                            type=int, default=0, metavar='',
+                            help=("Save the state of the simulation every this "
+                                  "many time-steps \n"
+                                  "(default: 0, never) (type: %(type)s)"))
+    simulation.add_argument("--checkpoint_file", "--checkpoint-file",
+                            type=str, default='boids_checkpoint.npz', 
+                            metavar='',
+                            help=("File the checkpoints are saved to \n"
+                                  "(default: %(default)s) (type: %(type)s)"))
+    simulation.add_argument("--restart_from", "--restart-from",
+                            type=str, default=None, metavar='',
+                            help=("Restart the simulation from a checkpoint "
+                                  "file, instead of generating new boids. The "
+                                  "number of boids, the world size and the "
+                                  "boid options are taken from the checkpoint "
+                                  "\n(type: %(type)s)"))
+    simulation.add_argument("--record", 
+                            type=str, default=None, metavar='',
+                            help=("Record the positions and velocities of the "
+                                  "boids to this directory, see "
+                                  "boids_core.recorder \n"
+                                  "(type: %(type)s)"))
+    simulation.add_argument("--record_every", 
+                            type=int, default=1, metavar='',
+                            help=("Only record every this many time-steps \n"
+                                  "(default: %(default)s) (type: %(type)s)"))
 
     # Edit world options
     world = parser.add_argument_group('Boid world options')
@@ -192,6 +317,26 @@ def set_options(world_options, plotting_options, boids_options):
                         type=str,
                         help=("Save the output, given a filename \n"
                               "(type: %(type)s)"))
+    plot_args.add_argument("--video", 
+                        type=str,
+                        help=("Export the animation to a video file, e.g. "
+                              "boids.mp4. The frames are encoded in a "
+                              "background thread \n"
+                              "(type: %(type)s)"))
+    plot_args.add_argument("--video_fps", 
+                        type=float, default=30, metavar='',
+                        help=("Frames per second of the exported video \n"
+                              "(default: %(default)s) (type: %(type)s)"))
+    plot_args.add_argument("--frames", 
+                        type=int, default=None, metavar='',
+                        help=("Stop the animation after this many frames \n"
+                              "(type: %(type)s)"))
+    plot_args.add_argument("--no_display", 
+                        action="store_true", default=False,
+                        help=("Do not show the animation in a window, e.g. to "
+                              "export a video without a display. Requires "
+                              "--frames \n"
+                              "(default: False)"))
     
     # Edit boid options
     boid = parser.add_argument_group('Boid options')
@@ -239,7 +384,18 @@ def set_options(world_options, plotting_options, boids_options):
     # Simulation options
     simulation_options['number_of_boids'] = args.number_of_boids
     simulation_options['still_image'] = args.still_image
+    simulation_options['steps'] = args.steps
     simulation_options['boid_distribution'] = args.boid_distribution
+    simulation_options['neighbour_search'] = args.neighbour_search
+    simulation_options['verlet_skin'] = args.verlet_skin
+    simulation_options['incremental_triangulation'] = args.incremental_triangulation
+    simulation_options['numba'] = args.numba
+    simulation_options['workers'] = args.workers
+    simulation_options['checkpoint_every'] = args.checkpoint_every
+    simulation_options['checkpoint_file'] = args.checkpoint_file
+    simulation_options['restart_from'] = args.restart_from
+    simulation_options['record'] = args.record
+    simulation_options['record_every'] = args.record_every
     
     # Edit world options
     if args.world_width: 
@@ -269,6 +425,12 @@ def set_options(world_options, plotting_options, boids_options):
         plotting_options['save_filename'] = args.save
     else:
         del plotting_options['save_filename']
+    if args.no_display and args.frames is None:
+        parser.error("--no_display requires --frames")
+    plotting_options['video'] = args.video
+    plotting_options['video_fps'] = args.video_fps
+    plotting_options['frames'] = args.frames
+    plotting_options['display'] = not args.no_display
         
     # Edit boid options
     if args.max_speed:
@@ -310,49 +472,200 @@ def set_options(world_options, plotting_options, boids_options):
 
 # -----------------------------------------------------------------------------  
 
+def print_statistics(boids):
+    """
+    Print how often the Verlet list or the incremental triangulation had to 
+    be rebuilt, if they were used.
+    """
+    if boids.verlet_list is not None:
+        print(f"Verlet list rebuild rate: "
+              f"{boids.verlet_list.rebuild_rate():0.3f}")
+    if boids.incremental_triangulation is not None:
+        incremental = boids.incremental_triangulation
+        print(f"Triangulation repairs: {incremental.num_repairs}, "
+              f"rebuilds: {incremental.num_rebuilds}")
+
+def run_headless(boids, options, recorder=None, updater=None):
+    """
+    Run the simulation for options['steps'] time-steps without opening a 
+    window or rendering any frames, and print the number of steps per second 
+    along with the time spent in each phase of a time-step.
+
+    Parameters
+    ----------
+    boids : boids_core.boids.Boids
+        The boids to simulate
+    options : dict
+        All simulation options
+    recorder : TrajectoryRecorder, optional
+        If given, record the trajectory of the boids
+    updater : ParallelUpdater, optional
+        If given, update the vectorised boids in parallel
+
+    Returns
+    -------
+    timings : dict
+        Total time in seconds spent in each phase
+    """
+    num_steps = options['steps']
+    vectorised = options['neighbour_search'] != 'triangulation'
+    if vectorised:
+        phases = ['neighbour search', 'update', 'swap buffers']
+    else:
+        phases = ['triangulation', 'neighbourhoods', 'update']
+    timings = dict.fromkeys(phases, 0.0)
+    
+    print(f"\nRunning {num_steps} steps headless...")
+    start = time.perf_counter()
+    for step in range(num_steps):
+        t0 = time.perf_counter()
+        if vectorised:
+            boids.make_neighbourhoods_arrays(options['neighbour_search'], 
+                                             options['verlet_skin'])
+            t1 = time.perf_counter()
+            if updater is not None:
+                updater.update()
+            elif options['numba']:
+                boids.update_boids_kernel()
+            else:
+                boids.update_boids_arrays()
+            t2 = time.perf_counter()
+            boids.swap_buffers()
+        else:
+            boids.triangulate_boids(options['incremental_triangulation'])
+            t1 = time.perf_counter()
+            boids.make_neighbourhoods()
+            t2 = time.perf_counter()
+            for boid in boids.members:
+                boid.update_boid(boids.positions, boids.velocities, boids.world)
+        t3 = time.perf_counter()
+        boids.step_count += 1
+        timings[phases[0]] += t1 - t0
+        timings[phases[1]] += t2 - t1
+        timings[phases[2]] += t3 - t2
+        checkpoint.periodic_checkpoint(boids, options['checkpoint_every'], 
+                                       options['checkpoint_file'])
+        if recorder is not None:
+            recorder.record(boids)
+    elapsed = time.perf_counter() - start
+    if vectorised:
+        boids.update_members()
+    
+    print(f"{num_steps} steps in {elapsed:0.3f} s, "
+          f"{num_steps/elapsed:0.2f} steps per second")
+    print(f"    {'phase':22} {'total (s)':>10} {'per step (ms)':>14} "
+          f"{'fraction':>9}")
+    for phase, total in timings.items():
+        print(f"    {phase:22} {total:10.3f} {total/num_steps*1000:14.3f} "
+              f"{total/elapsed:9.3f}")
+    print_statistics(boids)
+    return timings
+
 def main(options):
-    # Setup world
-    WORLD_SIZE = [0, options['world_width'], 
-                  0, options['world_height']]
-    world = World(WORLD_SIZE)
+    print_fps_to_console = True
+    if options['restart_from']:
+        print(f"\nRestarting from checkpoint {options['restart_from']}")
+        boids = checkpoint.load_checkpoint(options['restart_from'])
+        world = boids.world
+        num_boids = boids.num
+        print(f"    {num_boids} boids at step {boids.step_count}")
+    else:
+        # Setup world
+        WORLD_SIZE = [0, options['world_width'], 
+                      0, options['world_height']]
+        world = World(WORLD_SIZE)
+        num_boids = options['number_of_boids']
+        boids = Boids(num_boids, world, options)
+        boids.generate_boids(options, 
+                             distribution=options['boid_distribution'])
+    vectorised = options['neighbour_search'] != 'triangulation'
+    updater = None
+    if vectorised:
+        boids.setup_arrays()
+        if options['workers'] > 0:
+            updater = ParallelUpdater(boids, options['workers'], 
+                                      compiled=options['numba'])
+    
+    recorder = None
+    if options['record']:
+        recorder = TrajectoryRecorder(options['record'], num_boids, 
+                                      every=options['record_every'])
+        recorder.record(boids)
+    
+    if options['steps'] is not None:
+        run_headless(boids, options, recorder, updater)
+        if recorder is not None:
+            recorder.close()
+        if updater is not None:
+            updater.close()
+        return
+    
     cmap = plotting.ColourMap(options)
     plot = plotting.Plotter(options, world)
-    num_boids = options['number_of_boids']
-    print_fps_to_console = True
-    boids = Boids(num_boids, world, options)
-    boids.generate_boids(options, distribution=options['boid_distribution'])
     
     if options['still_image']:
         print("\nPlotting single still image...")
         
-        boids.triangulate_boids()
-        boids.make_neighbourhoods()
-        for i in range(num_boids):
-            a = boids.members[i]
-            # a.update_boid(boids.positions, boids.velocities, world)
-            if a.index%32==0:
-                plot.plot_neighbours(a, boids.positions)
+        if vectorised:
+            boids.get_pos_vel()
+        else:
+            boids.triangulate_boids()
+            boids.make_neighbourhoods()
+            for i in range(num_boids):
+                a = boids.members[i]
+                # a.update_boid(boids.positions, boids.velocities, world)
+                if a.index%32==0:
+                    plot.plot_neighbours(a, boids.positions)
         plot.plot_boids(boids, cmap)
         plot.display()
         if plotting_options['save_output']:
             plot.save(plotting_options['save_filename'])
     
     else:
+        def plot_func_vectorised(boids):
+            if updater is not None:
+                updater.step(method=options['neighbour_search'],
+                             skin=options['verlet_skin'])
+            else:
+                boids.step_arrays(method=options['neighbour_search'],
+                                  skin=options['verlet_skin'],
+                                  compiled=options['numba'])
+            checkpoint.periodic_checkpoint(boids, options['checkpoint_every'], 
+                                           options['checkpoint_file'])
+            if recorder is not None:
+                recorder.record(boids)
+            return boids
+        
         def plot_func(boids):
-            boids.triangulate_boids()
+            boids.triangulate_boids(options['incremental_triangulation'])
             boids.make_neighbourhoods()
             for i in range(num_boids):
                 a = boids.members[i]
                 a.update_boid(boids.positions, boids.velocities, world)
                 if a.index%int(num_boids/3)==0:
                     plot.plot_neighbours(a, boids.positions)
+            boids.step_count += 1
+            checkpoint.periodic_checkpoint(boids, options['checkpoint_every'], 
+                                           options['checkpoint_file'])
+            if recorder is not None:
+                recorder.record(boids)
             return boids
         
         print("\nPlotting animation...")
-        print("    Hit 'esc' key to exit at anytime")
+        if options['display']:
+            print("    Hit 'esc' key to exit at anytime")
         plot = plotting.Plotter(options, world)
-        plot.animation(boids, plot_func, cmap, 
-                       verbose=print_fps_to_console, print_fps=48)
+        plot.animation(boids, 
+                       plot_func_vectorised if vectorised else plot_func, 
+                       cmap, verbose=print_fps_to_console, print_fps=48,
+                       video=options['video'], video_fps=options['video_fps'],
+                       num_frames=options['frames'], 
+                       display=options['display'])
+        print_statistics(boids)
+        if recorder is not None:
+            recorder.close()
+    if updater is not None:
+        updater.close()
 
 # ----------------------------------- Main ------------------------------------
 
@@ -6,6 +6,17 @@ Example run command for a 100 boid imulation:
     mpiexec -np 4 python .\run_boids_mpi_cli.py 100
     
 Hit 'esc' key to exit at anytime.
+
+Use --checkpoint-every to save the state of the simulation regularly, and 
+--restart-from to continue a simulation from a saved checkpoint.
+
+By default, the points are triangulated in parallel, then each rank updates 
+an equal slice of the boids and the updated slices are shared between all of 
+the ranks.
+
+Use --domain_decomposition to split the world into one strip per rank, with 
+each rank only updating the boids in its own strip (see boids_core.domain), 
+instead of rank 0 updating every boid.
 """
 
 # ---------------------------------- Imports ----------------------------------
@@ -13,6 +24,7 @@ Hit 'esc' key to exit at anytime.
 # Standard library imports
 import argparse
 from math import pi
+import numpy as np
 from mpi4py import MPI
 import time
 import cv2 
@@ -21,9 +33,11 @@ import cv2
 from boids_core.settings import world_options, plotting_options, boids_options
 from boids_core.boids import World, Boids
 from boids_core import plotting 
-import delauney_triangulation.triangulation_core.points_tools.split_list as split_list
-from delauney_triangulation.triangulation_core.triangulation import make_primitives
-from delauney_triangulation.triangulation_core.triangulation import recursive_group_merge
+from boids_core import checkpoint
+from boids_core.domain import Domain
+from delauney_triangulation.triangulation_core.triangulation import triangulate
+from delauney_triangulation.triangulation_core.mpi_tools import (scatter_points,
+                                                                 tree_merge)
 
 # --------------------------------- Func defs ---------------------------------
 
@@ -55,6 +69,35 @@ simulation.add_argument("--boid_distribution",
                         help=("Define how the boids are initally arranged "
                               "within the world \n"
                               "(choices: %(choices)s) (default: %(default)s)"))
+simulation.add_argument("--domain_decomposition",
+                        action="store_true", default=False,
+                        help=("Split the world into one strip per rank. "
+                              "Each rank updates the boids in its strip, "
+                              "exchanging a halo of boids vision_distance "
+                              "wide with the nearby ranks \n"
+                              "(default: False)"))
+simulation.add_argument("--neighbour_search",
+                        default='cell_list', const='cell_list', nargs="?",
+                        choices=['linear', 'cell_list', 'kd_tree'],
+                        help=("Algorithm used to find the neighbours of "
+                              "each boid with --domain_decomposition \n"
+                              "(choices: %(choices)s) (default: %(default)s)"))
+simulation.add_argument("--checkpoint_every", "--checkpoint-every",
+                        type=int, default=0, metavar='',
+                        help=("Save the state of the simulation every this "
+                              "many time-steps \n"
+                              "(default: 0, never) (type: %(type)s)"))
+simulation.add_argument("--checkpoint_file", "--checkpoint-file",
+                        type=str, default='boids_checkpoint.npz', metavar='',
+                        help=("File the checkpoints are saved to \n"
+                              "(default: %(default)s) (type: %(type)s)"))
+simulation.add_argument("--restart_from", "--restart-from",
+                        type=str, default=None, metavar='',
+                        help=("Restart the simulation from a checkpoint "
+                              "file, instead of generating new boids. The "
+                              "number of boids, the world size and the boid "
+                              "options are taken from the checkpoint \n"
+                              "(type: %(type)s)"))
 
 # Edit world options
 world = parser.add_argument_group('Boid world options')
@@ -161,6 +204,11 @@ args = parser.parse_args()
 # Simulation options
 simulation_options['number_of_boids'] = args.number_of_boids
 simulation_options['boid_distribution'] = args.boid_distribution
+simulation_options['domain_decomposition'] = args.domain_decomposition
+simulation_options['neighbour_search'] = args.neighbour_search
+simulation_options['checkpoint_every'] = args.checkpoint_every
+simulation_options['checkpoint_file'] = args.checkpoint_file
+simulation_options['restart_from'] = args.restart_from
 
 # Edit world options
 if args.world_width: 
@@ -236,26 +284,51 @@ rank = comm.Get_rank()
 
 print(f'Running MPI boids simulaiton of {size} cores...')
 
-WORLD_SIZE = [0, options['world_width'], 
-              0, options['world_height']]
-world = World(WORLD_SIZE)
-cmap = plotting.ColourMap(options)
-plot = plotting.Plotter(options, world)
+if options['restart_from']:
+    # Every rank restarts from the same checkpoint
+    boids = checkpoint.load_checkpoint(options['restart_from'])
+    world = boids.world
+    num_boids = boids.num
+    options['number_of_boids'] = num_boids
+    if rank == 0:
+        print(f"Restarting from checkpoint {options['restart_from']}, "
+              f"{num_boids} boids at step {boids.step_count}")
+else:
+    WORLD_SIZE = [0, options['world_width'], 
+                  0, options['world_height']]
+    world = World(WORLD_SIZE)
+    
+    num_boids = options['number_of_boids']
+    
+    boids = Boids(num_boids, world, options)
+    boids.generate_boids(options, distribution=options['boid_distribution'])
 
-num_boids = options['number_of_boids']
-num_boids = num_boids-(num_boids%size)
-options['number_of_boids'] = num_boids
+domain = None
+if options['domain_decomposition']:
+    domain = Domain(comm, boids, method=options['neighbour_search'])
+    domain.scatter(boids)
+else:
+    # Every rank starts from the boids of rank 0, and updates its own slice
+    boids.setup_arrays()
+    comm.Bcast(boids.pos_array, root=0)
+    comm.Bcast(boids.vel_array, root=0)
+    counts = np.full(size, num_boids//size, dtype=np.int64)
+    counts[:num_boids%size] += 1
+    displs = np.zeros(size, dtype=np.int64)
+    displs[1:] = np.cumsum(counts)[:-1]
 
+cmap = plotting.ColourMap(options)
+plot = plotting.Plotter(options, world)
 print_fps_to_console = True
-boids = Boids(num_boids, world, options)
-boids.generate_boids(options, distribution=options['boid_distribution'])
 
 # ----------------------------- MPI triangulation -----------------------------
 
 def plot_func(boids):
     """
     This function performs a single iterations of the Boids simulation using
-    MPI to compute the boid beighourhoods in parallel.
+    MPI to compute the boid beighourhoods in parallel. Rank 0 then sends the
+    neighbours to every rank, each rank updates its own slice of the boids 
+    and the slices are gathered by every rank.
 
     Parameters
     ----------
@@ -267,54 +340,99 @@ def plot_func(boids):
     boids : boids.Boids
         Boids class
     """
-    boids.setup_triangulate_boids()
-    
+    # The sorted points and the triangulations are sent as numpy buffers
     if rank == 0:
-        positions = boids.positions
-        split_pts = split_list.groups_of_3(positions)
-        pts_per_core = int(len(split_pts)/size)+1
-        data = [split_pts[i:i + pts_per_core] for i in range(0, len(split_pts), pts_per_core)]
+        boids.update_members()
+        boids.setup_triangulate_boids()
+        positions = boids.triangulation_points
     else:
-        data = None
-    data = comm.scatter(data, root=0)
+        positions = None
+    data = scatter_points(comm, positions, root=0)
+    triangulation = triangulate(data) if data else None
     
-    primitives = make_primitives(data)
-    groups = [primitives[i:i+2] for i in range(0, len(primitives), 2)]
-    triangulation = recursive_group_merge(groups)
-    
-    new_groups = comm.gather(triangulation,root=0)
+    # Merge the triangulations of the ranks in a binary tree onto rank 0
+    triangulation = tree_merge(comm, triangulation)
     
     if rank == 0:
-        final_groups = []
-        # Account for MPI on 1 core
-        if size>1:
-            for i in range(0, size, 2):
-                group = [new_groups[i][0][0], new_groups[i+1][0][0]]
-                final_groups.append(group)
-        else:
-            final_groups = new_groups[0]
-        triangulation = recursive_group_merge(final_groups)
-        triangulation = triangulation[0][0]
-
         boids.triangulation = triangulation
 
         boids.make_neighbourhoods()
-        for i in range(num_boids):
-            a = boids.members[i]
-            a.update_boid(boids.positions, boids.velocities, world)
+        for a in boids.members:
             if a.index%int(num_boids/3)==0:
                 plot.plot_neighbours(a, boids.positions)
+        
+        # Rows of the neighbour list are in the sorted order of the members,
+        # the array update needs them in order of boid index
+        index = np.array([a.index for a in boids.members])
+        idx, nbr = boids.neighbour_list.pairs()
+        idx = index[idx]
+        nbr = index[nbr]
+        order = np.argsort(idx, kind='stable')
+        boids.neighbour_list.set_pairs(idx[order], nbr[order], num_boids)
+    
+    # Send the neighbours to every rank
+    neighbour_list = boids.neighbour_list
+    comm.Bcast(neighbour_list.offsets, root=0)
+    num_pairs = len(neighbour_list)
+    if len(neighbour_list.buffer) < num_pairs:
+        neighbour_list.buffer = np.empty(num_pairs, dtype=np.int32)
+    comm.Bcast(neighbour_list.buffer[:num_pairs], root=0)
+    
+    # Update this rank's slice of the boids, then share the slices
+    start = displs[rank]
+    boids.update_boids_arrays(start, start + counts[rank])
+    for array in (boids.pos_next, boids.vel_next):
+        comm.Allgatherv(MPI.IN_PLACE, 
+                        [array, (2*counts, 2*displs), MPI.DOUBLE])
+    boids.swap_buffers()
+    
+    if rank == 0:
+        boids.step_count += 1
+        checkpoint.periodic_checkpoint(boids, options['checkpoint_every'], 
+                                       options['checkpoint_file'])
                 
     return boids
 
+# --------------------------- Domain decomposition ----------------------------
+
+def plot_func_domain(boids):
+    """
+    This function performs a single iteration of the Boids simulation with
+    the world split into one strip per rank, see boids_core.domain. The boids
+    are gathered onto rank 0 afterwards for plotting.
+
+    Parameters
+    ----------
+    boids : boids.Boids
+        Boids class
+
+    Returns
+    -------
+    boids : boids.Boids
+        Boids class
+    """
+    domain.step()
+    domain.gather(boids)
+    
+    if rank == 0:
+        boids.step_count += 1
+        checkpoint.periodic_checkpoint(boids, options['checkpoint_every'], 
+                                       options['checkpoint_file'])
+    return boids
+
 # ------------------------------ Main animation -------------------------------
 
-def animation_mpi(self, rank, boids, plot_func, cmap, verbose=False, print_fps=24):
+def animation_mpi(self, comm, boids, plot_func, cmap, verbose=False, print_fps=24):
     """
-    Animation function from plotting.Plotter adapted for MPI.
+    Animation function from plotting.Plotter adapted for MPI. Only rank 0 
+    shows the window and polls the keyboard. It broadcasts a stop flag to 
+    the other ranks every frame.
     """
+    rank = comm.Get_rank()
+    verbose = verbose and rank == 0
     start = time.time()
     iterations = 0
+    stop = np.zeros(1, dtype=bool)
     if rank == 0: cv2.imshow("image", self.img)
     if verbose: print("frame number, frames per second")
     while True:
@@ -324,8 +442,9 @@ def animation_mpi(self, rank, boids, plot_func, cmap, verbose=False, print_fps=2
         if rank == 0:
             self.plot_boids(boids, cmap)
             cv2.imshow("image", self.img)
-        k = cv2.waitKey(1)
-        if k == 27:
+            stop[0] = cv2.waitKey(1) == 27
+        comm.Bcast(stop, root=0)
+        if stop[0]:
             break
         if verbose and iterations%print_fps==0:
             print(f"{iterations},{iterations/(time.time()-start):0.3f}")
@@ -338,5 +457,7 @@ print("\nPlotting animation...")
 print("    Hit 'esc' key to exit at anytime")
 
 plot = plotting.Plotter(options, world)
-plot.animation_mpi(rank, boids, plot_func, cmap, 
+if domain is not None:
+    plot_func = plot_func_domain
+plot.animation_mpi(comm, boids, plot_func, cmap, 
                 verbose=print_fps_to_console, print_fps=48)